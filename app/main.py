@@ -3,18 +3,20 @@
 from fastapi import FastAPI, Request, Depends, HTTPException
 from fastapi.responses import HTMLResponse, FileResponse
 from fastapi.staticfiles import StaticFiles
-from fastapi.templating import Jinja2Templates
+from contextlib import asynccontextmanager
 from pathlib import Path
-import json
 import logging
 
 from sqlalchemy.orm import Session
 from database.db import get_db
-from app.utils.logging_config import setup_logging
+from app.utils.logging_config import setup_logging, RequestLogMiddleware
+from app.utils.template_utils import get_templates, precompile_templates
+from app.utils import job_queue, pdf_pool
 from app.routes import (
     kunde_route, auftrag_route, rechnung_route,
     unternehmensdaten_route, startseite_route,
-    auftrag_loeschen, buchungen, dashboard_route, health, auth_route
+    auftrag_loeschen, buchungen, dashboard_route, health, auth_route,
+    diagnose_route, jobs_route
 )
 from config import config
 
@@ -23,7 +25,25 @@ PROJECT_ROOT = BASE_DIR.parent
 
 logger = setup_logging()
 
-app = FastAPI()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Compile all templates before the first request instead of during it
+    if config.TEMPLATE_PRECOMPILE:
+        count = precompile_templates()
+        logger.info(f"Precompiled {count} templates")
+    # Start the PDF workers now so they are warm for the first PDF
+    pdf_pool.get_pool()
+    job_queue.start_workers()
+    yield
+    # Running jobs finish (up to JOB_DRAIN_TIMEOUT) before the PDF pool stops
+    job_queue.stop_workers()
+    pdf_pool.shutdown()
+
+
+app = FastAPI(lifespan=lifespan)
+if config.SQL_INSTRUMENTATION or config.SLOW_QUERY_MS > 0:
+    app.add_middleware(RequestLogMiddleware, log_requests=config.SQL_INSTRUMENTATION)
 @app.exception_handler(HTTPException)
 async def http_exception_handler(request: Request, exc: HTTPException):
     logger.error(f"HTTP {exc.status_code}: {exc.detail} - {request.url}")
@@ -48,17 +68,7 @@ app.mount(
             PROJECT_ROOT /
             "static")),
     name="static")
-templates = Jinja2Templates(directory=str(BASE_DIR / "templates"))
-
-def from_json(value):
-    if value:
-        try:
-            return json.loads(value)
-        except (ValueError, TypeError):
-            return []
-    return []
-
-templates.env.filters['from_json'] = from_json
+templates = get_templates()
 
 
 @app.get("/", response_class=HTMLResponse)
@@ -110,6 +120,8 @@ app.include_router(unternehmensdaten_route.router)
 app.include_router(startseite_route.router)
 app.include_router(auftrag_loeschen.router)
 app.include_router(buchungen.router)
+app.include_router(diagnose_route.router)
+app.include_router(jobs_route.router)
 
 if __name__ == "__main__":
     import uvicorn
@@ -7,4 +7,6 @@ from .arbeit_komponente import ArbeitKomponente  # noqa: F401
 from .unternehmensdaten import Unternehmensdaten  # noqa: F401
 from .einnahme_ausgabe import EinnahmeAusgabe  # noqa: F401
 from .eur_kategorie import EurKategorie  # noqa: F401
+from .eur_monatssumme import EurMonatssumme  # noqa: F401
+from .receipt import Receipt  # noqa: F401
 from .user import User  # noqa: F401
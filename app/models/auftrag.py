@@ -18,7 +18,7 @@ class Auftrag(Base):
     kunde_id = Column(Integer, ForeignKey("kunde.id"), nullable=False, index=True)
 
     status = Column(String)
-    auftrag_start = Column(Date)
+    auftrag_start = Column(Date, index=True)
     beschreibung = Column(String)
     kunde_leistungsadresse = Column(String)
     kunde_leistung_plz = Column(String)
@@ -1,19 +1,22 @@
 """Income and expense tracking for German EÜR tax compliance."""
 
-from sqlalchemy import Column, Integer, String, Date, ForeignKey, Text, DECIMAL
+from sqlalchemy import Column, Integer, String, Date, ForeignKey, DECIMAL, Index
 from database.db import Base
 from sqlalchemy.orm import relationship
 
 
 class EinnahmeAusgabe(Base):
     __tablename__ = "einnahmen_ausgaben"
+    __table_args__ = (
+        # Pages of manual bookings (rechnung_id IS NULL) by (datum, id)
+        Index("ix_einnahmen_ausgaben_rechnung_datum", "rechnung_id", "datum"),
+    )
 
     id = Column(Integer, primary_key=True)
     datum = Column(Date, nullable=False, index=True)
     typ = Column(String, nullable=False)  # 'einnahme' oder 'ausgabe'
     betrag = Column(DECIMAL(12, 2), nullable=False)  # Precise currency amounts
     beschreibung = Column(String)
-    receipt_files = Column(Text, nullable=True)  # JSON string of receipt file names
 
     kategorie_id = Column(
         Integer,
@@ -25,3 +28,9 @@ class EinnahmeAusgabe(Base):
     rechnung_id = Column(Integer, ForeignKey("rechnung.id"), nullable=True, index=True)
 
     rechnung = relationship("Rechnung", back_populates="einnahmen_ausgaben")
+
+    # Uploaded receipts (app.models.receipt), read-only
+    receipts = relationship(
+        "Receipt", viewonly=True, order_by="Receipt.id",
+        primaryjoin="and_(foreign(Receipt.owner_id) == EinnahmeAusgabe.id, "
+                    "Receipt.owner_type == 'buchung')")
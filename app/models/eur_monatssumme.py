@@ -0,0 +1,152 @@
+"""Monthly EÜR rollup maintained alongside income and expense bookings."""
+
+from collections import defaultdict
+from decimal import Decimal
+
+from sqlalchemy import Column, Integer, String, ForeignKey, DECIMAL, event, inspect, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+from database.db import Base
+from app.models.einnahme_ausgabe import EinnahmeAusgabe
+
+
+class EurMonatssumme(Base):
+    """Sum and count of bookings per (jahr, monat, typ, kategorie_id).
+
+    Updated in the same transaction as every flush that inserts, edits or
+    deletes an EinnahmeAusgabe, so reports can read totals without scanning
+    the bookings table. Bookings must therefore be changed through the ORM
+    unit of work (``db.add`` / ``db.delete``), not via bulk ``query.delete()``.
+    Use ``scripts/rebuild_eur_rollup.py`` to backfill or repair the table.
+    """
+    __tablename__ = "eur_monatssumme"
+
+    jahr = Column(Integer, primary_key=True)
+    monat = Column(Integer, primary_key=True)
+    typ = Column(String, primary_key=True)  # 'einnahme' oder 'ausgabe'
+    kategorie_id = Column(Integer, ForeignKey("eur_kategorie.id"), primary_key=True)
+
+    summe = Column(DECIMAL(14, 2), nullable=False, default=0)
+    anzahl = Column(Integer, nullable=False, default=0)
+
+
+def _committed_value(session, obj, attr):
+    """Return the value an attribute currently has in the database."""
+    history = inspect(obj).attrs[attr].history
+    if history.deleted:
+        return history.deleted[0]
+    if history.unchanged:
+        return history.unchanged[0]
+    if not history.added:
+        # Expired or not yet loaded: loading it reads the stored value
+        return getattr(obj, attr)
+    # Changed after expiry, the old value was never loaded
+    table = EinnahmeAusgabe.__table__
+    return session.connection().execute(
+        select(table.c[attr]).where(table.c.id == obj.id)
+    ).scalar()
+
+
+# INSERT ... ON CONFLICT per dialect, so two transactions creating the same
+# month row at once add up instead of one failing on the primary key
+_UPSERT_INSERTS = {
+    "postgresql": postgresql.insert,
+    "sqlite": sqlite.insert,
+}
+
+
+def _rollup_key(datum, typ, kategorie_id):
+    return (datum.year, datum.month, (typ or "").lower(), kategorie_id)
+
+
+def _add_delta(deltas, datum, typ, kategorie_id, betrag, anzahl):
+    if datum is None or kategorie_id is None:
+        return
+    delta = deltas[_rollup_key(datum, typ, kategorie_id)]
+    delta[0] += Decimal(str(betrag or 0)) * anzahl
+    delta[1] += anzahl
+
+
+def _remove_committed(session, deltas, obj):
+    _add_delta(
+        deltas,
+        _committed_value(session, obj, "datum"),
+        _committed_value(session, obj, "typ"),
+        _committed_value(session, obj, "kategorie_id"),
+        _committed_value(session, obj, "betrag"),
+        -1)
+
+
+def _add_current(deltas, obj):
+    _add_delta(deltas, obj.datum, obj.typ, obj.kategorie_id, obj.betrag, 1)
+
+
+@event.listens_for(Session, "before_flush")
+def _collect_committed_bookings(session, flush_context, instances):
+    """Subtract the stored values of bookings that are deleted or edited."""
+    deltas = defaultdict(lambda: [Decimal("0"), 0])
+    changed = []
+
+    with session.no_autoflush:
+        for obj in session.deleted:
+            if isinstance(obj, EinnahmeAusgabe):
+                _remove_committed(session, deltas, obj)
+
+        for obj in session.dirty:
+            if isinstance(obj, EinnahmeAusgabe) and session.is_modified(obj):
+                _remove_committed(session, deltas, obj)
+                changed.append(obj)
+
+    session.info["eur_rollup_deltas"] = deltas
+    session.info["eur_rollup_changed"] = changed
+
+
+@event.listens_for(Session, "after_flush")
+def _update_eur_monatssumme(session, flush_context):
+    """Apply the booking changes of this flush to the monthly rollup."""
+    deltas = session.info.pop(
+        "eur_rollup_deltas", defaultdict(lambda: [Decimal("0"), 0]))
+    changed = session.info.pop("eur_rollup_changed", [])
+
+    # New and edited bookings count with their values after the flush, when
+    # foreign keys set through relationships are populated as well
+    for obj in session.new:
+        if isinstance(obj, EinnahmeAusgabe):
+            _add_current(deltas, obj)
+    for obj in changed:
+        _add_current(deltas, obj)
+
+    if not deltas:
+        return
+
+    table = EurMonatssumme.__table__
+    connection = session.connection()
+    insert = _UPSERT_INSERTS[connection.dialect.name]
+    for (jahr, monat, typ, kategorie_id), (summe, anzahl) in deltas.items():
+        if summe == 0 and anzahl == 0:
+            continue
+        key_filter = (
+            (table.c.jahr == jahr)
+            & (table.c.monat == monat)
+            & (table.c.typ == typ)
+            & (table.c.kategorie_id == kategorie_id)
+        )
+        upsert = insert(table).values(
+            jahr=jahr,
+            monat=monat,
+            typ=typ,
+            kategorie_id=kategorie_id,
+            summe=summe,
+            anzahl=anzahl
+        )
+        connection.execute(upsert.on_conflict_do_update(
+            index_elements=[table.c.jahr, table.c.monat, table.c.typ, table.c.kategorie_id],
+            set_={
+                "summe": table.c.summe + upsert.excluded.summe,
+                "anzahl": table.c.anzahl + upsert.excluded.anzahl,
+            }
+        ))
+        if anzahl < 0:
+            connection.execute(
+                table.delete().where(key_filter & (table.c.anzahl <= 0))
+            )
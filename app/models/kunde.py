@@ -29,7 +29,7 @@ class Kunde(Base):
     kunde_email = Column(String)
     kunde_telefon = Column(String)
     notizen = Column(Text)
-    kunde_seit = Column(Date)
+    kunde_seit = Column(Date, index=True)
 
     rechnungen = relationship("Rechnung", back_populates="kunde")
     auftraege = relationship(
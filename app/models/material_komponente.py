@@ -16,10 +16,15 @@ class MaterialKomponente(Base):
     anzahl = Column(DECIMAL(10, 3), default=1.0)  # Allow 3 decimal places for quantities
     preis_pro_einheit = Column(DECIMAL(10, 2))  # Selling price (what customer pays)
     actual_cost = Column(DECIMAL(10, 2), nullable=True)  # Actual cost (what you paid)
-    receipt_path = Column(String, nullable=True)  # Path to uploaded receipt
     kategorie_id = Column(Integer, ForeignKey("eur_kategorie.id"), index=True)
 
     kategorie = relationship("EurKategorie", back_populates="material_komponenten")
 
     # Beziehung zurück zum Auftrag
     auftrag = relationship("Auftrag", back_populates="materialien")
+
+    # Hochgeladene Belege (app.models.receipt), nur lesend
+    receipts = relationship(
+        "Receipt", viewonly=True, order_by="Receipt.id",
+        primaryjoin="and_(foreign(Receipt.owner_id) == MaterialKomponente.id, "
+                    "Receipt.owner_type == 'material')")
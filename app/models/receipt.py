@@ -0,0 +1,29 @@
+"""Uploaded receipt files of materials and bookings."""
+
+from datetime import datetime
+
+from sqlalchemy import Column, DateTime, Index, Integer, String
+from database.db import Base
+
+
+class Receipt(Base):
+    """A receipt file in RECEIPTS_DIR and the material or booking it belongs to.
+
+    The owner is referenced by type and id (``owner_type`` 'material' for a
+    MaterialKomponente, 'buchung' for an EinnahmeAusgabe). There is no foreign
+    key, so deleting an owner must delete its receipts as well
+    (``app.utils.receipts.remove_receipts``); materials are deleted in bulk.
+    """
+    __tablename__ = "receipt"
+    __table_args__ = (
+        Index("ix_receipt_owner", "owner_type", "owner_id"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    filename = Column(String, nullable=False, unique=True)  # Name in RECEIPTS_DIR
+    owner_type = Column(String, nullable=False)  # 'material' oder 'buchung'
+    owner_id = Column(Integer, nullable=False)
+    size = Column(Integer)
+    mime_type = Column(String)
+    sha256 = Column(String(64))
+    uploaded_at = Column(DateTime, nullable=False, default=datetime.now)
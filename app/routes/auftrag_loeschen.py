@@ -9,6 +9,8 @@ from app.models.arbeit_komponente import ArbeitKomponente
 from app.models.material_komponente import MaterialKomponente
 from app.models.rechnung import Rechnung
 from app.models.einnahme_ausgabe import EinnahmeAusgabe
+from app.utils.job_queue import submit
+from app.utils.receipts import BUCHUNG, MATERIAL, remove_receipts
 
 
 router = APIRouter()
@@ -22,18 +24,29 @@ def auftrag_loeschen(auftrag_id: int, db: Session = Depends(get_db)):
     if not auftrag:
         raise HTTPException(status_code=404, detail="Auftrag nicht gefunden")
 
+    # Receipt files are deleted from disk after the commit
+    receipt_files = []
+
     # First, find all invoices for this auftrag to delete their EÜR entries
     rechnungen = db.query(Rechnung).filter(Rechnung.auftrag_id == auftrag_id).all()
     for rechnung in rechnungen:
-        # Delete all EÜR entries for each invoice
-        db.query(EinnahmeAusgabe).filter(EinnahmeAusgabe.rechnung_id == rechnung.id).delete()
+        # Delete all EÜR entries for each invoice (through the session so the
+        # monthly rollup is updated as well)
+        buchungen = db.query(EinnahmeAusgabe).filter(
+            EinnahmeAusgabe.rechnung_id == rechnung.id).all()
+        receipt_files += remove_receipts(db, BUCHUNG, [buchung.id for buchung in buchungen])
+        for buchung in buchungen:
+            db.delete(buchung)
     
     # Then delete invoices
     db.query(Rechnung).filter(Rechnung.auftrag_id == auftrag_id).delete()
     
-    # Delete work and material components
+    # Delete work and material components (with the receipts of the materials)
     db.query(ArbeitKomponente).filter(
         ArbeitKomponente.auftrag_id == auftrag_id).delete()
+    material_ids = [m.id for m in db.query(MaterialKomponente.id).filter(
+        MaterialKomponente.auftrag_id == auftrag_id)]
+    receipt_files += remove_receipts(db, MATERIAL, material_ids)
     db.query(MaterialKomponente).filter(
         MaterialKomponente.auftrag_id == auftrag_id).delete()
 
@@ -41,4 +54,7 @@ def auftrag_loeschen(auftrag_id: int, db: Session = Depends(get_db)):
     db.delete(auftrag)
     db.commit()
 
+    if receipt_files:
+        submit("dateien_loeschen", {"dir": "RECEIPTS_DIR", "files": receipt_files})
+
     return RedirectResponse(url="/kundenliste", status_code=303)
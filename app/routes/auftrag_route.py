@@ -10,12 +10,12 @@ from app.models.arbeit_komponente import ArbeitKomponente
 from app.models.material_komponente import MaterialKomponente
 from app.models.eur_kategorie import EurKategorie
 from app.models.einnahme_ausgabe import EinnahmeAusgabe
-from app.utils.template_utils import create_templates
+from app.utils.template_utils import get_templates
 import datetime
 from typing import List, Optional
 
 router = APIRouter()
-templates = create_templates()
+templates = get_templates()
 
 
 
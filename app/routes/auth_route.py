@@ -2,16 +2,14 @@
 
 from fastapi import APIRouter, Request, Depends, Form, HTTPException
 from fastapi.responses import HTMLResponse, RedirectResponse
-from fastapi.templating import Jinja2Templates
 from sqlalchemy.orm import Session
 from database.db import get_db
 from app.utils.auth_utils import authenticate_user, create_session_token, get_current_user, verify_password, get_password_hash
-from pathlib import Path
+from app.utils.template_utils import get_templates
 
 router = APIRouter()
 
-BASE_DIR = Path(__file__).resolve().parent.parent
-templates = Jinja2Templates(directory=str(BASE_DIR / "templates"))
+templates = get_templates()
 
 
 @router.get("/login", response_class=HTMLResponse)
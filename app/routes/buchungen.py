@@ -1,49 +1,56 @@
 """EÜR bookings, income/expense tracking and German tax compliance routes."""
 
-from fastapi import APIRouter, Request, Form, Depends, UploadFile
+from fastapi import APIRouter, Request, Form, Depends, UploadFile, HTTPException
 from fastapi.responses import RedirectResponse, HTMLResponse, Response
-from sqlalchemy.orm import Session
-from sqlalchemy import func
+from starlette.concurrency import run_in_threadpool
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select
+from sqlalchemy.orm import Session, sessionmaker
 from datetime import date, datetime
+from decimal import Decimal
 from dateutil.relativedelta import relativedelta
 from collections import defaultdict
 from typing import Optional, List
-import json
 import hashlib
 import time
-import os
 import subprocess
 import tempfile
-from weasyprint import HTML
 
-from database.db import get_db
+from database.db import get_db, get_async_db, get_read_sessionmaker
 from app.models.einnahme_ausgabe import EinnahmeAusgabe
 from app.models.eur_kategorie import EurKategorie
 from app.models.rechnung import Rechnung
 from app.models.unternehmensdaten import Unternehmensdaten
-from app.utils.template_utils import create_templates
-from app.utils.file_validation import validate_file_upload
+from app.utils.data_version import current_version, page_etag, is_not_modified, not_modified_response, set_etag
+from app.utils.report_cache import report_cache
+from app.utils.template_utils import StreamingTemplateResponse, get_templates
+from app.utils.file_validation import SavedUpload, UploadRejected, check_file_name, save_upload
+from app.utils.receipts import BUCHUNG, add_receipt, remove_receipt, remove_receipts
+from app.utils.date_utils import in_period
+from app.utils.job_queue import JobFailed, job_handler, job_response, job_session, submit
+from app.utils import pdf_pool
+from app.utils.pdf_cache import pdf_download, render_cached
+from app.utils.pdf_pool import PdfQueueFull, PdfRenderError
+from app.utils.pagination import Page, decode_cursor, encode_cursor, keyset_query, page_size
+from app.utils.read_models import (STREAM_BATCH_SIZE, buchung_row, buchungen_select, rechnung_row,
+                                   rechnungen_select)
+from app.utils.year_archive import archive_response, build_archive
+from app.utils.eur_rollup import (
+    get_booking_years, get_year_totals, get_monthly_totals, get_category_totals
+)
 from config import config
 
 router = APIRouter()
-templates = create_templates()
+templates = get_templates()
 
-def save_receipt_file(file: UploadFile, booking_id: int) -> str:
-    """Save uploaded file and return the filename."""
+def save_receipt_file(file: UploadFile, booking_id: int) -> SavedUpload:
+    """Validate and save an uploaded receipt, streamed in chunks."""
     # Generate unique filename
     import secrets
-    file_extension = os.path.splitext(file.filename.lower())[1]
+    file_extension = check_file_name(file)
     unique_filename = f"booking_{booking_id}_{secrets.token_hex(6)}{file_extension}"
     
-    # Ensure receipts directory exists
-    config.ensure_directories()
-    file_path = config.RECEIPTS_DIR / unique_filename
-    
-    # Save file
-    with open(file_path, "wb") as buffer:
-        buffer.write(file.file.read())
-    
-    return unique_filename
+    return save_upload(file, config.RECEIPTS_DIR, unique_filename)
 
 # Formular für neue Buchung
 @router.get("/buchungen/neu", response_class=HTMLResponse)
@@ -187,22 +194,9 @@ def formular_absenden(
             if not file or not file.filename:
                 continue
 
-            # Validate file
-            is_valid, error_message = validate_file_upload(file)
-            if not is_valid:
-                # Delete all created bookings if file validation fails
-                for booking in created_bookings:
-                    db.delete(booking)
-                db.commit()
-                return HTMLResponse(
-                    f"Fehler beim Datei-Upload: {error_message}",
-                    status_code=400
-                )
-
-            # Save file
+            # Validate and save file
             try:
-                filename = save_receipt_file(file, first_booking.id)
-                saved_files.append(filename)
+                saved_files.append(save_receipt_file(file, first_booking.id))
             except Exception as e:
                 # Delete all bookings and any previously saved files
                 for booking in created_bookings:
@@ -212,18 +206,25 @@ def formular_absenden(
                 # Clean up any files that were saved
                 for saved_file in saved_files:
                     try:
-                        (config.RECEIPTS_DIR / saved_file).unlink()
+                        (config.RECEIPTS_DIR / saved_file.filename).unlink()
                     except:
                         pass
 
+                if isinstance(e, UploadRejected):
+                    return HTMLResponse(
+                        f"Fehler beim Datei-Upload: {e}",
+                        status_code=400
+                    )
                 return HTMLResponse(
                     f"Fehler beim Speichern der Datei: {str(e)}",
                     status_code=500
                 )
 
-        # Update first booking with file information
+        # Register the files as receipts of the first booking
         if saved_files:
-            first_booking.receipt_files = json.dumps(saved_files)
+            for saved in saved_files:
+                add_receipt(db, BUCHUNG, first_booking.id, saved.filename,
+                            size=saved.size, sha256=saved.sha256)
             db.commit()
     
     return RedirectResponse(redirect_to, status_code=303)
@@ -277,44 +278,29 @@ def save_manual_booking(
     buchung.kategorie_id = kategorie_id
     buchung.beschreibung = beschreibung
     
-    # Handle file uploads if any
-    existing_files = []
-    if buchung.receipt_files:
-        try:
-            existing_files = json.loads(buchung.receipt_files)
-        except:
-            existing_files = []
-    
-    saved_files = existing_files.copy()  # Keep existing files
-    
+    # Handle file uploads if any (existing receipts are kept)
     if receipt_files:
         for file in receipt_files:
             # Skip empty files
             if not file or not file.filename:
                 continue
                 
-            # Validate file
-            is_valid, error_message = validate_file_upload(file)
-            if not is_valid:
+            # Validate and save file
+            try:
+                saved = save_receipt_file(file, buchung.id)
+                add_receipt(db, BUCHUNG, buchung.id, saved.filename,
+                            size=saved.size, sha256=saved.sha256)
+            except UploadRejected as e:
                 return HTMLResponse(
-                    f"Fehler beim Datei-Upload: {error_message}",
+                    f"Fehler beim Datei-Upload: {e}",
                     status_code=400
                 )
-            
-            # Save file
-            try:
-                filename = save_receipt_file(file, buchung.id)
-                saved_files.append(filename)
             except Exception as e:
                 return HTMLResponse(
                     f"Fehler beim Speichern der Datei: {str(e)}",
                     status_code=500
                 )
     
-    # Update booking with file information
-    if saved_files:
-        buchung.receipt_files = json.dumps(saved_files)
-    
     db.commit()
     
     return RedirectResponse("/rechnungsliste", status_code=303)
@@ -335,29 +321,18 @@ def delete_manual_booking_receipt(
     if not buchung:
         return HTMLResponse("Buchung nicht gefunden", status_code=404)
     
-    # Remove file from receipt_files
-    if buchung.receipt_files:
-        try:
-            receipt_files = json.loads(buchung.receipt_files)
-            if filename in receipt_files:
-                receipt_files.remove(filename)
-                
-                # Delete physical file
-                receipt_path = config.RECEIPTS_DIR / filename
-                if receipt_path.exists():
-                    receipt_path.unlink()
-                
-                # Update database
-                if receipt_files:
-                    buchung.receipt_files = json.dumps(receipt_files)
-                else:
-                    buchung.receipt_files = None
-                
-                db.commit()
-                
-                return HTMLResponse("OK", status_code=200)
-        except Exception as e:
-            return HTMLResponse(f"Fehler: {str(e)}", status_code=500)
+    # Remove the receipt of this booking
+    try:
+        if remove_receipt(db, BUCHUNG, buchung.id, filename):
+            db.commit()
+
+            # Delete physical file in the background
+            submit("dateien_loeschen", {"dir": "RECEIPTS_DIR", "files": [filename]})
+
+            return HTMLResponse("OK", status_code=200)
+    except Exception as e:
+        db.rollback()
+        return HTMLResponse(f"Fehler: {str(e)}", status_code=500)
     
     return HTMLResponse("Datei nicht gefunden", status_code=404)
 
@@ -376,25 +351,16 @@ def delete_manual_booking(
     if not buchung:
         return HTMLResponse("Buchung nicht gefunden", status_code=404)
 
-    # Delete associated receipt files from disk
-    if buchung.receipt_files:
-        try:
-            receipt_files = json.loads(buchung.receipt_files)
-            for filename in receipt_files:
-                receipt_path = config.RECEIPTS_DIR / filename
-                if receipt_path.exists():
-                    try:
-                        receipt_path.unlink()
-                    except Exception as e:
-                        # Log the error but continue with deletion
-                        print(f"Warning: Could not delete receipt file {filename}: {str(e)}")
-        except Exception as e:
-            print(f"Warning: Could not parse receipt files for booking {booking_id}: {str(e)}")
+    # Associated receipt files are deleted from disk after the commit
+    receipt_files = remove_receipts(db, BUCHUNG, [buchung.id])
 
     # Delete the booking from database
     db.delete(buchung)
     db.commit()
 
+    if receipt_files:
+        submit("dateien_loeschen", {"dir": "RECEIPTS_DIR", "files": receipt_files})
+
     return RedirectResponse("/rechnungsliste", status_code=303)
 
 
@@ -533,10 +499,188 @@ def rechnung_status_toggle(
 
 
 @router.get("/euer", response_class=HTMLResponse)
-def euer_uebersicht(request: Request, view: str = "list", year: int = None, db: Session = Depends(get_db)):
-    # Get all available years from the database
-    all_entries = db.query(EinnahmeAusgabe).all()
-    available_years = sorted(set(entry.datum.year for entry in all_entries), reverse=True)
+async def euer_uebersicht(request: Request, view: str = "list", year: int = None,
+                          cursor: str = None, limit: int = None,
+                          db: AsyncSession = Depends(get_async_db),
+                          read_sessions: sessionmaker = Depends(get_read_sessionmaker)):
+    etag = page_etag()
+    if is_not_modified(request, etag):
+        return not_modified_response(etag)
+
+    # Validate before streaming starts; afterwards the status is sent
+    after, size = decode_cursor(cursor), page_size(limit)
+    # Years, totals and chart come from the rollup and are cached
+    context = await report_cache.get_or_compute_async(
+        ("euer", year, view),
+        lambda: db.run_sync(_euer_context, view, year)
+    )
+
+    # Only the list view shows the entries: one page of the timeline with
+    # invoices (highest ID first), then manual entries (newest first), read
+    # from a server-side cursor while the page is sent, with a session the
+    # response closes when it is done
+    stream_db = None
+    timeline_page = None
+    if not view or view == 'list':
+        stream_db = read_sessions()
+        try:
+            timeline_page = _stream_timeline(stream_db, context["year"], after, size)
+        except Exception:
+            stream_db.close()
+            raise
+
+    response = StreamingTemplateResponse(
+        templates, "euer_uebersicht.html",
+        {"request": request, **context,
+         "timeline_items": timeline_page.items if timeline_page else [],
+         "timeline_page": timeline_page},
+        on_close=stream_db.close if stream_db else None)
+    return set_etag(response, etag)
+
+
+@router.get("/api/euer/timeline")
+async def get_euer_timeline_page(request: Request, response: Response, year: int = None,
+                                 cursor: str = None, limit: int = None,
+                                 db: AsyncSession = Depends(get_async_db)):
+    """EÜR timeline of one year as JSON, one page per request; follow next_cursor for more."""
+    etag = page_etag()
+    if is_not_modified(request, etag):
+        return not_modified_response(etag)
+
+    year = year or date.today().year
+    after, size = decode_cursor(cursor), page_size(limit)
+    page = await db.run_sync(_timeline_page, year, after, size)
+
+    def entry_json(entry):
+        return {"id": entry.id, "datum": entry.datum.isoformat(), "typ": entry.typ,
+                "betrag": entry.betrag, "beschreibung": entry.beschreibung}
+
+    set_etag(response, etag)
+    return {
+        "year": year,
+        "items": [
+            {"type": item["type"], "rechnung_id": item["rechnung_id"],
+             "entries": [entry_json(entry) for entry in item["data"]["entries"]]}
+            if item["type"] == "invoice_group" else
+            {"type": item["type"], **entry_json(item["data"])}
+            for item in page.items
+        ],
+        "next_cursor": page.next_cursor
+    }
+
+
+def _timeline_page(db: Session, year: int, after: Optional[list], size: int) -> Page:
+    """Load one page of the EÜR timeline of a year (see `_stream_timeline`)."""
+    page = _stream_timeline(db, year, after, size)
+    page.items = list(page.items)
+    return page
+
+
+def _stream_timeline(db: Session, year: int, after: Optional[list], size: int) -> Page:
+    """
+    One page of the EÜR timeline of a year, read while the page is rendered.
+
+    The timeline lists the invoice groups (newest invoice first) followed by
+    the manual bookings (newest first). Both parts are paged by key: the
+    cursor is ["rechnung", id] within the invoices and ["buchung", datum, id]
+    within the manual bookings (["buchung"] for their first row).
+
+    The rows come from server-side cursors (STREAM_BATCH_SIZE per round
+    trip) when the items are iterated; the entries of the invoices are loaded
+    per batch. The session must stay open until then, and next_cursor is set
+    once the items were iterated. The cursor is validated right away.
+    """
+    phase, key = (after[0], after[1:]) if after else ("rechnung", [])
+    if phase not in ("rechnung", "buchung"):
+        raise HTTPException(status_code=400, detail="Ungültiger Cursor")
+    rechnungen_query = keyset_query(
+        rechnungen_select().filter(Rechnung.id.in_(
+            select(EinnahmeAusgabe.rechnung_id).filter(in_period(EinnahmeAusgabe.datum, year))
+        )),
+        [Rechnung.id], key if phase == "rechnung" else [], size
+    )
+    # Built here as well so a bad booking key fails before the response starts;
+    # the limit is set once the invoices have used their part of the page
+    buchungen_query = keyset_query(
+        buchungen_select().filter(
+            EinnahmeAusgabe.rechnung_id.is_(None),
+            in_period(EinnahmeAusgabe.datum, year)
+        ),
+        [EinnahmeAusgabe.datum, EinnahmeAusgabe.id], key if phase == "buchung" else [], size
+    )
+    page = Page(items=[], next_cursor=None, page_size=size)
+
+    def invoice_groups():
+        result = db.execute(rechnungen_query.execution_options(yield_per=STREAM_BATCH_SIZE))
+        try:
+            for batch in result.partitions():
+                # All entries of the batch's invoices in one query, oldest first
+                groups = {rechnung.id: {'rechnung': rechnung, 'entries': []}
+                          for rechnung in map(rechnung_row, batch)}
+                for row in db.execute(buchungen_select().filter(
+                    EinnahmeAusgabe.rechnung_id.in_(groups),
+                    in_period(EinnahmeAusgabe.datum, year)
+                ).order_by(EinnahmeAusgabe.datum.asc(), EinnahmeAusgabe.id.asc())):
+                    entry = buchung_row(row)
+                    groups[entry.rechnung_id]['entries'].append(entry)
+                for rechnung_id, group in groups.items():
+                    yield {'type': 'invoice_group', 'rechnung_id': rechnung_id, 'data': group}
+        finally:
+            result.close()
+
+    def manual_entries(remaining):
+        result = db.execute(buchungen_query.limit(remaining + 1)
+                            .execution_options(yield_per=STREAM_BATCH_SIZE))
+        try:
+            for batch in result.partitions():
+                for row in batch:
+                    entry = buchung_row(row)
+                    yield {'type': 'manual_entry', 'date': entry.datum, 'data': entry}
+        finally:
+            result.close()
+
+    def items():
+        count = 0
+        if phase == "rechnung":
+            groups, last = invoice_groups(), None
+            try:
+                for item in groups:
+                    if count == size:
+                        page.next_cursor = encode_cursor(["rechnung", last])
+                        return
+                    last = item['rechnung_id']
+                    count += 1
+                    yield item
+            finally:
+                groups.close()
+
+        # Fill the rest of the page with manual bookings
+        remaining = size - count
+        entries, last = manual_entries(remaining), ["buchung"]
+        try:
+            for position, item in enumerate(entries):
+                if position == remaining:
+                    page.next_cursor = encode_cursor(last)
+                    return
+                last = ["buchung", item['data'].datum, item['data'].id]
+                yield item
+        finally:
+            entries.close()
+
+    page.items = items()
+    return page
+
+
+def _euer_context(db: Session, view: str, year: Optional[int]) -> dict:
+    """Compute the template context of the EÜR overview, except the timeline (streamed)."""
+    reports_data = {}
+    if view == 'reports':
+        # Year catalog and per-year totals come from one grouped query
+        reports_data = get_year_totals(db)
+        available_years = sorted(reports_data, reverse=True)
+    else:
+        # Get all available years from the monthly rollup
+        available_years = get_booking_years(db)
 
     # If no year specified, use the most recent year with data
     if year is None and available_years:
@@ -544,98 +688,22 @@ def euer_uebersicht(request: Request, view: str = "list", year: int = None, db:
     elif year is None:
         year = date.today().year
 
-    # Calculate reports data for all years (for reports view)
-    reports_data = {}
-    if view == 'reports':
-        for report_year in available_years:
-            year_entries = db.query(EinnahmeAusgabe).filter(
-                func.strftime('%Y', EinnahmeAusgabe.datum) == str(report_year)
-            ).all()
-
-            year_einnahmen = sum(e.betrag for e in year_entries if e.typ.lower() == "einnahme")
-            year_ausgaben = sum(e.betrag for e in year_entries if e.typ.lower() == "ausgabe")
-            year_saldo = year_einnahmen - year_ausgaben
-
-            reports_data[report_year] = {
-                'einnahmen': year_einnahmen,
-                'ausgaben': year_ausgaben,
-                'saldo': year_saldo
-            }
-    
-    # Filter entries by year and order chronologically (oldest first)
-    eintraege = db.query(EinnahmeAusgabe).filter(
-        func.strftime('%Y', EinnahmeAusgabe.datum) == str(year)
-    ).order_by(EinnahmeAusgabe.datum.asc()).all()
-
-    # Group entries by invoice
-    grouped_entries = {}
-    manual_entries = []
-    
-    for entry in eintraege:
-        if entry.rechnung_id:
-            if entry.rechnung_id not in grouped_entries:
-                grouped_entries[entry.rechnung_id] = {
-                    'rechnung': entry.rechnung,
-                    'entries': []
-                }
-            grouped_entries[entry.rechnung_id]['entries'].append(entry)
-        else:
-            manual_entries.append(entry)
-    
-    # Create a mixed timeline with invoices and manual entries sorted by date
-    timeline_items = []
-    
-    # Add invoice groups to timeline
-    for rechnung_id, group in grouped_entries.items():
-        timeline_items.append({
-            'type': 'invoice_group',
-            'rechnung_id': rechnung_id,
-            'data': group
-        })
-
-    # Add manual entries to timeline
-    for entry in manual_entries:
-        timeline_items.append({
-            'type': 'manual_entry',
-            'date': entry.datum,
-            'data': entry
-        })
-
-    # Sort timeline: invoices by ID (highest first), manual entries by date (newest first)
-    timeline_items.sort(key=lambda x: (
-        x['type'] == 'manual_entry',  # Manual entries come after invoices
-        -x['rechnung_id'] if x['type'] == 'invoice_group' else -x['date'].toordinal()
-    ))
-
-    einnahmen_summe = sum(
-        e.betrag for e in eintraege if e.typ.lower() == "einnahme")
-    ausgaben_summe = sum(
-        e.betrag for e in eintraege if e.typ.lower() == "ausgabe")
+    # Year totals and monthly chart data from the rollup
+    year_totals = get_year_totals(db, year).get(year, {})
+    einnahmen_summe = year_totals.get('einnahmen', Decimal('0'))
+    ausgaben_summe = year_totals.get('ausgaben', Decimal('0'))
     saldo = einnahmen_summe - ausgaben_summe
 
-    from collections import defaultdict
-    monate = defaultdict(lambda: {"einnahme": 0, "ausgabe": 0})
-    for e in eintraege:
-        key = e.datum.strftime('%Y-%m')
-        if e.typ.lower() == "einnahme":
-            monate[key]["einnahme"] += e.betrag
-        elif e.typ.lower() == "ausgabe":
-            monate[key]["ausgabe"] += e.betrag
-
-    labels = sorted(monate.keys())
-    daten_einnahmen = [float(monate[m]["einnahme"]) for m in labels]
-    daten_ausgaben = [float(monate[m]["ausgabe"]) for m in labels]
+    monate = get_monthly_totals(db, year)
+    labels = [f"{year}-{monat:02d}" for monat in monate]
+    daten_einnahmen = [float(data["einnahme"]) for data in monate.values()]
+    daten_ausgaben = [float(data["ausgabe"]) for data in monate.values()]
 
-    return templates.TemplateResponse("euer_uebersicht.html", {
-        "request": request,
+    return {
         "view": view,
         "year": year,
         "current_year": date.today().year,
         "available_years": available_years,
-        "eintraege": eintraege,
-        "grouped_entries": grouped_entries,
-        "manual_entries": manual_entries,
-        "timeline_items": timeline_items,
         "einnahmen_summe": einnahmen_summe,
         "ausgaben_summe": ausgaben_summe,
         "saldo": saldo,
@@ -643,61 +711,104 @@ def euer_uebersicht(request: Request, view: str = "list", year: int = None, db:
         "daten_einnahmen": daten_einnahmen,
         "daten_ausgaben": daten_ausgaben,
         "reports_data": reports_data
-    })
+    }
 
 
 @router.get("/euer/{year}/pdf")
-def generate_eur_pdf(year: int, db: Session = Depends(get_db)):
-    """Generate EÜR PDF report for a specific year"""
+async def generate_eur_pdf(request: Request, year: int, db: AsyncSession = Depends(get_async_db)):
+    """Generate EÜR PDF report for a specific year (served from the PDF cache while unchanged)"""
+    result = await db.run_sync(_eur_pdf_html, year)
+    if isinstance(result, Response):
+        return result
+    rendered_html, filename = result
+
+    # Generate PDF using WeasyPrint in the render pool, unless cached
+    try:
+        return await pdf_download(request, rendered_html, filename, stylesheets=("eur.css",))
+    except PdfQueueFull:
+        return HTMLResponse("PDF-Generierung ausgelastet, bitte später erneut versuchen", status_code=503)
+    except PdfRenderError as e:
+        return HTMLResponse(f"Fehler bei der PDF-Generierung: {str(e)}", status_code=500)
+
+
+@router.get("/euer/{year}/archiv")
+async def download_year_archive(request: Request, year: int,
+                                read_sessions: sessionmaker = Depends(get_read_sessionmaker)):
+    """Invoices, receipts and booking journal of a year as ZIP for the tax advisor (resumable download)"""
+    def build():
+        # Invoices missing from the PDF cache are rendered here, so keep it off the event loop
+        with read_sessions() as db:
+            return build_archive(db, year, pdf_pool.get_pool())
+
+    archive = await run_in_threadpool(build)
+    if not archive.rows and len(archive.entries) <= 2:
+        archive.close()
+        return HTMLResponse(f"Keine Buchungen für das Jahr {year} gefunden", status_code=404)
+    return archive_response(request, archive)
 
+
+@router.post("/api/euer/{year}/pdf")
+async def eur_pdf_job(year: int):
+    """Render the EÜR PDF in the background; status and download at /api/jobs/{job_id}"""
+    # Same year and unchanged data: same job
+    job = await run_in_threadpool(
+        submit, "euer_pdf", {"year": year},
+        f"euer_pdf:{year}:{current_version()}:{date.today().isoformat()}")
+    return job_response(job)
+
+
+@job_handler("euer_pdf")
+def _eur_pdf_job(payload: dict) -> dict:
+    """Background job: render the EÜR PDF of a year into the PDF cache."""
+    with job_session() as db:
+        result = _eur_pdf_html(db, payload["year"])
+    if isinstance(result, Response):
+        raise JobFailed(result.body.decode())
+    rendered_html, filename = result
+    key, _ = render_cached(rendered_html, ("eur.css",))
+    return {"cache_key": key, "filename": filename}
+
+
+def _eur_pdf_html(db: Session, year: int):
+    """Render the HTML of the EÜR PDF; returns (html, filename) or an error response."""
     # Get company data
     company_data = db.query(Unternehmensdaten).first()
     if not company_data:
         return HTMLResponse("Unternehmensdaten nicht gefunden", status_code=404)
 
-    # Get all entries for the year
-    entries = db.query(EinnahmeAusgabe).filter(
-        func.strftime('%Y', EinnahmeAusgabe.datum) == str(year)
-    ).order_by(EinnahmeAusgabe.datum.asc()).all()
+    # Category totals for the year from the monthly rollup
+    categories = get_category_totals(db, year)
 
-    if not entries:
+    if not categories:
         return HTMLResponse(f"Keine Buchungen für das Jahr {year} gefunden", status_code=404)
 
-    # Calculate totals
-    total_income = sum(e.betrag for e in entries if e.typ.lower() == "einnahme")
-    total_expenses = sum(e.betrag for e in entries if e.typ.lower() == "ausgabe")
-    profit = total_income - total_expenses
-
-    # Group entries by category
-    income_categories = defaultdict(list)
-    expense_categories = defaultdict(list)
+    # Group category totals by type
+    income_categories = defaultdict(lambda: {'anzahl': 0, 'summe': Decimal('0')})
+    expense_categories = defaultdict(lambda: {'anzahl': 0, 'summe': Decimal('0')})
 
-    for entry in entries:
-        if entry.typ.lower() == "einnahme":
-            category_name = entry.kategorie.name if entry.kategorie else "Sonstige Einnahmen"
-            income_categories[category_name].append(entry)
+    for category in categories:
+        if category['typ'] == "einnahme":
+            category_name = category['name'] or "Sonstige Einnahmen"
+            target = income_categories[category_name]
         else:
-            category_name = entry.kategorie.name if entry.kategorie else "Sonstige Ausgaben"
-            expense_categories[category_name].append(entry)
+            category_name = category['name'] or "Sonstige Ausgaben"
+            target = expense_categories[category_name]
+        target['anzahl'] += category['anzahl']
+        target['summe'] += category['summe']
+
+    # Calculate totals
+    total_income = sum((c['summe'] for c in income_categories.values()), Decimal('0'))
+    total_expenses = sum((c['summe'] for c in expense_categories.values()), Decimal('0'))
+    profit = total_income - total_expenses
 
     # Create monthly summary
     monthly_data = {}
-    for entry in entries:
-        month_key = entry.datum.strftime('%m/%Y')
-        if month_key not in monthly_data:
-            monthly_data[month_key] = {'income': 0, 'expenses': 0, 'balance': 0}
-
-        if entry.typ.lower() == "einnahme":
-            monthly_data[month_key]['income'] += entry.betrag
-        else:
-            monthly_data[month_key]['expenses'] += entry.betrag
-
-        monthly_data[month_key]['balance'] = (
-            monthly_data[month_key]['income'] - monthly_data[month_key]['expenses']
-        )
-
-    # Sort monthly data
-    monthly_data = dict(sorted(monthly_data.items()))
+    for monat, data in get_monthly_totals(db, year).items():
+        monthly_data[f"{monat:02d}/{year}"] = {
+            'income': data['einnahme'],
+            'expenses': data['ausgabe'],
+            'balance': data['einnahme'] - data['ausgabe']
+        }
 
     # Render HTML template
     rendered_html = templates.get_template("eur_pdf_template.html").render({
@@ -711,19 +822,4 @@ def generate_eur_pdf(year: int, db: Session = Depends(get_db)):
         "expense_categories": dict(expense_categories),
         "monthly_data": monthly_data
     })
-
-    # Generate PDF using WeasyPrint
-    try:
-        # Generate PDF directly from HTML string
-        pdf_content = HTML(string=rendered_html).write_pdf()
-
-        return Response(
-            content=pdf_content,
-            media_type='application/pdf',
-            headers={
-                'Content-Disposition': f'attachment; filename="EÜR_{year}_{company_data.unternehmen_name.replace(" ", "_")}.pdf"'
-            }
-        )
-
-    except Exception as e:
-        return HTMLResponse(f"Fehler bei der PDF-Generierung: {str(e)}", status_code=500)
+    return rendered_html, f'EÜR_{year}_{company_data.unternehmen_name.replace(" ", "_")}.pdf'
@@ -0,0 +1,28 @@
+"""Diagnostics pages for administrators (slow-query log)."""
+
+from fastapi import APIRouter, Request, Depends
+from fastapi.responses import HTMLResponse, RedirectResponse
+from sqlalchemy.orm import Session
+
+from database.db import get_db
+from app.utils.auth_utils import get_current_user
+from app.utils.slow_query_log import top_offenders
+from app.utils.template_utils import get_templates
+from config import config
+
+router = APIRouter()
+templates = get_templates()
+
+
+@router.get("/diagnose/slow-queries", response_class=HTMLResponse)
+def slow_queries(request: Request, limit: int = 20, db: Session = Depends(get_db)):
+    """List the slowest statements from the slow-query log by total time."""
+    token = request.cookies.get("session_token")
+    if not token or not get_current_user(db, token):
+        return RedirectResponse(url="/login", status_code=302)
+
+    return templates.TemplateResponse("diagnose_slow_queries.html", {
+        "request": request,
+        "offenders": top_offenders(limit),
+        "threshold_ms": config.SLOW_QUERY_MS,
+    })
@@ -1,25 +1,22 @@
 """Health check and system monitoring endpoints."""
 
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from database.db import get_db
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
+from database.db import get_async_db
+from app.utils.job_queue import get_queue
+from app.utils.report_cache import report_cache
 import time
 
 router = APIRouter()
 
 @router.get("/health")
-async def health_check(db: Session = Depends(get_db)):
+async def health_check(db: AsyncSession = Depends(get_async_db)):
     """Health check endpoint for monitoring system status."""
     try:
         # Test database connection
-        from sqlalchemy import text
-        db.execute(text("SELECT 1"))
-
-        return {
-            "status": "healthy",
-            "timestamp": time.time(),
-            "database": "connected"
-        }
+        await db.execute(text("SELECT 1"))
     except Exception as e:
         raise HTTPException(
             status_code=503,
@@ -27,4 +24,18 @@ async def health_check(db: Session = Depends(get_db)):
                 "status": "unhealthy",
                 "error": "Database connection failed"
             }
-        )
\ No newline at end of file
+        )
+
+    # The job queue is a separate SQLite file; its failure does not make the app unhealthy
+    try:
+        jobs = await run_in_threadpool(get_queue().counts)
+    except Exception as e:
+        jobs = {"status": "error", "error": str(e)}
+
+    return {
+        "status": "healthy",
+        "timestamp": time.time(),
+        "database": "connected",
+        "report_cache": report_cache.stats(),
+        "jobs": jobs
+    }
\ No newline at end of file
@@ -0,0 +1,45 @@
+"""Status and results of background jobs (see app.utils.job_queue)."""
+
+from fastapi import APIRouter, Request
+from fastapi.responses import FileResponse, JSONResponse
+from starlette.concurrency import run_in_threadpool
+
+from app.utils.data_version import is_not_modified, not_modified_response, set_etag
+from app.utils.job_queue import get_queue, job_response, resubmit
+from app.utils.pdf_cache import get_cache
+
+router = APIRouter()
+
+
+@router.get("/api/jobs/{job_id}")
+async def job_status(job_id: int):
+    """Job status as JSON: queued, running, done (with result) or failed (with error)."""
+    job = await run_in_threadpool(get_queue().get, job_id)
+    if job is None:
+        return JSONResponse({"detail": "Job nicht gefunden"}, status_code=404)
+    data = job.to_dict()
+    if job.status == "done" and job.result and "cache_key" in job.result:
+        data["download_url"] = f"/api/jobs/{job.id}/download"
+    return data
+
+
+@router.get("/api/jobs/{job_id}/download")
+async def job_download(request: Request, job_id: int):
+    """Download the PDF of a finished PDF job from the PDF cache."""
+    queue = get_queue()
+    job = await run_in_threadpool(queue.get, job_id)
+    if job is None or (job.status == "done" and not (job.result or {}).get("cache_key")):
+        return JSONResponse({"detail": "Job nicht gefunden"}, status_code=404)
+    if job.status != "done":
+        return job_response(job, status_code=409)
+
+    etag = f'"{job.result["cache_key"]}"'
+    if is_not_modified(request, etag):
+        return not_modified_response(etag)
+    path = await run_in_threadpool(get_cache().get, job.result["cache_key"])
+    if path is None:
+        # Evicted from the cache in the meantime: render again
+        job = await run_in_threadpool(resubmit, job.id)
+        return job_response(job)
+    response = FileResponse(path=path, filename=job.result["filename"], media_type="application/pdf")
+    return set_etag(response, etag)
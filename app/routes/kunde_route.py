@@ -1,5 +1,6 @@
 """Customer management API routes and endpoints."""
 
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import joinedload, Session
 from app.models.material_komponente import MaterialKomponente
 from app.models.arbeit_komponente import ArbeitKomponente
@@ -8,14 +9,19 @@ from app.models.einnahme_ausgabe import EinnahmeAusgabe
 from typing import Optional
 import datetime
 from app.models.kunde import Kunde
-from database.db import get_db
+from database.db import get_db, get_read_db, get_async_db
 from fastapi.responses import HTMLResponse, RedirectResponse
-from fastapi import APIRouter, Request, Form, Depends, HTTPException
-from app.utils.template_utils import create_templates
+from fastapi import APIRouter, Request, Response, Form, Depends, HTTPException
+from app.utils.template_utils import get_templates
+from app.utils.job_queue import submit
+from app.utils.receipts import BUCHUNG, MATERIAL, remove_receipts
+from app.utils.data_version import page_etag, is_not_modified, not_modified_response, set_etag
+from app.utils.pagination import decode_cursor, page_size
+from app.utils.read_models import load_kunden
 
 
 router = APIRouter()
-templates = create_templates()
+templates = get_templates()
 
 
 
@@ -30,38 +36,26 @@ def formular_anzeigen(request: Request, db: Session = Depends(get_db)):
     })
 
 
+async def _kunden_page(db: AsyncSession, cursor: Optional[str], limit: Optional[int]):
+    """Load one page of customers (newest first) with orders and invoice status."""
+    return await db.run_sync(load_kunden, decode_cursor(cursor), page_size(limit))
+
+
 @router.get("/kundenliste", response_class=HTMLResponse)
-def kunden_liste(request: Request, db: Session = Depends(get_db)):
+async def kunden_liste(request: Request, cursor: str = None, limit: int = None,
+                       db: AsyncSession = Depends(get_async_db)):
     """Display customer list with orders and invoice status."""
-    # Use efficient join query to avoid N+1 problem
-    from sqlalchemy.orm import selectinload
-    
-    # Load customers with their orders and invoices in optimized queries
-    kunden = db.query(Kunde).options(
-        selectinload(Kunde.auftraege)
-    ).order_by(Kunde.id.desc()).all()
-    
-    # Get all auftrag IDs to fetch invoices efficiently
-    auftrag_ids = [auftrag.id for kunde in kunden for auftrag in kunde.auftraege]
-    
-    # Fetch all invoices for these orders in a single query
-    rechnungen_dict = {}
-    if auftrag_ids:
-        rechnungen = db.query(Rechnung).filter(Rechnung.auftrag_id.in_(auftrag_ids)).all()
-        rechnungen_dict = {r.auftrag_id: r for r in rechnungen}
-    
-    # Add invoice status for each Auftrag (using pre-loaded data)
-    for kunde in kunden:
-        for auftrag in kunde.auftraege:
-            rechnung = rechnungen_dict.get(auftrag.id)
-            if rechnung:
-                auftrag.invoice_status = "bezahlt" if rechnung.bezahlt else "offen"
-            else:
-                auftrag.invoice_status = "keine Rechnung"
-    
-    return templates.TemplateResponse(
+    # Unchanged data since the client's copy: answer without touching the DB
+    etag = page_etag()
+    if is_not_modified(request, etag):
+        return not_modified_response(etag)
+
+    # Load customers with their orders and invoice status as read models
+    page = await _kunden_page(db, cursor, limit)
+
+    return set_etag(templates.TemplateResponse(
         "kunden_liste.html", {
-            "request": request, "kunden": kunden})
+            "request": request, "kunden": page.items, "page": page}), etag)
 
 
 @router.post("/kunden")
@@ -207,11 +201,38 @@ def kunde_speichern(
 
 
 @router.get("/api/kunde/{kunde_id}")
-def get_kunde_data(kunde_id: int, db: Session = Depends(get_db)):
-    kunde = db.query(Kunde).filter(Kunde.id == kunde_id).first()
+async def get_kunde_data(kunde_id: int, request: Request, response: Response,
+                         db: AsyncSession = Depends(get_async_db)):
+    etag = page_etag()
+    if is_not_modified(request, etag):
+        return not_modified_response(etag)
+
+    kunde = await db.get(Kunde, kunde_id)
     if not kunde:
         raise HTTPException(status_code=404, detail="Kunde nicht gefunden")
 
+    set_etag(response, etag)
+    return _kunde_json(kunde)
+
+
+@router.get("/api/kunden")
+async def get_kunden_page(request: Request, response: Response, cursor: str = None,
+                          limit: int = None, db: AsyncSession = Depends(get_async_db)):
+    """Customer list as JSON, one page per request; follow next_cursor for more."""
+    etag = page_etag()
+    if is_not_modified(request, etag):
+        return not_modified_response(etag)
+
+    page = await _kunden_page(db, cursor, limit)
+    set_etag(response, etag)
+    return {
+        "items": [{"id": kunde.id, **_kunde_json(kunde)} for kunde in page.items],
+        "next_cursor": page.next_cursor
+    }
+
+
+def _kunde_json(kunde) -> dict:
+    """Serialize a customer's master data for the JSON API."""
     return {
         "kundenart": kunde.kundenart,
         "kunde_firmenname": kunde.kunde_firmenname,
@@ -236,13 +257,21 @@ def kunde_loeschen(kunde_id: int, db: Session = Depends(get_db)):
     if not kunde:
         raise HTTPException(status_code=404, detail="Kunde nicht gefunden")
 
+    # Receipt files are deleted from disk after the commit
+    receipt_files = []
+
     # Delete all aufträge and their related data for this customer
     for auftrag in kunde.auftraege:
         # First, delete EÜR entries for all invoices of this auftrag
         rechnungen = db.query(Rechnung).filter(Rechnung.auftrag_id == auftrag.id).all()
         for rechnung in rechnungen:
-            # Delete all EÜR entries for each invoice
-            db.query(EinnahmeAusgabe).filter(EinnahmeAusgabe.rechnung_id == rechnung.id).delete()
+            # Delete all EÜR entries for each invoice (through the session so the
+            # monthly rollup is updated as well)
+            buchungen = db.query(EinnahmeAusgabe).filter(
+                EinnahmeAusgabe.rechnung_id == rechnung.id).all()
+            receipt_files += remove_receipts(db, BUCHUNG, [buchung.id for buchung in buchungen])
+            for buchung in buchungen:
+                db.delete(buchung)
 
             # Delete invoice PDF file(s) - handle both old and new filename formats
             from config import config
@@ -272,21 +301,10 @@ def kunde_loeschen(kunde_id: int, db: Session = Depends(get_db)):
                     except Exception as e:
                         print(f"Warning: Could not delete PDF file {pdf_filename}: {str(e)}")
 
-        # Delete material receipt files before deleting components
-        materialien = db.query(MaterialKomponente).filter(
-            MaterialKomponente.auftrag_id == auftrag.id).all()
-        for material in materialien:
-            if material.receipt_path:
-                from config import config
-                # Handle comma-separated receipt files
-                receipt_files = [f.strip() for f in material.receipt_path.split(',') if f.strip()]
-                for filename in receipt_files:
-                    receipt_path = config.RECEIPTS_DIR / filename
-                    if receipt_path.exists():
-                        try:
-                            receipt_path.unlink()
-                        except Exception as e:
-                            print(f"Warning: Could not delete receipt file {filename}: {str(e)}")
+        # Receipts of the materials go with the components
+        material_ids = [m.id for m in db.query(MaterialKomponente.id).filter(
+            MaterialKomponente.auftrag_id == auftrag.id)]
+        receipt_files += remove_receipts(db, MATERIAL, material_ids)
 
         # Then delete invoices
         db.query(Rechnung).filter(Rechnung.auftrag_id == auftrag.id).delete()
@@ -304,11 +322,14 @@ def kunde_loeschen(kunde_id: int, db: Session = Depends(get_db)):
     db.delete(kunde)
     db.commit()
 
+    if receipt_files:
+        submit("dateien_loeschen", {"dir": "RECEIPTS_DIR", "files": receipt_files})
+
     return RedirectResponse(url="/kundenliste", status_code=303)
 
 
 @router.get("/api/auftrag/{auftrag_id}")
-def get_auftrag_details(auftrag_id: int, db: Session = Depends(get_db)):
+def get_auftrag_details(auftrag_id: int, db: Session = Depends(get_read_db)):
     """Get detailed auftrag information including components and invoice status."""
     from app.models.auftrag import Auftrag
 
@@ -1,100 +1,49 @@
 """Invoice generation, PDF creation and billing management routes."""
 
-from fastapi import APIRouter, Request, Form, Depends, UploadFile, File
-from fastapi.responses import HTMLResponse, FileResponse
-from app.utils.template_utils import create_templates
-from sqlalchemy.orm import Session, joinedload
-from database.db import get_db
+from fastapi import APIRouter, Request, Response, Form, Depends, UploadFile, File
+from fastapi.responses import HTMLResponse, FileResponse, JSONResponse
+from starlette.concurrency import run_in_threadpool
+from app.utils.template_utils import StreamingTemplateResponse, get_templates
+from app.utils.file_validation import SavedUpload, UploadRejected, save_upload
+from app.utils.data_version import current_version, page_etag, is_not_modified, not_modified_response, set_etag
+from app.utils import load_profiles, pdf_pool
+from app.utils.pagination import decode_cursor, page_size
+from app.utils.job_queue import JobFailed, job_handler, job_response, job_session, report_progress, submit
+from app.utils.pdf_cache import cached_pdf, pdf_download, render_cached
+from app.utils.rechnung_batch import build_rechnung, finished_order_ids, render_rechnung_html, run_batch
+from app.utils.pdf_pool import PdfQueueFull, PdfRenderError
+from app.utils.receipts import (BUCHUNG, MATERIAL, add_receipt, find_receipt, mime_type,
+                                remove_receipt, remove_receipts)
+from app.utils.read_models import (load_manuelle_buchungen, load_rechnungen,
+                                   stream_manuelle_buchungen, stream_rechnungen)
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, sessionmaker
+from database.db import get_db, get_async_db, get_read_sessionmaker
 from app.models.rechnung import Rechnung
 from app.models.kunde import Kunde
 from app.models.auftrag import Auftrag
 from app.models.arbeit_komponente import ArbeitKomponente
 from app.models.unternehmensdaten import Unternehmensdaten
 from app.models.material_komponente import MaterialKomponente
-from sqlalchemy import false, true
+from sqlalchemy import false, true, func, select
 from fastapi.responses import RedirectResponse
 from app.models.einnahme_ausgabe import EinnahmeAusgabe
 from datetime import date
+from typing import List, Optional
 from app.models.eur_kategorie import EurKategorie
 
 
-from weasyprint import HTML
+import asyncio
 import datetime
 import os
 import secrets
+import shutil
 from pathlib import Path
-import base64
 from config import config
 
 
 router = APIRouter()
-templates = create_templates()
-
-
-# Add JSON filter to Jinja2
-def from_json(value):
-    if value:
-        try:
-            import json
-            return json.loads(value)
-        except (ValueError, TypeError):
-            return []
-    return []
-
-templates.env.filters['from_json'] = from_json
-
-# File security validation
-ALLOWED_FILE_TYPES = {'.pdf', '.jpg', '.jpeg', '.png', '.gif', '.tiff', '.bmp'}
-MAX_FILE_SIZE = 10 * 1024 * 1024  # 10MB
-
-def validate_file_upload(file) -> tuple[bool, str]:
-    """Validate uploaded file for security and constraints."""
-    if not file or not hasattr(file, 'filename') or not file.filename:
-        return False, "Keine Datei ausgewählt"
-    
-    # Check file extension
-    file_extension = os.path.splitext(file.filename.lower())[1]
-    if file_extension not in ALLOWED_FILE_TYPES:
-        return False, f"Dateityp nicht erlaubt. Erlaubte Typen: {', '.join(ALLOWED_FILE_TYPES)}"
-    
-    # Read file to check size and basic content validation
-    file_content = file.file.read()
-    file.file.seek(0)  # Reset file pointer
-    
-    # Check file size
-    if len(file_content) > MAX_FILE_SIZE:
-        return False, f"Datei zu groß. Maximum: {MAX_FILE_SIZE // (1024*1024)}MB"
-    
-    # Basic content validation for images
-    if file_extension in {'.jpg', '.jpeg', '.png', '.gif', '.tiff', '.bmp'}:
-        # Check if file starts with expected magic bytes
-        if file_extension in {'.jpg', '.jpeg'} and not file_content.startswith(b'\xff\xd8'):
-            return False, "Ungültiges JPEG-Format"
-        elif file_extension == '.png' and not file_content.startswith(b'\x89PNG'):
-            return False, "Ungültiges PNG-Format"
-        elif file_extension == '.gif' and not file_content.startswith(b'GIF8'):
-            return False, "Ungültiges GIF-Format"
-    
-    # Basic content validation for PDF
-    elif file_extension == '.pdf' and not file_content.startswith(b'%PDF'):
-        return False, "Ungültiges PDF-Format"
-    
-    return True, "OK"
-
-# German decimal formatting function
-def format_german_decimal(value, decimals=2):
-    """Format number with German decimal notation (comma instead of dot)"""
-    if value is None:
-        value = 0
-    # Format with specified decimal places, then replace dot with comma
-    formatted = f"{float(value):.{decimals}f}"
-    return formatted.replace('.', ',')
-
-# Add filters to Jinja2 environment
-templates.env.filters['german_decimal'] = format_german_decimal
-templates.env.filters['basename'] = lambda path: os.path.basename(path) if path else ''
-
-
+templates = get_templates()
 
 
 @router.get("/rechnung", response_class=HTMLResponse)
@@ -111,13 +60,42 @@ def formular_rechnung(request: Request, db: Session = Depends(get_db)):
 
 
 @router.post("/rechnungen")
-def rechnung_erstellen(
+async def rechnung_erstellen(
     request: Request,
     kunde_id: int = Form(...),
     auftrag_id: int = Form(...),
     rechnungsdatum: str = Form(...),
     db: Session = Depends(get_db)
 ):
+    # Rechnung anlegen und HTML rendern im Threadpool, PDF im Render-Pool
+    result = await run_in_threadpool(_rechnung_anlegen, db, kunde_id, auftrag_id, rechnungsdatum)
+    if isinstance(result, Response):
+        return result
+    rendered_html, pdf_path = result
+
+    try:
+        _, cached_path = await cached_pdf(rendered_html, stylesheets=("rechnung.css",))
+    except PdfQueueFull:
+        return HTMLResponse(
+            "PDF-Generierung ausgelastet, bitte später erneut versuchen",
+            status_code=503)
+    except PdfRenderError as e:
+        return HTMLResponse(
+            f"PDF-Generierung fehlgeschlagen: {e}",
+            status_code=500)
+    # Archivkopie in rechnungen/
+    await run_in_threadpool(shutil.copyfile, cached_path, pdf_path)
+
+    # PDF ausliefern
+    return FileResponse(
+        path=pdf_path,
+        filename=pdf_path.name,
+        media_type="application/pdf"
+    )
+
+
+def _rechnung_anlegen(db: Session, kunde_id: int, auftrag_id: int, rechnungsdatum: str):
+    """Legt die Rechnung an und rendert ihr HTML; liefert (HTML, PDF-Pfad) oder eine Fehlerantwort."""
     # Validate and parse the invoice date
     from app.utils.form_validation import FormValidator
     is_valid, error_msg = FormValidator.validate_date(rechnungsdatum, "Rechnungsdatum", allow_future=True)
@@ -175,123 +153,142 @@ def rechnung_erstellen(
         """
         return HTMLResponse(content=error_message, status_code=400)
 
-    # Summen berechnen (nur wenn keine existierende Rechnung vorhanden)
-    gesamt_arbeit = 0
-    for k in komponenten:
-        if k.berechnungsbasis == "stunden":
-            gesamt_arbeit += float(k.anzahl_stunden or 0) * float(k.stundenlohn or 0)
-        elif k.berechnungsbasis == "quadratmeter":
-            gesamt_arbeit += float(k.anzahl_quadrat or 0) * float(k.preis_pro_quadrat or 0)
-    gesamt_material = sum(
-        float(m.preis_pro_einheit or 0) * float(m.anzahl or 1)
-        for m in materialien
-    )
-
-    faelligkeit = datetime.date.today() + datetime.timedelta(days=30)
-
-    # Neue Rechnung anlegen
-    neue_rechnung = Rechnung(
-        kunde_id=kunde.id,
-        auftrag_id=auftrag.id,
-        unternehmensdaten_id=1,  # Anpassen falls mehrere Unternehmen
-        rechnungsdatum=parsed_rechnungsdatum,
-        faelligkeit=faelligkeit,
-        rechtlicher_hinweis="Zahlbar ohne Abzug innerhalb von 14 Tagen.",
-        rechnungssumme_arbeit=gesamt_arbeit,
-        rechnungssumme_material=gesamt_material,
-        rechnungssumme_gesamt=float(gesamt_arbeit) + float(gesamt_material)
-    )
+    # Neue Rechnung anlegen (Summen nur wenn keine existierende Rechnung vorhanden)
+    neue_rechnung = build_rechnung(auftrag, parsed_rechnungsdatum, komponenten, materialien,
+                                   kunde_id=kunde.id)
     db.add(neue_rechnung)
     
     db.commit()
     db.refresh(neue_rechnung)
 
-    unternehmensdaten = db.query(Unternehmensdaten).first()
-
-    # Logo laden und Base64-kodieren
-    with open(config.STATIC_DIR / "logo.png", "rb") as img_file:
-        logo_base64 = base64.b64encode(img_file.read()).decode('utf-8')
-
-    # HTML rendern
-    rendered_html = templates.get_template("rechnung_template.html").render({
-        "kunde": kunde,
-        "auftrag": auftrag,
-        "komponenten": komponenten,
-        "materialien": materialien,
-        "rechnung": neue_rechnung,
-        "unternehmensdaten": unternehmensdaten,
-        "logo_base64": logo_base64
-    })
+    rendered_html, pdf_filename = render_rechnung_html(db, neue_rechnung)
 
     # PDF-Ordner sicherstellen
     config.ensure_directories()
+    return rendered_html, config.INVOICES_DIR / pdf_filename
 
-    # Create customer name for filename (safe for filesystem)
-    if kunde.kundenart == "Privatkunde":
-        customer_name = f"{kunde.kunde_vorname}_{kunde.kunde_nachname}"
-    else:
-        customer_name = kunde.kunde_firmenname or "Unbekannt"
 
-    # Clean customer name for filename (remove special characters)
-    safe_customer_name = "".join(c for c in customer_name if c.isalnum() or c in ('_', '-')).strip()
+async def _rechnungen_page(db: AsyncSession, status: Optional[str],
+                           cursor: Optional[str], limit: Optional[int]):
+    """Load one page of invoices (newest first) as read models, optionally filtered by status."""
+    return await db.run_sync(load_rechnungen, status, decode_cursor(cursor), page_size(limit))
 
-    # PDF-Datei erstellen (nach Rechnungs-ID und Kunde benannt)
-    pdf_path = config.INVOICES_DIR / f"Rechnung_{neue_rechnung.id}_{safe_customer_name}.pdf"
 
-    try:
-        HTML(string=rendered_html).write_pdf(str(pdf_path))
-    except Exception as e:
-        db.rollback()
-        return HTMLResponse(
-            f"PDF-Generierung fehlgeschlagen: {e}",
-            status_code=500)
-
-    # PDF ausliefern
-    return FileResponse(
-        path=pdf_path,
-        filename=f"Rechnung_{neue_rechnung.id}_{safe_customer_name}.pdf",
-        media_type="application/pdf"
-    )
+async def _manuelle_buchungen_page(db: AsyncSession, cursor: Optional[str], limit: Optional[int]):
+    """Load one page of bookings not linked to an invoice (newest first) as read models."""
+    return await db.run_sync(load_manuelle_buchungen, decode_cursor(cursor), page_size(limit))
 
 
 @router.get("/rechnungsliste")
-def rechnungsliste(
+async def rechnungsliste(
         request: Request,
-        db: Session = Depends(get_db),
-        status: str = None):
-    # Get counts for each category
-    alle_count = db.query(Rechnung).count()
-    offene_count = db.query(Rechnung).filter(Rechnung.bezahlt == false()).count()
-    bezahlte_count = db.query(Rechnung).filter(Rechnung.bezahlt == true()).count()
-    
-    # Filter rechnungen based on status
-    query = db.query(Rechnung)
-    if status == "offen":
-        query = query.filter(Rechnung.bezahlt == false())
-    elif status == "bezahlt":
-        query = query.filter(Rechnung.bezahlt == true())
-
-    rechnungen = query.order_by(Rechnung.id.desc()).all()
-    
-    # Get manual entries (bookings not linked to invoices) only for "alle rechnungen" tab
-    manual_entries = []
-    if status is None:  # Only show manual entries in "alle rechnungen" tab
-        manual_entries = db.query(EinnahmeAusgabe).filter(
-            EinnahmeAusgabe.rechnung_id.is_(None)
-        ).order_by(EinnahmeAusgabe.datum.desc()).all()
-
-    return templates.TemplateResponse(
+        read_sessions: sessionmaker = Depends(get_read_sessionmaker),
+        status: str = None,
+        cursor: str = None,
+        buchungen_cursor: str = None,
+        limit: int = None):
+    etag = page_etag()
+    if is_not_modified(request, etag):
+        return not_modified_response(etag)
+
+    # Validate before streaming starts; afterwards the status is sent
+    after, size = decode_cursor(cursor), page_size(limit)
+    buchungen_after = decode_cursor(buchungen_cursor)
+
+    # The rows are read from a server-side cursor while the page is sent,
+    # with a session the response closes when it is done. The tab counts use
+    # the same session, so they come from the same snapshot as the rows.
+    stream_db = read_sessions()
+    try:
+        # Get counts for each category in one statement
+        counts = await run_in_threadpool(lambda: stream_db.execute(select(
+            func.count(Rechnung.id),
+            func.count(Rechnung.id).filter(Rechnung.bezahlt == false()),
+            func.count(Rechnung.id).filter(Rechnung.bezahlt == true())
+        )).one())
+        alle_count, offene_count, bezahlte_count = counts
+
+        # Filter rechnungen based on status
+        rechnungen_page = stream_rechnungen(stream_db, status, after, size)
+
+        # Get manual entries (bookings not linked to invoices) only for "alle rechnungen" tab
+        buchungen_page = None
+        if status is None:  # Only show manual entries in "alle rechnungen" tab
+            buchungen_page = stream_manuelle_buchungen(stream_db, buchungen_after, size)
+    except Exception:
+        stream_db.close()
+        raise
+
+    return set_etag(StreamingTemplateResponse(
+        templates,
         "rechnung_liste.html",
         {
             "request": request,
-            "rechnungen": rechnungen,
+            "rechnungen": rechnungen_page.items,
+            "rechnungen_page": rechnungen_page,
             "status": status,
             "alle_count": alle_count,
             "offene_count": offene_count,
             "bezahlte_count": bezahlte_count,
-            "manual_entries": manual_entries
-        }
-    )
+            "manual_entries": buchungen_page.items if buchungen_page else [],
+            "buchungen_page": buchungen_page
+        },
+        on_close=stream_db.close
+    ), etag)
+
+
+@router.get("/api/rechnungen")
+async def get_rechnungen_page(request: Request, response: Response, status: str = None,
+                              cursor: str = None, limit: int = None,
+                              db: AsyncSession = Depends(get_async_db)):
+    """Invoice list as JSON, one page per request; follow next_cursor for more."""
+    etag = page_etag()
+    if is_not_modified(request, etag):
+        return not_modified_response(etag)
+
+    page = await _rechnungen_page(db, status, cursor, limit)
+    set_etag(response, etag)
+    return {
+        "items": [
+            {
+                "id": r.id,
+                "kunde_id": r.kunde_id,
+                "auftrag_id": r.auftrag_id,
+                "rechnungsdatum": r.rechnungsdatum.isoformat() if r.rechnungsdatum else None,
+                "rechnungssumme_gesamt": r.rechnungssumme_gesamt,
+                "bezahlt": r.bezahlt,
+                "payment_date": r.payment_date.isoformat() if r.payment_date else None
+            }
+            for r in page.items
+        ],
+        "next_cursor": page.next_cursor
+    }
+
+
+@router.get("/api/buchungen/manuell")
+async def get_manuelle_buchungen_page(request: Request, response: Response, cursor: str = None,
+                                      limit: int = None, db: AsyncSession = Depends(get_async_db)):
+    """Bookings without invoice as JSON, one page per request (newest first)."""
+    etag = page_etag()
+    if is_not_modified(request, etag):
+        return not_modified_response(etag)
+
+    page = await _manuelle_buchungen_page(db, cursor, limit)
+    set_etag(response, etag)
+    return {
+        "items": [
+            {
+                "id": entry.id,
+                "datum": entry.datum.isoformat(),
+                "typ": entry.typ,
+                "betrag": entry.betrag,
+                "beschreibung": entry.beschreibung,
+                "kategorie": entry.kategorie.name if entry.kategorie else None
+            }
+            for entry in page.items
+        ],
+        "next_cursor": page.next_cursor
+    }
 
 
 
@@ -299,31 +296,24 @@ def rechnungsliste(
 def material_kosten_formular(rechnung_id: int, request: Request, db: Session = Depends(get_db)):
     """Form to enter actual material costs for a specific invoice."""
     rechnung = db.query(Rechnung).options(
-        joinedload(Rechnung.kunde),
-        joinedload(Rechnung.auftrag)
+        *load_profiles.MATERIALKOSTEN
     ).filter(Rechnung.id == rechnung_id).first()
     if not rechnung:
         return HTMLResponse("Rechnung nicht gefunden", status_code=404)
 
-    # Get all materials for this invoice's order
-    materialien = db.query(MaterialKomponente).filter(
-        MaterialKomponente.auftrag_id == rechnung.auftrag_id
-    ).all()
+    # Materials of this invoice's order are loaded with the invoice
+    materialien = rechnung.auftrag.materialien
 
     # Check for existing material cost bookings to get the current date
-    materialkosten_kategorie = db.query(EurKategorie).filter_by(
-        name="Materialkosten", typ="ausgabe"
+    existing_booking = db.query(EinnahmeAusgabe.datum).join(
+        EinnahmeAusgabe.kategorie
+    ).filter(
+        EinnahmeAusgabe.rechnung_id == rechnung_id,
+        EinnahmeAusgabe.typ == "ausgabe",
+        EurKategorie.name == "Materialkosten",
+        EurKategorie.typ == "ausgabe"
     ).first()
-
-    existing_cost_date = None
-    if materialkosten_kategorie:
-        existing_booking = db.query(EinnahmeAusgabe).filter(
-            EinnahmeAusgabe.rechnung_id == rechnung_id,
-            EinnahmeAusgabe.typ == "ausgabe",
-            EinnahmeAusgabe.kategorie_id == materialkosten_kategorie.id
-        ).first()
-        if existing_booking:
-            existing_cost_date = existing_booking.datum
+    existing_cost_date = existing_booking.datum if existing_booking else None
 
     return templates.TemplateResponse("material_kosten_form.html", {
         "request": request,
@@ -377,6 +367,7 @@ async def material_kosten_speichern(
     total_expenses = Decimal('0.00')
     
     # First pass: Handle file uploads separately from cost/expense logic
+    uploads = []  # (material, file number, upload, target file name)
     for material in materialien:
         receipt_key = f"receipt_{material.id}"
         receipt_files = form_data.getlist(receipt_key)
@@ -404,40 +395,35 @@ async def material_kosten_speichern(
                         valid_files.append(f)
         
         if valid_files:
-            # Initialize with existing files (preserve them)
-            saved_filenames = []
-            if material.receipt_path:
-                existing_filenames = [f.strip() for f in material.receipt_path.split(',') if f.strip()]
-                saved_filenames.extend(existing_filenames)
-            
-            # Process each uploaded file
+            # Existing receipts are kept, new ones are numbered after them
+            total_existing_files = len(material.receipts)
+
             for i, receipt_file in enumerate(valid_files):
-                # Validate file upload security
-                is_valid, error_message = validate_file_upload(receipt_file)
-                if not is_valid:
-                    return HTMLResponse(f"Datei-Upload fehlgeschlagen für {material.bezeichnung} (Datei {i+1}): {error_message}", status_code=400)
-                
                 # Create safe filename with proper indexing (considering existing files)
                 file_extension = os.path.splitext(receipt_file.filename.lower())[1]
-                total_existing_files = len(saved_filenames)
                 file_index = total_existing_files + i + 1
                 safe_filename = f"material_{rechnung_id}_{material.id}_{file_index}_{secrets.token_hex(6)}{file_extension}"
-                
-                file_path = config.RECEIPTS_DIR / safe_filename
-                
-                # Save file
-                try:
-                    with open(file_path, "wb") as buffer:
-                        content = await receipt_file.read()
-                        buffer.write(content)
-                    
-                    saved_filenames.append(safe_filename)
-                except Exception as e:
-                    return HTMLResponse(f"Fehler beim Speichern der Datei für {material.bezeichnung} (Datei {i+1}): {str(e)}", status_code=500)
-            
-            # Only update the database if we actually processed files
-            if saved_filenames:
-                material.receipt_path = ','.join(saved_filenames)
+                uploads.append((material, i, receipt_file, safe_filename))
+
+    # Validate and save all files at once, each streamed in chunks in a worker thread
+    results = await asyncio.gather(
+        *(run_in_threadpool(save_upload, receipt_file, config.RECEIPTS_DIR, safe_filename)
+          for _, _, receipt_file, safe_filename in uploads),
+        return_exceptions=True)
+    failed = next(((upload, result) for upload, result in zip(uploads, results)
+                   if isinstance(result, BaseException)), None)
+    if failed:
+        # Nothing is registered, so remove the files that did arrive
+        for result in results:
+            if isinstance(result, SavedUpload):
+                (config.RECEIPTS_DIR / result.filename).unlink(missing_ok=True)
+        (material, i, _, _), error = failed
+        if isinstance(error, UploadRejected):
+            return HTMLResponse(f"Datei-Upload fehlgeschlagen für {material.bezeichnung} (Datei {i+1}): {error}", status_code=400)
+        return HTMLResponse(f"Fehler beim Speichern der Datei für {material.bezeichnung} (Datei {i+1}): {str(error)}", status_code=500)
+    for (material, _, _, _), saved in zip(uploads, results):
+        add_receipt(db, MATERIAL, material.id, saved.filename, size=saved.size, sha256=saved.sha256)
+    files_uploaded = len(uploads)
     
     # Second pass: Check if any costs are provided OR if existing costs exist (for date updates)
     for material in materialien:
@@ -501,7 +487,6 @@ async def material_kosten_speichern(
     db.commit()
 
     # Add a simple success message in the URL for debugging
-    files_uploaded = sum(1 for material in materialien if material.receipt_path and ',' in material.receipt_path or material.receipt_path)
     return RedirectResponse(f"/rechnungsliste?upload_success=1&files={files_uploaded}", status_code=303)
 
 
@@ -524,32 +509,14 @@ async def delete_material_receipt(
     if not material:
         return HTMLResponse("Material nicht gefunden", status_code=404)
     
-    # Handle comma-separated list of files
-    if not material.receipt_path:
-        return HTMLResponse("Keine Belege vorhanden", status_code=404)
-    
-    receipt_files = [f.strip() for f in material.receipt_path.split(',')]
-    
-    # Verify the filename exists in the list
-    if filename not in receipt_files:
+    # Only receipts of this material can be deleted
+    if not remove_receipt(db, MATERIAL, material.id, filename):
         return HTMLResponse("Datei stimmt nicht überein", status_code=400)
     
-    # Delete the file from disk
-    receipt_path = config.RECEIPTS_DIR / filename
-    if receipt_path.exists():
-        try:
-            receipt_path.unlink()
-        except Exception as e:
-            return HTMLResponse(f"Fehler beim Löschen der Datei: {str(e)}", status_code=500)
-    
-    # Remove the file from the list and update database
-    receipt_files.remove(filename)
-    if receipt_files:
-        material.receipt_path = ','.join(receipt_files)
-    else:
-        material.receipt_path = None
-    
     db.commit()
+
+    # Delete the file from disk in the background; submitting blocks on the queue file
+    await run_in_threadpool(submit, "dateien_loeschen", {"dir": "RECEIPTS_DIR", "files": [filename]})
     
     # Return JSON response for AJAX requests
     accept_header = request.headers.get('accept', '')
@@ -569,21 +536,8 @@ def download_receipt(filename: str, db: Session = Depends(get_db)):
         return HTMLResponse("Ungültiger Dateiname", status_code=400)
     
     # Verify file exists in database (ensures it's a legitimate receipt)
-    # Check if filename exists in any comma-separated receipt_path
-    materials_with_receipts = db.query(MaterialKomponente).filter(
-        MaterialKomponente.receipt_path.like(f'%{filename}%')
-    ).all()
-    
-    material_with_receipt = None
-    # Additional verification: ensure filename is actually in the comma-separated list
-    for material in materials_with_receipts:
-        if material.receipt_path:
-            receipt_files = [f.strip() for f in material.receipt_path.split(',') if f.strip()]
-            if filename in receipt_files:
-                material_with_receipt = material
-                break
-    
-    if not material_with_receipt:
+    receipt = find_receipt(db, filename)
+    if not receipt:
         return HTMLResponse("Beleg nicht in der Datenbank gefunden", status_code=404)
     
     receipt_path = config.RECEIPTS_DIR / filename
@@ -591,70 +545,111 @@ def download_receipt(filename: str, db: Session = Depends(get_db)):
     if not receipt_path.exists():
         return HTMLResponse("Beleg-Datei nicht auf der Festplatte gefunden", status_code=404)
     
-    # Determine content type based on file extension
-    file_extension = os.path.splitext(filename.lower())[1]
-    content_types = {
-        '.pdf': 'application/pdf',
-        '.jpg': 'image/jpeg',
-        '.jpeg': 'image/jpeg',
-        '.png': 'image/png',
-        '.gif': 'image/gif',
-        '.tiff': 'image/tiff',
-        '.bmp': 'image/bmp'
-    }
-    
-    media_type = content_types.get(file_extension, 'application/octet-stream')
-    
     return FileResponse(
         path=str(receipt_path),
         filename=filename,
-        media_type=media_type
+        media_type=receipt.mime_type or mime_type(filename)
     )
 
 
 @router.get("/rechnung/{rechnung_id}/download")
-def download_rechnung_pdf(rechnung_id: int, db: Session = Depends(get_db)):
-    """Download einer spezifischen Rechnungs-PDF."""
-    # Prüfe ob Rechnung existiert
-    rechnung = db.query(Rechnung).filter(Rechnung.id == rechnung_id).first()
+async def download_rechnung_pdf(request: Request, rechnung_id: int,
+                                db: AsyncSession = Depends(get_async_db)):
+    """Download einer Rechnungs-PDF aus dem PDF-Cache; geänderte Daten werden neu gerendert."""
+    result = await db.run_sync(_rechnung_download_html, rechnung_id)
+    if isinstance(result, Response):
+        return result
+    rendered_html, pdf_filename = result
+
+    try:
+        return await pdf_download(request, rendered_html, pdf_filename, stylesheets=("rechnung.css",))
+    except PdfRenderError as e:
+        # Render-Pool ausgelastet oder Fehler: Archivkopie aus rechnungen/ ausliefern
+        archived_path = config.INVOICES_DIR / pdf_filename
+        if archived_path.exists():
+            return FileResponse(path=archived_path, filename=pdf_filename, media_type="application/pdf")
+        if isinstance(e, PdfQueueFull):
+            return HTMLResponse(
+                "PDF-Generierung ausgelastet, bitte später erneut versuchen",
+                status_code=503)
+        return HTMLResponse(f"PDF-Generierung fehlgeschlagen: {e}", status_code=500)
+
+
+def _rechnung_download_html(db: Session, rechnung_id: int):
+    """Rendert das HTML einer bestehenden Rechnung; liefert (HTML, Dateiname) oder 404."""
+    rechnung = db.get(Rechnung, rechnung_id)
     if not rechnung:
         return HTMLResponse("Rechnung nicht gefunden", status_code=404)
+    return render_rechnung_html(db, rechnung)
+
+
+@router.post("/api/rechnungen/{rechnung_id}/pdf")
+async def rechnung_pdf_job(rechnung_id: int):
+    """Rechnungs-PDF im Hintergrund erzeugen; Status und Download unter /api/jobs/{job_id}."""
+    # Gleiche Rechnung bei unveränderten Daten: derselbe Job
+    job = await run_in_threadpool(
+        submit, "rechnung_pdf", {"rechnung_id": rechnung_id},
+        f"rechnung_pdf:{rechnung_id}:{current_version()}")
+    return job_response(job)
+
+
+@job_handler("rechnung_pdf")
+def _rechnung_pdf_job(payload: dict) -> dict:
+    """Hintergrund-Job: Rechnungs-PDF in den PDF-Cache rendern."""
+    with job_session() as db:
+        result = _rechnung_download_html(db, payload["rechnung_id"])
+    if isinstance(result, Response):
+        raise JobFailed("Rechnung nicht gefunden")
+    rendered_html, pdf_filename = result
+    key, _ = render_cached(rendered_html, ("rechnung.css",))
+    return {"cache_key": key, "filename": pdf_filename}
+
+
+@router.post("/api/rechnungen/batch")
+async def rechnungen_batch(
+    auftrag_ids: List[int] = Form([]),
+    alle_fertigen: bool = Form(False),
+    rechnungsdatum: Optional[str] = Form(None)
+):
+    """
+    Rechnungen für mehrere Aufträge im Hintergrund erstellen.
+
+    Entweder die angegebenen Aufträge oder alle fertigen Aufträge ohne Rechnung
+    (alle_fertigen). Fortschritt, erstellte Rechnungen und Fehler je Auftrag
+    unter /api/jobs/{job_id}.
+    """
+    if not auftrag_ids and not alle_fertigen:
+        return JSONResponse({"detail": "Keine Aufträge angegeben"}, status_code=400)
+    try:
+        datum = (datetime.datetime.strptime(rechnungsdatum, "%Y-%m-%d").date()
+                 if rechnungsdatum else date.today())
+    except ValueError:
+        return JSONResponse({"detail": "Ungültiges Rechnungsdatum"}, status_code=400)
 
-    # Get customer information for filename
-    kunde = rechnung.kunde
-    if kunde.kundenart == "Privatkunde":
-        customer_name = f"{kunde.kunde_vorname}_{kunde.kunde_nachname}"
-    else:
-        customer_name = kunde.kunde_firmenname or "Unbekannt"
-
-    # Clean customer name for filename
-    safe_customer_name = "".join(c for c in customer_name if c.isalnum() or c in ('_', '-')).strip()
-
-    # Try new filename format first
-    new_pdf_filename = f"Rechnung_{rechnung_id}_{safe_customer_name}.pdf"
-    new_pdf_path = config.INVOICES_DIR / new_pdf_filename
-
-    # Fall back to old filename format if new doesn't exist
-    old_pdf_filename = f"Rechnung_{rechnung_id}.pdf"
-    old_pdf_path = config.INVOICES_DIR / old_pdf_filename
-
-    if new_pdf_path.exists():
-        pdf_path = new_pdf_path
-        pdf_filename = new_pdf_filename
-        print(f"DEBUG: Using NEW file: {pdf_path}")
-    elif old_pdf_path.exists():
-        pdf_path = old_pdf_path
-        pdf_filename = new_pdf_filename  # Use new filename for download even with old file
-        print(f"DEBUG: Using OLD file: {pdf_path}, serving as: {pdf_filename}")
-    else:
-        print(f"DEBUG: NO FILE FOUND - new: {new_pdf_path}, old: {old_pdf_path}")
-        return HTMLResponse("PDF-Datei nicht gefunden", status_code=404)
+    payload = {"auftrag_ids": sorted(set(auftrag_ids)), "alle_fertigen": alle_fertigen,
+               "rechnungsdatum": datum.isoformat()}
+    # Doppelt abgeschickt bei unveränderten Daten: derselbe Job
+    key = "rechnungen_batch:{}:{}:{}".format(
+        "fertig" if alle_fertigen else ",".join(map(str, payload["auftrag_ids"])),
+        payload["rechnungsdatum"], current_version())
+    job = await run_in_threadpool(submit, "rechnungen_batch", payload, key)
+    return job_response(job)
 
-    return FileResponse(
-        path=str(pdf_path),
-        filename=pdf_filename,
-        media_type='application/pdf'
-    )
+
+@job_handler("rechnungen_batch")
+def _rechnungen_batch_job(payload: dict) -> dict:
+    """Hintergrund-Job: Rechnungen anlegen und ihre PDFs parallel rendern."""
+    rechnungsdatum = datetime.date.fromisoformat(payload["rechnungsdatum"])
+
+    def progress(fertig, gesamt, entry):
+        report_progress({"fertig": fertig, "gesamt": gesamt})
+
+    with job_session() as db:
+        auftrag_ids = payload["auftrag_ids"]
+        if payload["alle_fertigen"]:
+            auftrag_ids = finished_order_ids(db, rechnungsdatum)
+        result = run_batch(db, auftrag_ids, rechnungsdatum, pdf_pool.get_pool(), progress)
+    return result.to_dict()
 
 
 @router.post("/rechnung/{rechnung_id}/loeschen")
@@ -665,10 +660,13 @@ def delete_rechnung(rechnung_id: int, db: Session = Depends(get_db)):
     if not rechnung:
         return HTMLResponse("Rechnung nicht gefunden", status_code=404)
 
+    # Dateien werden erst nach dem Commit im Hintergrund gelöscht
+    receipt_files = []
     try:
         # Delete all related EÜR bookings first (to maintain referential integrity)
         related_bookings = db.query(EinnahmeAusgabe).filter(
             EinnahmeAusgabe.rechnung_id == rechnung_id).all()
+        receipt_files += remove_receipts(db, BUCHUNG, [booking.id for booking in related_bookings])
         for booking in related_bookings:
             db.delete(booking)
 
@@ -679,25 +677,13 @@ def delete_rechnung(rechnung_id: int, db: Session = Depends(get_db)):
                 MaterialKomponente.auftrag_id == rechnung.auftrag_id
             ).all()
 
+            # Receipts of the materials are removed with the invoice
+            receipt_files += remove_receipts(db, MATERIAL, [material.id for material in materialien])
             for material in materialien:
-                if material.receipt_path:
-                    # Handle comma-separated receipt files
-                    receipt_files = [f.strip() for f in material.receipt_path.split(',') if f.strip()]
-                    for filename in receipt_files:
-                        receipt_path = config.RECEIPTS_DIR / filename
-                        if receipt_path.exists():
-                            try:
-                                receipt_path.unlink()
-                            except Exception as e:
-                                print(f"Warning: Could not delete receipt file {filename}: {str(e)}")
-
-                    # Clear the receipt_path from database
-                    material.receipt_path = None
-
                 # Clear material cost data since invoice is being deleted
                 material.actual_cost = None
 
-        # Delete the invoice PDF file if it exists (try both old and new formats)
+        # Delete the invoice PDF file (both old and new formats)
         kunde = rechnung.kunde
         if kunde.kundenart == "Privatkunde":
             customer_name = f"{kunde.kunde_vorname}_{kunde.kunde_nachname}"
@@ -707,28 +693,17 @@ def delete_rechnung(rechnung_id: int, db: Session = Depends(get_db)):
         # Clean customer name for filename
         safe_customer_name = "".join(c for c in customer_name if c.isalnum() or c in ('_', '-')).strip()
 
-        # Try to delete new filename format first
-        new_pdf_filename = f"Rechnung_{rechnung_id}_{safe_customer_name}.pdf"
-        new_pdf_path = config.INVOICES_DIR / new_pdf_filename
-
-        # Also try old filename format
-        old_pdf_filename = f"Rechnung_{rechnung_id}.pdf"
-        old_pdf_path = config.INVOICES_DIR / old_pdf_filename
-
-        for pdf_path, pdf_filename in [(new_pdf_path, new_pdf_filename), (old_pdf_path, old_pdf_filename)]:
-            if pdf_path.exists():
-                try:
-                    pdf_path.unlink()
-                    print(f"Deleted PDF file: {pdf_filename}")
-                except Exception as e:
-                    print(f"Warning: Could not delete PDF file {pdf_filename}: {str(e)}")
+        pdf_files = [f"Rechnung_{rechnung_id}_{safe_customer_name}.pdf", f"Rechnung_{rechnung_id}.pdf"]
 
         # Delete the invoice from database
         db.delete(rechnung)
         db.commit()
 
-        return RedirectResponse("/rechnungsliste?deleted=success", status_code=303)
-
     except Exception as e:
         db.rollback()
         return HTMLResponse(f"Fehler beim Löschen der Rechnung: {str(e)}", status_code=500)
+
+    if receipt_files:
+        submit("dateien_loeschen", {"dir": "RECEIPTS_DIR", "files": receipt_files})
+    submit("dateien_loeschen", {"dir": "INVOICES_DIR", "files": pdf_files})
+    return RedirectResponse("/rechnungsliste?deleted=success", status_code=303)
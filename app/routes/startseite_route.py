@@ -1,10 +1,10 @@
 """Home page and main dashboard route."""
 
 from fastapi import APIRouter, Request
-from app.utils.template_utils import create_templates
+from app.utils.template_utils import get_templates
 
 router = APIRouter()
-templates = create_templates()
+templates = get_templates()
 
 
 @router.get("/")
@@ -5,13 +5,13 @@ from fastapi.responses import HTMLResponse, RedirectResponse
 from sqlalchemy.orm import Session
 from database.db import get_db
 from app.models.unternehmensdaten import Unternehmensdaten
-from app.utils.template_utils import create_templates
+from app.utils.template_utils import get_templates
 import os
 from pathlib import Path
 
 router = APIRouter()
 
-templates = create_templates()
+templates = get_templates()
 
 
 
@@ -0,0 +1,208 @@
+"""
+Aggregated business metrics for the dashboard.
+
+Computes all KPI counters and the twelve-month chart series for one year
+with a few grouped SQL statements instead of one query per number.
+"""
+from dataclasses import dataclass, field
+from decimal import Decimal
+from typing import List
+
+from sqlalchemy import case, extract, func, literal
+from sqlalchemy.orm import Session
+
+from app.models.kunde import Kunde
+from app.models.auftrag import Auftrag
+from app.models.rechnung import Rechnung
+from app.models.eur_monatssumme import EurMonatssumme
+from app.models.material_komponente import MaterialKomponente
+from app.models.arbeit_komponente import ArbeitKomponente
+from app.utils.date_utils import in_period
+
+
+def _empty_series() -> List:
+    return [0] * 12
+
+
+@dataclass
+class DashboardMetrics:
+    """All numbers shown on the dashboard for one year."""
+
+    year: int
+
+    # Counters (all time)
+    total_customers: int = 0
+    private_customers: int = 0
+    business_customers: int = 0
+    total_orders: int = 0
+    total_invoices: int = 0
+    paid_invoices: int = 0
+    unpaid_invoices: int = 0
+
+    # Cost analysis (all time)
+    material_costs: Decimal = Decimal("0")
+    labor_revenue: Decimal = Decimal("0")
+
+    # Twelve-month series for the selected year (index 0 = January)
+    revenue_data: List[float] = field(default_factory=_empty_series)
+    expense_data: List[float] = field(default_factory=_empty_series)
+    customers_data: List[int] = field(default_factory=_empty_series)
+    orders_data: List[int] = field(default_factory=_empty_series)
+    invoices_data: List[int] = field(default_factory=_empty_series)
+
+    # Yearly totals with exact decimal precision
+    year_revenue: Decimal = Decimal("0")
+    year_expenses: Decimal = Decimal("0")
+    current_year_orders: int = 0
+
+    @property
+    def year_profit(self) -> Decimal:
+        return self.year_revenue - self.year_expenses
+
+    @property
+    def profit_margin(self) -> Decimal:
+        if self.year_revenue > 0:
+            return self.year_profit / self.year_revenue * 100
+        return Decimal("0")
+
+    @property
+    def profit_data(self) -> List[float]:
+        return [self.revenue_data[i] - self.expense_data[i] for i in range(12)]
+
+
+def _load_counters(db: Session, metrics: DashboardMetrics) -> None:
+    """Load all-time counters as scalar subqueries of a single statement."""
+    row = db.query(
+        db.query(func.count(Kunde.id)).scalar_subquery().label("total_customers"),
+        db.query(func.coalesce(func.sum(
+            case((Kunde.kundenart == "Privatkunde", 1), else_=0)), 0)
+        ).scalar_subquery().label("private_customers"),
+        db.query(func.coalesce(func.sum(
+            case((Kunde.kundenart == "Geschäftskunde", 1), else_=0)), 0)
+        ).scalar_subquery().label("business_customers"),
+        db.query(func.count(Auftrag.id)).scalar_subquery().label("total_orders"),
+        db.query(func.count(Rechnung.id)).scalar_subquery().label("total_invoices"),
+        db.query(func.coalesce(func.sum(
+            case((Rechnung.bezahlt == True, 1), else_=0)), 0)  # noqa: E712
+        ).scalar_subquery().label("paid_invoices"),
+        db.query(func.coalesce(func.sum(
+            case((Rechnung.bezahlt == False, 1), else_=0)), 0)  # noqa: E712
+        ).scalar_subquery().label("unpaid_invoices"),
+        db.query(func.coalesce(func.sum(MaterialKomponente.actual_cost), 0)).filter(
+            MaterialKomponente.actual_cost > 0
+        ).scalar_subquery().label("material_costs"),
+        db.query(func.coalesce(func.sum(
+            ArbeitKomponente.anzahl_stunden * ArbeitKomponente.stundenlohn
+        ), 0)).filter(
+            ArbeitKomponente.anzahl_stunden.isnot(None),
+            ArbeitKomponente.stundenlohn.isnot(None)
+        ).scalar_subquery().label("labor_hours"),
+        db.query(func.coalesce(func.sum(
+            ArbeitKomponente.anzahl_quadrat * ArbeitKomponente.preis_pro_quadrat
+        ), 0)).filter(
+            ArbeitKomponente.anzahl_quadrat.isnot(None),
+            ArbeitKomponente.preis_pro_quadrat.isnot(None)
+        ).scalar_subquery().label("labor_area"),
+    ).one()
+
+    metrics.total_customers = int(row.total_customers or 0)
+    metrics.private_customers = int(row.private_customers or 0)
+    metrics.business_customers = int(row.business_customers or 0)
+    metrics.total_orders = int(row.total_orders or 0)
+    metrics.total_invoices = int(row.total_invoices or 0)
+    metrics.paid_invoices = int(row.paid_invoices or 0)
+    metrics.unpaid_invoices = int(row.unpaid_invoices or 0)
+    metrics.material_costs = Decimal(str(row.material_costs or 0))
+    metrics.labor_revenue = (
+        Decimal(str(row.labor_hours or 0)) + Decimal(str(row.labor_area or 0))
+    )
+
+
+def _monthly_branch(db: Session, series: str, value, date_column, year: int, *filters):
+    """Build one branch of the monthly UNION ALL: (series, month, value)."""
+    month = extract('month', date_column)
+    return db.query(
+        literal(series).label("series"),
+        month.label("month"),
+        value.label("value"),
+    ).filter(
+        in_period(date_column, year),
+        *filters
+    ).group_by(month)
+
+
+def _load_monthly_series(db: Session, metrics: DashboardMetrics) -> None:
+    """Load all five monthly series for the year in one UNION ALL statement."""
+    year = metrics.year
+    revenue = _monthly_branch(
+        db, "revenue", func.sum(Rechnung.rechnungssumme_gesamt),
+        Rechnung.payment_date, year, Rechnung.bezahlt == True  # noqa: E712
+    )
+    # Expenses come from the monthly rollup instead of the raw bookings
+    expenses = db.query(
+        literal("expenses"),
+        EurMonatssumme.monat,
+        func.sum(EurMonatssumme.summe),
+    ).filter(
+        EurMonatssumme.jahr == year,
+        EurMonatssumme.typ == 'ausgabe'
+    ).group_by(EurMonatssumme.monat)
+    customers = _monthly_branch(
+        db, "customers", func.count(Kunde.id), Kunde.kunde_seit, year
+    )
+    orders = _monthly_branch(
+        db, "orders", func.count(Auftrag.id), Auftrag.auftrag_start, year
+    )
+    invoices = _monthly_branch(
+        db, "invoices", func.count(Rechnung.id), Rechnung.rechnungsdatum, year
+    )
+
+    rows = revenue.union_all(expenses, customers, orders, invoices).all()
+
+    for series, month, value in rows:
+        if not month or not 1 <= int(month) <= 12:
+            continue
+        index = int(month) - 1
+        if series == "revenue":
+            metrics.year_revenue += Decimal(str(value or 0))
+            metrics.revenue_data[index] = float(value or 0)
+        elif series == "expenses":
+            metrics.year_expenses += Decimal(str(value or 0))
+            metrics.expense_data[index] = float(value or 0)
+        elif series == "customers":
+            metrics.customers_data[index] = int(value or 0)
+        elif series == "orders":
+            metrics.current_year_orders += int(value or 0)
+            metrics.orders_data[index] = int(value or 0)
+        elif series == "invoices":
+            metrics.invoices_data[index] = int(value or 0)
+
+
+def get_available_years(db: Session) -> List[int]:
+    """Return all years with paid invoices or bookings, newest first."""
+    invoice_years = db.query(
+        extract('year', Rechnung.payment_date).label("year")
+    ).filter(Rechnung.payment_date.isnot(None))
+    booking_years = db.query(EurMonatssumme.jahr)
+
+    return sorted(
+        {int(year) for (year,) in invoice_years.union(booking_years).all() if year},
+        reverse=True
+    )
+
+
+def compute_dashboard_metrics(db: Session, year: int) -> DashboardMetrics:
+    """
+    Compute all dashboard KPIs and monthly series for a year.
+
+    Args:
+        db: Database session
+        year: Year used for the yearly totals and the monthly series
+
+    Returns:
+        DashboardMetrics: Populated result object
+    """
+    metrics = DashboardMetrics(year=year)
+    _load_counters(db, metrics)
+    _load_monthly_series(db, metrics)
+    return metrics
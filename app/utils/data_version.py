@@ -0,0 +1,118 @@
+"""
+Global data version for conditional GET requests (ETag / 304).
+
+Every committed transaction that writes to the database replaces the
+version token stored in a small file, so all worker processes see the same
+version without querying the database. Pages that only depend on database
+contents use it as their ETag and answer a matching If-None-Match with 304.
+"""
+import os
+import tempfile
+import time
+import zlib
+from datetime import date
+
+from fastapi import Request, Response
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from config import config
+
+
+CACHE_CONTROL = "private, no-cache"
+
+
+def current_version() -> str:
+    """Return the current data version token."""
+    try:
+        version = config.DATA_VERSION_FILE.read_text().strip()
+    except FileNotFoundError:
+        version = ""
+    return version or bump_version()
+
+
+def bump_version() -> str:
+    """Replace the data version with a new, larger value and return it."""
+    try:
+        previous = int(config.DATA_VERSION_FILE.read_text().strip() or 0)
+    except (FileNotFoundError, ValueError):
+        previous = 0
+    version = str(max(previous + 1, time.time_ns()))
+
+    # Write to a temporary file first so readers never see a partial value
+    config.DATA_VERSION_FILE.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=config.DATA_VERSION_FILE.parent)
+    with os.fdopen(fd, "w") as tmp_file:
+        tmp_file.write(version)
+    os.replace(tmp_path, config.DATA_VERSION_FILE)
+    return version
+
+
+def _template_token() -> str:
+    """Checksum of the template files, so a deploy changes every ETag."""
+    checksum = 0
+    for path in sorted(config.TEMPLATES_DIR.glob("*.html")):
+        stat = path.stat()
+        checksum = zlib.crc32(f"{path.name}:{stat.st_mtime_ns}:{stat.st_size}".encode(), checksum)
+    return f"{checksum:08x}"
+
+
+TEMPLATE_TOKEN = _template_token()
+
+
+def page_etag() -> str:
+    """
+    Build the ETag for a page computed from database contents.
+
+    The date is part of the tag because pages default to the current year.
+    """
+    return f'W/"{current_version()}-{TEMPLATE_TOKEN}-{date.today().isoformat()}"'
+
+
+def is_not_modified(request: Request, etag: str) -> bool:
+    """Check whether the request's If-None-Match header matches etag."""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    # Weak comparison: ignore the W/ prefix on both sides
+    wanted = etag.removeprefix("W/")
+    return any(tag.strip().removeprefix("W/") == wanted for tag in header.split(","))
+
+
+def not_modified_response(etag: str) -> Response:
+    """Return an empty 304 response carrying the ETag."""
+    return Response(status_code=304, headers={"ETag": etag, "Cache-Control": CACHE_CONTROL})
+
+
+def set_etag(response: Response, etag: str) -> Response:
+    """Attach ETag and revalidation headers to a response."""
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = CACHE_CONTROL
+    return response
+
+
+@event.listens_for(Session, "after_flush")
+def _mark_data_changed(session, flush_context):
+    if session.new or session.dirty or session.deleted:
+        session.info["data_changed"] = True
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _mark_data_changed_bulk(orm_execute_state):
+    """Bulk DML and Core statements bypass the flush, catch them here."""
+    if (orm_execute_state.is_insert or orm_execute_state.is_update
+            or orm_execute_state.is_delete):
+        orm_execute_state.session.info["data_changed"] = True
+
+
+@event.listens_for(Session, "after_commit")
+def _bump_after_commit(session):
+    if session.info.pop("data_changed", False):
+        bump_version()
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_after_rollback(session):
+    session.info.pop("data_changed", None)
@@ -2,7 +2,9 @@
 Date parsing utilities for consistent date handling across the application.
 """
 from datetime import datetime, date
-from typing import Optional
+from typing import Optional, Tuple
+
+from sqlalchemy import and_
 
 
 def parse_german_date(date_str: str) -> Optional[date]:
@@ -57,4 +59,56 @@ def format_german_date(date_obj: date) -> str:
     """
     if not date_obj:
         return ""
-    return date_obj.strftime('%d.%m.%Y')
\ No newline at end of file
+    return date_obj.strftime('%d.%m.%Y')
+
+
+def period_range(year: int, month: Optional[int] = None,
+                 quarter: Optional[int] = None) -> Tuple[date, date]:
+    """
+    Turn a year, month or quarter selection into a half-open date range.
+
+    Args:
+        year: Selected year
+        month: Month 1-12 within the year (optional)
+        quarter: Quarter 1-4 within the year (optional, ignored if month is set)
+
+    Returns:
+        (start, end) with start inclusive and end exclusive
+    """
+    if month is not None:
+        if not 1 <= month <= 12:
+            raise ValueError(f"Ungültiger Monat: {month}")
+        start = date(year, month, 1)
+        end = date(year + 1, 1, 1) if month == 12 else date(year, month + 1, 1)
+        return start, end
+
+    if quarter is not None:
+        if not 1 <= quarter <= 4:
+            raise ValueError(f"Ungültiges Quartal: {quarter}")
+        first_month = 3 * (quarter - 1) + 1
+        start = date(year, first_month, 1)
+        end = date(year + 1, 1, 1) if quarter == 4 else date(year, first_month + 3, 1)
+        return start, end
+
+    return date(year, 1, 1), date(year + 1, 1, 1)
+
+
+def in_period(column, year: int, month: Optional[int] = None,
+              quarter: Optional[int] = None):
+    """
+    Build a filter ``start <= column < end`` for a year, month or quarter.
+
+    Unlike ``extract('year', column) == year`` the comparison can use an
+    index on the column.
+
+    Args:
+        column: Date column to filter
+        year: Selected year
+        month: Month 1-12 within the year (optional)
+        quarter: Quarter 1-4 within the year (optional)
+
+    Returns:
+        SQLAlchemy boolean expression
+    """
+    start, end = period_range(year, month, quarter)
+    return and_(column >= start, column < end)
\ No newline at end of file
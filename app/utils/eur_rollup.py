@@ -0,0 +1,133 @@
+"""
+Read and rebuild helpers for the monthly EÜR rollup (EurMonatssumme).
+
+Reports read their totals from here, so their cost depends on the number
+of months and categories rather than on the number of bookings.
+"""
+from collections import defaultdict
+from decimal import Decimal
+from typing import Dict, List
+
+from sqlalchemy import extract, func
+from sqlalchemy.orm import Session
+
+from app.models.einnahme_ausgabe import EinnahmeAusgabe
+from app.models.eur_kategorie import EurKategorie
+from app.models.eur_monatssumme import EurMonatssumme
+
+
+def rebuild_rollup(db: Session) -> int:
+    """
+    Recompute the whole rollup table from einnahmen_ausgaben.
+
+    Args:
+        db: Database session (committed by this function)
+
+    Returns:
+        int: Number of rollup rows written
+    """
+    table = EurMonatssumme.__table__
+    jahr = extract('year', EinnahmeAusgabe.datum)
+    monat = extract('month', EinnahmeAusgabe.datum)
+    typ = func.lower(EinnahmeAusgabe.typ)
+
+    source = db.query(
+        jahr,
+        monat,
+        typ,
+        EinnahmeAusgabe.kategorie_id,
+        func.sum(EinnahmeAusgabe.betrag),
+        func.count(EinnahmeAusgabe.id)
+    ).group_by(jahr, monat, typ, EinnahmeAusgabe.kategorie_id)
+
+    db.execute(table.delete())
+    db.execute(table.insert().from_select(
+        ["jahr", "monat", "typ", "kategorie_id", "summe", "anzahl"],
+        source.statement
+    ))
+    db.commit()
+    return db.query(EurMonatssumme).count()
+
+
+def get_booking_years(db: Session) -> List[int]:
+    """Return all years with bookings, newest first."""
+    rows = db.query(EurMonatssumme.jahr).distinct().order_by(
+        EurMonatssumme.jahr.desc()).all()
+    return [int(jahr) for (jahr,) in rows]
+
+
+def get_year_totals(db: Session, year: int = None) -> Dict[int, dict]:
+    """
+    Sum income and expenses per year.
+
+    Args:
+        db: Database session
+        year: Restrict to this year (all years if None)
+
+    Returns:
+        Dict[int, dict]: year -> {'einnahmen', 'ausgaben', 'saldo'}
+    """
+    query = db.query(
+        EurMonatssumme.jahr,
+        EurMonatssumme.typ,
+        func.sum(EurMonatssumme.summe)
+    )
+    if year is not None:
+        query = query.filter(EurMonatssumme.jahr == year)
+    rows = query.group_by(EurMonatssumme.jahr, EurMonatssumme.typ).all()
+
+    # Every year with bookings gets an entry, so the keys double as year catalog
+    totals = defaultdict(lambda: {'einnahmen': Decimal('0'), 'ausgaben': Decimal('0')})
+    for jahr, typ, summe in rows:
+        data = totals[int(jahr)]
+        if typ == "einnahme":
+            data['einnahmen'] += Decimal(str(summe or 0))
+        elif typ == "ausgabe":
+            data['ausgaben'] += Decimal(str(summe or 0))
+
+    for data in totals.values():
+        data['saldo'] = data['einnahmen'] - data['ausgaben']
+    return dict(totals)
+
+
+def get_monthly_totals(db: Session, year: int) -> Dict[int, dict]:
+    """Return month -> {'einnahme', 'ausgabe'} for all months of a year with bookings."""
+    rows = db.query(
+        EurMonatssumme.monat,
+        EurMonatssumme.typ,
+        func.sum(EurMonatssumme.summe)
+    ).filter(
+        EurMonatssumme.jahr == year
+    ).group_by(EurMonatssumme.monat, EurMonatssumme.typ).all()
+
+    monate = defaultdict(lambda: {'einnahme': Decimal('0'), 'ausgabe': Decimal('0')})
+    for monat, typ, summe in rows:
+        if typ in ("einnahme", "ausgabe"):
+            monate[int(monat)][typ] += Decimal(str(summe or 0))
+    return dict(sorted(monate.items()))
+
+
+def get_category_totals(db: Session, year: int) -> List[dict]:
+    """Return one {'typ', 'name', 'summe', 'anzahl'} dict per category of a year."""
+    rows = db.query(
+        EurMonatssumme.typ,
+        EurKategorie.name,
+        func.sum(EurMonatssumme.summe),
+        func.sum(EurMonatssumme.anzahl)
+    ).outerjoin(
+        EurKategorie, EurKategorie.id == EurMonatssumme.kategorie_id
+    ).filter(
+        EurMonatssumme.jahr == year
+    ).group_by(
+        EurMonatssumme.typ, EurMonatssumme.kategorie_id, EurKategorie.name
+    ).order_by(EurKategorie.name).all()
+
+    return [
+        {
+            'typ': typ,
+            'name': name,
+            'summe': Decimal(str(summe or 0)),
+            'anzahl': int(anzahl or 0)
+        }
+        for typ, name, summe, anzahl in rows
+    ]
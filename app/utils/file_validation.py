@@ -1,54 +1,122 @@
 """
 File validation utilities for the ERP system.
 Consolidates duplicate file validation logic found in rechnung_route.py and buchungen.py.
+
+Uploads are checked and stored in one pass over fixed-size chunks, so a
+large photo never has to be held in memory as a whole.
 """
+import hashlib
 import os
-from typing import Tuple
+import tempfile
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional
 
 
 # File security validation constants
 ALLOWED_FILE_TYPES = {'.pdf', '.jpg', '.jpeg', '.png', '.gif', '.tiff', '.bmp'}
 MAX_FILE_SIZE = 10 * 1024 * 1024  # 10MB
+UPLOAD_CHUNK_SIZE = 256 * 1024
+
+# Expected first bytes per file extension
+MAGIC_BYTES = {
+    '.jpg': (b'\xff\xd8', "Ungültiges JPEG-Format"),
+    '.jpeg': (b'\xff\xd8', "Ungültiges JPEG-Format"),
+    '.png': (b'\x89PNG', "Ungültiges PNG-Format"),
+    '.gif': (b'GIF8', "Ungültiges GIF-Format"),
+    '.pdf': (b'%PDF', "Ungültiges PDF-Format"),
+}
+
+
+class UploadRejected(ValueError):
+    """The upload is not an allowed receipt; the message is shown to the user."""
+
+
+@dataclass
+class SavedUpload:
+    """A stored upload with the size and SHA-256 computed while writing it."""
+    filename: str
+    size: int
+    sha256: str
 
 
-def validate_file_upload(file) -> Tuple[bool, str]:
+def check_file_name(file) -> str:
     """
-    Validate uploaded file for security and constraints.
-    
+    Check the name of an uploaded file.
+
     Args:
         file: UploadFile object from FastAPI
-        
+
     Returns:
-        Tuple[bool, str]: (is_valid, error_message)
+        str: The lower-case file extension
+
+    Raises:
+        UploadRejected: No file or a file type that is not allowed
     """
     if not file or not hasattr(file, 'filename') or not file.filename:
-        return False, "Keine Datei ausgewählt"
-    
-    # Check file extension
+        raise UploadRejected("Keine Datei ausgewählt")
+
     file_extension = os.path.splitext(file.filename.lower())[1]
     if file_extension not in ALLOWED_FILE_TYPES:
-        return False, f"Dateityp nicht erlaubt. Erlaubte Typen: {', '.join(ALLOWED_FILE_TYPES)}"
-    
-    # Read file to check size and basic content validation
-    file_content = file.file.read()
-    file.file.seek(0)  # Reset file pointer
-    
-    # Check file size
-    if len(file_content) > MAX_FILE_SIZE:
-        return False, f"Datei zu groß. Maximum: {MAX_FILE_SIZE // (1024*1024)}MB"
-    
-    # Basic content validation for images
-    if file_extension in {'.jpg', '.jpeg', '.png', '.gif', '.tiff', '.bmp'}:
-        # Check if file starts with expected magic bytes
-        if file_extension in {'.jpg', '.jpeg'} and not file_content.startswith(b'\xff\xd8'):
-            return False, "Ungültiges JPEG-Format"
-        elif file_extension == '.png' and not file_content.startswith(b'\x89PNG'):
-            return False, "Ungültiges PNG-Format"
-        elif file_extension == '.gif' and not file_content.startswith(b'GIF8'):
-            return False, "Ungültiges GIF-Format"
-    
-    # Basic content validation for PDF
-    elif file_extension == '.pdf' and not file_content.startswith(b'%PDF'):
-        return False, "Ungültiges PDF-Format"
-    
-    return True, "OK"
\ No newline at end of file
+        raise UploadRejected(f"Dateityp nicht erlaubt. Erlaubte Typen: {', '.join(ALLOWED_FILE_TYPES)}")
+    return file_extension
+
+
+def _check_magic_bytes(file_extension: str, head: bytes) -> None:
+    expected = MAGIC_BYTES.get(file_extension)
+    if expected and not head.startswith(expected[0]):
+        raise UploadRejected(expected[1])
+
+
+def save_upload(file, directory: Path, filename: str) -> SavedUpload:
+    """
+    Validate an uploaded file while streaming it into `directory`.
+
+    The content is read in chunks of UPLOAD_CHUNK_SIZE: the magic bytes are
+    checked on the first chunk, MAX_FILE_SIZE is enforced as the bytes come
+    in and the SHA-256 is computed on the way. The data goes to a temporary
+    file next to the target, which is renamed into place only when the whole
+    upload was accepted, so a rejected or broken upload leaves nothing behind.
+
+    Blocking; async routes run it with ``run_in_threadpool``.
+
+    Args:
+        file: UploadFile object from FastAPI
+        directory: Target directory, created if missing
+        filename: Name of the stored file
+
+    Returns:
+        SavedUpload: Name, size and SHA-256 of the stored file
+
+    Raises:
+        UploadRejected: File type, content or size not allowed
+        OSError: The file could not be written
+    """
+    file_extension = check_file_name(file)
+    directory.mkdir(parents=True, exist_ok=True)
+    fd, temp_name = tempfile.mkstemp(dir=directory, prefix=".upload_", suffix=".part")
+    sha = hashlib.sha256()
+    size = 0
+    try:
+        with os.fdopen(fd, "wb") as out:
+            head: Optional[bytes] = None
+            while True:
+                chunk = file.file.read(UPLOAD_CHUNK_SIZE)
+                if head is None:
+                    head = chunk
+                    _check_magic_bytes(file_extension, head)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > MAX_FILE_SIZE:
+                    raise UploadRejected(f"Datei zu groß. Maximum: {MAX_FILE_SIZE // (1024*1024)}MB")
+                sha.update(chunk)
+                out.write(chunk)
+        os.replace(temp_name, directory / filename)
+    except BaseException:
+        try:
+            os.unlink(temp_name)
+        except FileNotFoundError:
+            pass
+        raise
+    return SavedUpload(filename, size, sha.hexdigest())
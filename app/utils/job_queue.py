@@ -0,0 +1,461 @@
+"""
+Durable background jobs in a local SQLite database.
+
+Work that does not have to happen inside a request (PDF renders, file
+cleanup) is stored as a job in JOB_QUEUE_DB and executed by JOB_WORKERS
+worker processes started with the application. No broker is needed, and
+several application processes on one machine can share the queue:
+workers claim jobs in an IMMEDIATE transaction, so every job runs once.
+
+- `submit(kind, payload, key)` stores a job and returns it. Jobs with the
+  same key are only stored once; submitting a key whose job failed
+  queues it again.
+- Failed jobs are retried after JOB_RETRY_BACKOFF * 2^(attempt - 1)
+  seconds, up to JOB_MAX_ATTEMPTS attempts. Handlers raise JobFailed for
+  errors that a retry cannot fix.
+- A job whose worker died is queued again once its lease (JOB_LEASE
+  seconds) has expired.
+- On shutdown the workers finish their current job and exit; after
+  JOB_DRAIN_TIMEOUT seconds they are terminated and their jobs return to
+  the queue with the expired lease.
+
+Handlers are registered with `@job_handler(kind)` in the modules listed in
+HANDLER_MODULES, next to the code they reuse. With JOB_WORKERS=0, `submit`
+runs the job right away in the calling thread.
+"""
+import importlib
+import json
+import logging
+import multiprocessing
+import os
+import signal
+import socket
+import sqlite3
+import threading
+import time
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+from fastapi.responses import JSONResponse
+
+from app.utils import pdf_pool
+from config import config
+
+
+logger = logging.getLogger(__name__)
+
+# Modules whose @job_handler functions the worker processes need
+HANDLER_MODULES = ("app.routes.rechnung_route", "app.routes.buchungen")
+
+# Directories the built-in "dateien_loeschen" job may delete from
+DELETABLE_DIRS = ("RECEIPTS_DIR", "INVOICES_DIR")
+
+HANDLERS: Dict[str, Callable[[dict], Optional[dict]]] = {}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    kind TEXT NOT NULL,
+    key TEXT UNIQUE,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'queued',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL,
+    run_after REAL NOT NULL,
+    result TEXT,
+    error TEXT,
+    locked_by TEXT,
+    locked_at REAL,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_jobs_status_run_after ON jobs (status, run_after);
+"""
+
+_queues: Dict[Path, "JobQueue"] = {}
+_queues_lock = threading.Lock()
+_workers: Optional["JobWorkers"] = None
+# Queue and id of the job running in this thread, for report_progress
+_current = threading.local()
+
+
+class JobFailed(Exception):
+    """Raised by a handler to fail its job without further retries."""
+
+
+@dataclass
+class Job:
+    id: int
+    kind: str
+    key: Optional[str]
+    payload: dict
+    status: str
+    attempts: int
+    max_attempts: int
+    result: Optional[dict]
+    error: Optional[str]
+    created_at: float
+    updated_at: float
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+
+def job_handler(kind: str):
+    """Register the decorated function as handler for jobs of this kind."""
+    def register(func: Callable[[dict], Optional[dict]]):
+        HANDLERS[kind] = func
+        return func
+    return register
+
+
+class JobQueue:
+    """Job table in a SQLite file; safe to use from several threads and processes."""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        conn = self._connect()
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+        finally:
+            conn.close()
+
+    def _connect(self) -> sqlite3.Connection:
+        # Autocommit mode; transactions are opened explicitly where needed
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    @staticmethod
+    def _job(row: sqlite3.Row) -> Job:
+        return Job(
+            id=row["id"], kind=row["kind"], key=row["key"],
+            payload=json.loads(row["payload"]), status=row["status"],
+            attempts=row["attempts"], max_attempts=row["max_attempts"],
+            result=json.loads(row["result"]) if row["result"] else None,
+            error=row["error"], created_at=row["created_at"], updated_at=row["updated_at"])
+
+    def enqueue(self, kind: str, payload: Optional[dict] = None, key: Optional[str] = None,
+                max_attempts: Optional[int] = None) -> Job:
+        """
+        Store a job, or return the existing job with the same key.
+
+        Args:
+            kind: Name of the registered handler
+            payload: JSON-serialisable handler argument
+            key: Idempotency key; a failed job with this key is queued again
+            max_attempts: Attempts before the job fails (default JOB_MAX_ATTEMPTS)
+
+        Returns:
+            Job: The stored job
+        """
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute("SELECT * FROM jobs WHERE key = ?", (key,)).fetchone() if key else None
+            if row is None:
+                job_id = conn.execute(
+                    "INSERT INTO jobs (kind, key, payload, max_attempts, run_after, created_at, updated_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (kind, key, json.dumps(payload or {}), max_attempts or config.JOB_MAX_ATTEMPTS,
+                     now, now, now)).lastrowid
+            else:
+                job_id = row["id"]
+                if row["status"] == "failed":
+                    self._requeue(conn, job_id, now)
+            conn.execute("COMMIT")
+            return self._job(conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone())
+        finally:
+            conn.close()
+
+    def requeue(self, job_id: int) -> Optional[Job]:
+        """Queue a finished or failed job again, e.g. when its result is gone."""
+        conn = self._connect()
+        try:
+            self._requeue(conn, job_id, time.time())
+        finally:
+            conn.close()
+        return self.get(job_id)
+
+    @staticmethod
+    def _requeue(conn: sqlite3.Connection, job_id: int, now: float) -> None:
+        conn.execute(
+            "UPDATE jobs SET status = 'queued', attempts = 0, result = NULL, error = NULL, "
+            "run_after = ?, updated_at = ? WHERE id = ? AND status IN ('done', 'failed')",
+            (now, now, job_id))
+
+    def get(self, job_id: int) -> Optional[Job]:
+        """Return the job or None."""
+        conn = self._connect()
+        try:
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        finally:
+            conn.close()
+        return self._job(row) if row else None
+
+    def claim(self, worker: str, job_id: Optional[int] = None) -> Optional[Job]:
+        """Mark the oldest due job (or job_id, if due) as running for this worker and return it."""
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            # Jobs of workers that died: retry, or fail if attempts are used up
+            conn.execute(
+                "UPDATE jobs SET status = CASE WHEN attempts >= max_attempts THEN 'failed' ELSE 'queued' END, "
+                "error = 'Worker abgebrochen', locked_by = NULL, run_after = ?, updated_at = ? "
+                "WHERE status = 'running' AND locked_at < ?", (now, now, now - config.JOB_LEASE))
+            row = conn.execute(
+                "SELECT id FROM jobs WHERE status = 'queued' AND run_after <= ? AND (? IS NULL OR id = ?) "
+                "ORDER BY run_after, id LIMIT 1", (now, job_id, job_id)).fetchone()
+            if row is None:
+                conn.execute("COMMIT")
+                return None
+            conn.execute(
+                "UPDATE jobs SET status = 'running', attempts = attempts + 1, locked_by = ?, "
+                "locked_at = ?, updated_at = ? WHERE id = ?", (worker, now, now, row["id"]))
+            conn.execute("COMMIT")
+            return self._job(conn.execute("SELECT * FROM jobs WHERE id = ?", (row["id"],)).fetchone())
+        finally:
+            conn.close()
+
+    def set_result(self, job_id: int, result: dict) -> None:
+        """Store intermediate results (progress) of a running job."""
+        conn = self._connect()
+        try:
+            conn.execute(
+                "UPDATE jobs SET result = ?, locked_at = ?, updated_at = ? WHERE id = ? AND status = 'running'",
+                (json.dumps(result), time.time(), time.time(), job_id))
+        finally:
+            conn.close()
+
+    def complete(self, job_id: int, result: Optional[dict]) -> None:
+        """Store the result of a finished job."""
+        conn = self._connect()
+        try:
+            conn.execute(
+                "UPDATE jobs SET status = 'done', result = ?, error = NULL, locked_by = NULL, "
+                "updated_at = ? WHERE id = ?", (json.dumps(result), time.time(), job_id))
+        finally:
+            conn.close()
+
+    def fail(self, job_id: int, error: str, retry: bool = True) -> str:
+        """
+        Record a failed attempt; queue the job again with backoff if attempts are left.
+
+        Returns:
+            str: The new status, 'queued' or 'failed'
+        """
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(
+                "SELECT attempts, max_attempts FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if row is None:
+                conn.execute("COMMIT")
+                return "failed"
+            if retry and row["attempts"] < row["max_attempts"]:
+                status = "queued"
+                run_after = now + config.JOB_RETRY_BACKOFF * 2 ** (row["attempts"] - 1)
+            else:
+                status, run_after = "failed", now
+            conn.execute(
+                "UPDATE jobs SET status = ?, error = ?, run_after = ?, locked_by = NULL, "
+                "updated_at = ? WHERE id = ?", (status, error, run_after, now, job_id))
+            conn.execute("COMMIT")
+        finally:
+            conn.close()
+        return status
+
+    def counts(self) -> Dict[str, int]:
+        """Number of jobs per status."""
+        conn = self._connect()
+        try:
+            rows = conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        finally:
+            conn.close()
+        return {status: count for status, count in rows}
+
+
+def get_queue() -> JobQueue:
+    """Return the queue stored in JOB_QUEUE_DB."""
+    path = Path(config.JOB_QUEUE_DB)
+    with _queues_lock:
+        if path not in _queues:
+            _queues[path] = JobQueue(path)
+        return _queues[path]
+
+
+def job_session():
+    """Open a database session for a job handler (jobs run outside of requests)."""
+    from database.db import SessionLocal
+    return SessionLocal()
+
+
+def run_job(queue: JobQueue, job: Job) -> str:
+    """Run a claimed job and record its outcome; returns the new status."""
+    handler = HANDLERS.get(job.kind)
+    if handler is None:
+        return queue.fail(job.id, f"Unbekannter Job-Typ: {job.kind}", retry=False)
+    _current.job = (queue, job.id)
+    try:
+        result = handler(job.payload)
+    except JobFailed as e:
+        logger.warning(f"Job {job.id} ({job.kind}) failed: {e}")
+        return queue.fail(job.id, str(e), retry=False)
+    except Exception as e:
+        logger.error(f"Job {job.id} ({job.kind}) attempt {job.attempts} failed: {e!r}", exc_info=True)
+        return queue.fail(job.id, f"{type(e).__name__}: {e}")
+    finally:
+        _current.job = None
+    queue.complete(job.id, result)
+    return "done"
+
+
+def report_progress(result: dict) -> None:
+    """Publish the intermediate result of the job running in this thread (no-op outside jobs)."""
+    current = getattr(_current, "job", None)
+    if current is not None:
+        queue, job_id = current
+        queue.set_result(job_id, result)
+
+
+def work_once(queue: JobQueue, worker: str) -> bool:
+    """Claim and run one due job; False if there was none."""
+    job = queue.claim(worker)
+    if job is None:
+        return False
+    run_job(queue, job)
+    return True
+
+
+def _worker_main(path: str, stop, poll_interval: float) -> None:
+    """Worker process: run jobs until stop is set, finishing the current one."""
+    # Ctrl+C reaches the whole process group; the application drains the workers
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    for module in HANDLER_MODULES:
+        importlib.import_module(module)
+    queue = JobQueue(Path(path))
+    worker = f"{socket.gethostname()}:{os.getpid()}"
+    parent = os.getppid()
+    try:
+        # Also stop when the application process is gone
+        while not stop.is_set() and os.getppid() == parent:
+            try:
+                if work_once(queue, worker):
+                    continue
+            except sqlite3.Error as e:
+                logger.error(f"Job queue error: {e!r}")
+            stop.wait(poll_interval)
+    finally:
+        pdf_pool.shutdown()
+
+
+class JobWorkers:
+    """
+    Worker processes executing jobs from the queue.
+
+    The processes are not daemonic, so jobs can use a PDF pool of their own.
+    """
+
+    def __init__(self, count: int, path: Path, poll_interval: float):
+        context = multiprocessing.get_context("spawn")
+        self._stop = context.Event()
+        self._processes: List = [
+            context.Process(target=_worker_main, args=(str(path), self._stop, poll_interval),
+                            name=f"job-worker-{i}")
+            for i in range(count)
+        ]
+        for process in self._processes:
+            process.start()
+
+    def stop(self, timeout: float) -> None:
+        """Let the workers finish their current job; terminate them after timeout seconds."""
+        self._stop.set()
+        deadline = time.monotonic() + timeout
+        for process in self._processes:
+            process.join(max(deadline - time.monotonic(), 0))
+            if process.is_alive():
+                logger.warning(f"Job worker {process.pid} did not finish in {timeout}s, terminating")
+                process.terminate()
+                process.join()
+
+
+def start_workers() -> Optional[JobWorkers]:
+    """Start JOB_WORKERS worker processes (once per application process)."""
+    global _workers
+    if _workers is None and config.JOB_WORKERS > 0:
+        get_queue()  # create the database before the workers open it
+        _workers = JobWorkers(config.JOB_WORKERS, config.JOB_QUEUE_DB, config.JOB_POLL_INTERVAL)
+    return _workers
+
+
+def stop_workers() -> None:
+    """Drain and stop the worker processes, if they were started."""
+    global _workers
+    workers, _workers = _workers, None
+    if workers is not None:
+        workers.stop(config.JOB_DRAIN_TIMEOUT)
+
+
+def submit(kind: str, payload: Optional[dict] = None, key: Optional[str] = None) -> Job:
+    """
+    Queue a job for the workers; with JOB_WORKERS=0 run it right away.
+
+    Returns:
+        Job: The job as stored after submitting (or after running it)
+    """
+    queue = get_queue()
+    return _run_inline(queue, queue.enqueue(kind, payload, key))
+
+
+def resubmit(job_id: int) -> Optional[Job]:
+    """Queue a finished or failed job again (e.g. its PDF was evicted from the cache)."""
+    queue = get_queue()
+    job = queue.requeue(job_id)
+    return _run_inline(queue, job) if job is not None else None
+
+
+def _run_inline(queue: JobQueue, job: Job) -> Job:
+    """Without workers, run a queued job right away in this thread."""
+    if config.JOB_WORKERS <= 0 and job.status == "queued":
+        claimed = queue.claim("inline", job.id)
+        if claimed is not None:
+            run_job(queue, claimed)
+        job = queue.get(job.id)
+    return job
+
+
+def job_response(job: Job, status_code: int = 202) -> JSONResponse:
+    """JSON answer for a submitted job, pointing to its status URL."""
+    return JSONResponse(
+        {"job_id": job.id, "status": job.status, "status_url": f"/api/jobs/{job.id}"},
+        status_code=status_code)
+
+
+@job_handler("dateien_loeschen")
+def delete_files(payload: dict) -> dict:
+    """
+    Delete files that are no longer referenced (receipts, invoice PDFs).
+
+    Payload: {"dir": "RECEIPTS_DIR" or "INVOICES_DIR", "files": [file names]}
+    """
+    if payload.get("dir") not in DELETABLE_DIRS:
+        raise JobFailed(f"Verzeichnis nicht erlaubt: {payload.get('dir')}")
+    directory = getattr(config, payload["dir"])
+    deleted = 0
+    for name in payload.get("files", []):
+        # Plain file names only, nothing outside the directory
+        if Path(name).name != name:
+            logger.warning(f"Skipping invalid file name {name!r}")
+            continue
+        try:
+            (directory / name).unlink()
+            deleted += 1
+        except FileNotFoundError:
+            pass
+    return {"deleted": deleted}
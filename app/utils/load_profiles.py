@@ -0,0 +1,23 @@
+"""
+Eager-loading profiles for pages that work on ORM entities.
+
+List pages load read models (app.utils.read_models). Pages that need the
+entities themselves, e.g. forms that write back, use these profiles: each
+loads exactly the relationships its template touches and marks every other
+relationship of the queried entity with raiseload, so a template change that
+needs more data fails loudly instead of issuing one query per row. The
+statement budgets in tests/test_query_budgets.py guard the result.
+"""
+from sqlalchemy.orm import joinedload, raiseload
+
+from app.models.auftrag import Auftrag
+from app.models.material_komponente import MaterialKomponente
+from app.models.rechnung import Rechnung
+
+
+# /rechnung/{id}/materialkosten: customer, order and its materials with their receipts
+MATERIALKOSTEN = (
+    joinedload(Rechnung.kunde),
+    joinedload(Rechnung.auftrag).selectinload(Auftrag.materialien).joinedload(MaterialKomponente.receipts),
+    raiseload("*"),
+)
@@ -2,8 +2,11 @@
 
 import logging
 import logging.handlers
+import time
 from pathlib import Path
 
+from app.utils.sql_instrumentation import track_sql, warn_repeated_statements
+
 def setup_logging():
     """Setup basic logging configuration for production"""
     log_dir = Path("logs")
@@ -27,4 +30,49 @@ def setup_logging():
     logger.setLevel(logging.INFO)
     logger.addHandler(file_handler)
 
-    return logger
\ No newline at end of file
+    return logger
+
+
+class RequestLogMiddleware:
+    """
+    ASGI middleware writing one log line per request.
+
+    With SQL_INSTRUMENTATION enabled the line carries the number of SQL
+    statements and the time spent in the database, and repeated statements
+    are reported as possible N+1 patterns. The line is written once the
+    response body is complete, so streamed responses are fully counted.
+    With log_requests=False the middleware only labels statements with
+    their route for the slow-query log.
+    """
+
+    def __init__(self, app, log_requests: bool = True):
+        self.app = app
+        self.log_requests = log_requests
+        self.logger = logging.getLogger("buildflow.request")
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+        started = time.perf_counter()
+
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        label = f"{scope['method']} {scope['path']}"
+        with track_sql(label) as stats:
+            try:
+                await self.app(scope, receive, send_with_status)
+            finally:
+                if self.log_requests:
+                    duration_ms = (time.perf_counter() - started) * 1000
+                    self.logger.info(
+                        f"{label} {status_code} {duration_ms:.1f}ms "
+                        f"sql={stats.statements} sql_time={stats.db_time * 1000:.1f}ms"
+                    )
+                    warn_repeated_statements(stats, label)
@@ -0,0 +1,170 @@
+"""
+Keyset (cursor) pagination for the list pages and their JSON API.
+
+Lists are ordered newest first by one or more columns, e.g. ``id`` or
+``(datum, id)``. The cursor encodes the key of the last row of a page; the
+next page continues with the rows whose key is smaller. Unlike OFFSET this
+reads only one page worth of index entries, however deep the page is.
+"""
+import base64
+import binascii
+import json
+from dataclasses import dataclass
+from datetime import date
+from itertools import chain, islice
+from typing import Any, Callable, Iterable, List, Optional, Sequence
+
+from fastapi import HTTPException
+from sqlalchemy import and_, or_
+
+from config import config
+
+
+@dataclass
+class Page:
+    """One page of a keyset-paginated list."""
+
+    items: list
+    next_cursor: Optional[str]
+    page_size: int
+
+
+def page_size(limit: Optional[int]) -> int:
+    """Return the requested page size, defaulting to and capped by the config."""
+    if not limit or limit < 1:
+        return config.PAGE_SIZE
+    return min(limit, config.MAX_PAGE_SIZE)
+
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    """Encode key values (ints, strings, dates) as an opaque URL-safe cursor."""
+    payload = [value.isoformat() if isinstance(value, date) else value for value in values]
+    raw = json.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: Optional[str]) -> Optional[list]:
+    """
+    Decode a cursor created by encode_cursor.
+
+    Raises:
+        HTTPException: 400 if the cursor is malformed
+    """
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = json.loads(raw)
+    except (binascii.Error, ValueError):
+        raise HTTPException(status_code=400, detail="Ungültiger Cursor")
+    if not isinstance(values, list):
+        raise HTTPException(status_code=400, detail="Ungültiger Cursor")
+    return values
+
+
+def _coerce(column, value):
+    """Convert a JSON cursor value back to the column's Python type."""
+    try:
+        if column.type.python_type is date and isinstance(value, str):
+            return date.fromisoformat(value)
+    except (NotImplementedError, ValueError):
+        raise HTTPException(status_code=400, detail="Ungültiger Cursor")
+    return value
+
+
+def _before(columns, values):
+    """Rows ordered after the key in descending order, i.e. (a, b) < (x, y).
+
+    Written out instead of as a row value so SQLite can use the index on
+    the leading column as a range.
+    """
+    condition = columns[-1] < values[-1]
+    for column, value in zip(reversed(columns[:-1]), reversed(values[:-1])):
+        condition = and_(column <= value, or_(column < value, condition))
+    return condition
+
+
+def keyset_query(query, columns: Sequence, after: Optional[Sequence], size: int):
+    """
+    Restrict a Select or Query to one page ordered by columns, newest first.
+
+    Args:
+        query: Select or legacy Query
+        columns: Key columns; together they must be unique
+        after: Key of the last row of the previous page (None for the first page)
+        size: Page size; one extra row is fetched to detect a further page
+
+    Returns:
+        The query with filter, order and limit applied
+    """
+    columns = list(columns)
+    if after:
+        if len(after) != len(columns):
+            raise HTTPException(status_code=400, detail="Ungültiger Cursor")
+        values = [_coerce(column, value) for column, value in zip(columns, after)]
+        query = query.filter(_before(columns, values))
+    return query.order_by(*(column.desc() for column in columns)).limit(size + 1)
+
+
+def keyset_page(rows: List, key: Callable[[Any], Sequence], size: int) -> Page:
+    """
+    Build the page from the rows returned by a keyset_query.
+
+    Args:
+        rows: Result rows (up to size + 1)
+        key: Returns the key values of a row, in keyset_query column order
+        size: Page size
+    """
+    items = list(rows[:size])
+    next_cursor = encode_cursor(key(items[-1])) if len(rows) > size else None
+    return Page(items=items, next_cursor=next_cursor, page_size=size)
+
+
+class _StreamedItems:
+    """Rows of a streamed page, read while they are iterated (once)."""
+
+    def __init__(self, page: Page, rows: Iterable, key: Callable[[Any], Sequence], size: int):
+        self._page = page
+        self._rows = iter(rows)
+        self._key = key
+        self._size = size
+        self._peeked = []
+
+    def __bool__(self) -> bool:
+        # Templates test lists for emptiness; that must not consume a row
+        if not self._peeked:
+            self._peeked = list(islice(self._rows, 1))
+        return bool(self._peeked)
+
+    def __iter__(self):
+        rows, self._peeked = chain(self._peeked, self._rows), []
+        last = None
+        try:
+            for count, row in enumerate(rows):
+                if count == self._size:
+                    self._page.next_cursor = encode_cursor(self._key(last))
+                    break
+                last = row
+                yield row
+        finally:
+            close = getattr(self._rows, "close", None)
+            if close is not None:
+                close()
+
+
+def keyset_stream(rows: Iterable, key: Callable[[Any], Sequence], size: int) -> Page:
+    """
+    Build a page whose items are read from rows only while they are iterated.
+
+    Used with a server-side cursor and a streamed template: each row is
+    rendered before the next one is fetched. next_cursor is set once the
+    items have been iterated, so templates must read it after the loop.
+
+    Args:
+        rows: Result rows of a keyset_query (up to size + 1), e.g. a generator
+        key: Returns the key values of a row, in keyset_query column order
+        size: Page size
+    """
+    page = Page(items=[], next_cursor=None, page_size=size)
+    page.items = _StreamedItems(page, rows, key, size)
+    return page
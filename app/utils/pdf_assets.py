@@ -0,0 +1,131 @@
+"""
+Process-level cache of the assets every PDF render needs.
+
+Rendering an invoice used to read and base64-encode the logo, parse the
+stylesheet and set up a new WeasyPrint font configuration each time. These
+are now kept per process and reloaded only when the file's modification
+time changes:
+
+- `logo_base64()`: the logo for the data URI in the invoice template
+  (application process, where the HTML is rendered)
+- `stylesheet(name)`: parsed `weasyprint.CSS` of app/static/pdf/<name>
+- `font_config()`: one `FontConfiguration` shared by all renders
+- `url_fetcher(url)`: serves files below app/static from memory
+- `write_options()`: WeasyPrint options from config (image optimisation,
+  JPEG quality, DPI, font subsetting) plus a shared image cache
+
+The last four are used in the PDF worker processes (app.utils.pdf_pool).
+"""
+import base64
+import mimetypes
+import os
+import threading
+from pathlib import Path
+from typing import Callable, Dict, Tuple
+from urllib.parse import unquote, urlsplit
+
+from config import config
+
+
+_files: Dict[Tuple[str, Path], Tuple[int, object]] = {}
+_files_lock = threading.Lock()
+_font_config = None
+# Decoded images shared across renders (WeasyPrint's `cache` option), keyed by URL
+_image_cache: dict = {}
+
+
+def cached_file(path: Path, load: Callable[[Path], object], kind: str = "bytes"):
+    """
+    Return load(path), cached until the file's modification time changes.
+
+    Args:
+        path: File to load
+        load: Function turning the path into the cached value
+        kind: Distinguishes several values derived from the same file
+
+    Returns:
+        The cached or freshly loaded value
+
+    Raises:
+        OSError: if the file does not exist or cannot be read
+    """
+    path = Path(path)
+    mtime = os.stat(path).st_mtime_ns
+    key = (kind, path)
+    with _files_lock:
+        entry = _files.get(key)
+    if entry is not None and entry[0] == mtime:
+        return entry[1]
+    value = load(path)
+    with _files_lock:
+        _files[key] = (mtime, value)
+    return value
+
+
+def clear() -> None:
+    """Drop all cached assets of this process."""
+    global _font_config
+    with _files_lock:
+        _files.clear()
+    _image_cache.clear()
+    _font_config = None
+
+
+def logo_base64() -> str:
+    """Return static/logo.png base64-encoded for a data URI."""
+    return cached_file(
+        config.STATIC_DIR / "logo.png",
+        lambda path: base64.b64encode(path.read_bytes()).decode("utf-8"),
+        kind="base64")
+
+
+def font_config():
+    """Return the font configuration shared by all renders of this process."""
+    global _font_config
+    if _font_config is None:
+        from weasyprint.text.fonts import FontConfiguration
+        _font_config = FontConfiguration()
+    return _font_config
+
+
+def stylesheet(name: str):
+    """Return the parsed stylesheet app/static/pdf/<name>."""
+    def parse(path: Path):
+        from weasyprint import CSS
+        return CSS(string=path.read_text(encoding="utf-8"), base_url=str(path),
+                   font_config=font_config(), url_fetcher=url_fetcher)
+
+    return cached_file(config.STATIC_DIR / "pdf" / name, parse, kind="css")
+
+
+def url_fetcher(url: str, *args, **kwargs) -> dict:
+    """
+    WeasyPrint URL fetcher serving local static files from memory.
+
+    Other URLs (data URIs, remote resources, files outside app/static) go to
+    WeasyPrint's default fetcher.
+    """
+    parts = urlsplit(url)
+    if parts.scheme == "file":
+        path = Path(unquote(parts.path)).resolve()
+        static_dir = config.STATIC_DIR.resolve()
+        if path.is_relative_to(static_dir) and path.is_file():
+            return {
+                "string": cached_file(path, Path.read_bytes),
+                "mime_type": mimetypes.guess_type(path.name)[0],
+                "redirected_url": url,
+            }
+    from weasyprint import default_url_fetcher
+    return default_url_fetcher(url, *args, **kwargs)
+
+
+def write_options() -> dict:
+    """Return the keyword arguments for `write_pdf` configured in config."""
+    return {
+        "font_config": font_config(),
+        "cache": _image_cache,
+        "optimize_images": config.PDF_OPTIMIZE_IMAGES,
+        "jpeg_quality": config.PDF_JPEG_QUALITY or None,
+        "dpi": config.PDF_IMAGE_DPI or None,
+        "full_fonts": not config.PDF_SUBSET_FONTS,
+    }
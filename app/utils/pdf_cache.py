@@ -0,0 +1,186 @@
+"""
+Content-addressed disk cache for rendered PDFs (invoices, EÜR reports).
+
+A document's key is the SHA-256 of everything that determines the PDF: the
+rendered HTML (and with it the entries, company data, logo and template
+version), the stylesheets and the WeasyPrint output settings. Downloads
+render the HTML, which is cheap, and look the key up in PDF_CACHE_DIR:
+unchanged documents are served from disk, changed data yields a new key and
+a new render. The key doubles as strong ETag, so browsers revalidate with
+If-None-Match and get a 304 without the file being sent again.
+
+The cache holds at most PDF_CACHE_MAX_MB; when a new PDF exceeds the bound,
+the least recently used files are deleted (each hit refreshes the file's
+modification time).
+"""
+import hashlib
+import json
+import logging
+import os
+import tempfile
+from pathlib import Path
+from typing import Optional, Sequence, Tuple
+
+from fastapi import Request, Response
+from fastapi.responses import FileResponse
+from starlette.concurrency import run_in_threadpool
+
+from app.utils.data_version import is_not_modified, not_modified_response, set_etag
+from app.utils.pdf_pool import render_html_to_pdf, render_pdf
+from config import config
+
+
+logger = logging.getLogger(__name__)
+
+# Bump to invalidate all cached PDFs after changes the key does not cover
+CACHE_FORMAT = "1"
+
+
+class PdfCache:
+    """Directory of `<key>.pdf` files with a size bound and LRU eviction."""
+
+    def __init__(self, directory: Path, max_bytes: int):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+
+    def path(self, key: str) -> Path:
+        return self.directory / f"{key}.pdf"
+
+    def get(self, key: str) -> Optional[Path]:
+        """Return the cached file for key (marking it as recently used) or None."""
+        path = self.path(key)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return path
+
+    def put(self, key: str, pdf: bytes) -> Path:
+        """Store a PDF atomically under key and evict old files beyond the size bound."""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(pdf)
+            os.replace(tmp, self.path(key))
+        except BaseException:
+            os.unlink(tmp)
+            raise
+        self.evict(keep=key)
+        return self.path(key)
+
+    def evict(self, keep: Optional[str] = None) -> int:
+        """
+        Delete least recently used files until the cache fits max_bytes.
+
+        Args:
+            keep: Key that is never evicted (the file just written)
+
+        Returns:
+            int: Number of deleted files
+        """
+        files = []
+        for path in self.directory.glob("*.pdf"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            files.append((stat.st_mtime_ns, stat.st_size, path))
+        total = sum(size for _, size, _ in files)
+        deleted = 0
+        for _, size, path in sorted(files):
+            if total <= self.max_bytes:
+                break
+            if path.stem == keep:
+                continue
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+            total -= size
+            deleted += 1
+        if deleted:
+            logger.info(f"PDF cache: evicted {deleted} file(s), {total / 1024 / 1024:.1f} MiB left")
+        return deleted
+
+
+def get_cache() -> PdfCache:
+    """Return the cache configured by PDF_CACHE_DIR and PDF_CACHE_MAX_MB."""
+    return PdfCache(config.PDF_CACHE_DIR, int(config.PDF_CACHE_MAX_MB * 1024 * 1024))
+
+
+def document_key(html: str, stylesheets: Sequence[str] = ()) -> str:
+    """Hash everything a rendered PDF depends on into its cache key."""
+    digest = hashlib.sha256()
+    settings = {
+        "format": CACHE_FORMAT,
+        "stylesheets": list(stylesheets),
+        "optimize_images": config.PDF_OPTIMIZE_IMAGES,
+        "jpeg_quality": config.PDF_JPEG_QUALITY,
+        "dpi": config.PDF_IMAGE_DPI,
+        "subset_fonts": config.PDF_SUBSET_FONTS,
+    }
+    digest.update(json.dumps(settings, sort_keys=True).encode())
+    for name in stylesheets:
+        digest.update((config.STATIC_DIR / "pdf" / name).read_bytes())
+    digest.update(html.encode("utf-8"))
+    return digest.hexdigest()
+
+
+async def cached_pdf(html: str, stylesheets: Sequence[str] = (),
+                     key: Optional[str] = None) -> Tuple[str, Path]:
+    """
+    Return the key and file of the PDF for html, rendering it on a cache miss.
+
+    Args:
+        html: Complete HTML document
+        stylesheets: File names in app/static/pdf applied to the document
+        key: The document key, if the caller computed it already
+
+    Raises:
+        PdfQueueFull: if the render pool is busy (the caller should answer 503)
+        PdfRenderError: if rendering failed or timed out
+    """
+    cache = get_cache()
+    if key is None:
+        key = await run_in_threadpool(document_key, html, stylesheets)
+    path = await run_in_threadpool(cache.get, key)
+    if path is None:
+        pdf = await render_pdf(html, stylesheets=stylesheets)
+        path = await run_in_threadpool(cache.put, key, pdf)
+    return key, path
+
+
+def render_cached(html: str, stylesheets: Sequence[str] = ()) -> Tuple[str, Path]:
+    """
+    Synchronous `cached_pdf` for background jobs: renders in this process on a miss.
+
+    Returns:
+        Tuple[str, Path]: The document key and the cached file
+    """
+    cache = get_cache()
+    key = document_key(html, stylesheets)
+    path = cache.get(key)
+    if path is None:
+        path = cache.put(key, render_html_to_pdf(html, None, tuple(stylesheets)))
+    return key, path
+
+
+async def pdf_download(request: Request, html: str, filename: str,
+                       stylesheets: Sequence[str] = ()) -> Response:
+    """
+    Serve the PDF for html as download with a strong ETag.
+
+    Clients that already have this version get a 304 before the cache is
+    even looked at; otherwise the PDF comes from the cache or is rendered.
+
+    Raises:
+        PdfQueueFull: if the render pool is busy (the caller should answer 503)
+        PdfRenderError: if rendering failed or timed out
+    """
+    key = await run_in_threadpool(document_key, html, stylesheets)
+    etag = f'"{key}"'
+    if is_not_modified(request, etag):
+        return not_modified_response(etag)
+    _, path = await cached_pdf(html, stylesheets, key=key)
+    return set_etag(FileResponse(path=path, filename=filename, media_type="application/pdf"), etag)
@@ -0,0 +1,272 @@
+"""
+Worker process pool for WeasyPrint PDF rendering.
+
+WeasyPrint is CPU-bound and holds the GIL, so a PDF rendered in the request
+thread stalls every other request of the worker. The pool keeps
+PDF_WORKERS warm processes (WeasyPrint imported, fonts loaded) and feeds
+them from a bounded queue: when PDF_QUEUE_SIZE jobs are already waiting,
+new jobs are rejected with PdfQueueFull instead of piling up. A job running
+longer than PDF_TIMEOUT seconds gets its process killed and replaced, and
+every process is replaced after PDF_MAX_JOBS_PER_WORKER jobs to cap memory
+growth. Processes are spawned, not forked, so they share no database
+connections or threads with the application.
+
+Routes await `render_pdf(html, stylesheets=(...))`. With PDF_WORKERS=0 the
+PDF is rendered in a thread of the application process instead. Stylesheets,
+fonts and static files are cached per process by app.utils.pdf_assets.
+"""
+import asyncio
+import logging
+import multiprocessing
+import queue
+import threading
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from typing import Callable, Optional, Sequence, Tuple
+
+from starlette.concurrency import run_in_threadpool
+
+from app.utils import pdf_assets
+from config import config
+
+
+logger = logging.getLogger(__name__)
+
+# Seconds a new worker process may take to import WeasyPrint and warm up
+STARTUP_TIMEOUT = 120
+
+_pool: Optional["PdfPool"] = None
+_pool_lock = threading.Lock()
+
+
+class PdfRenderError(Exception):
+    """The PDF could not be rendered: error in WeasyPrint, timeout or worker crash."""
+
+
+class PdfQueueFull(PdfRenderError):
+    """Too many PDF jobs are waiting for a worker."""
+
+
+def render_html_to_pdf(html: str, base_url: Optional[str] = None,
+                       stylesheets: Sequence[str] = ()) -> bytes:
+    """
+    Render HTML to PDF bytes with WeasyPrint (runs in a worker process).
+
+    Args:
+        html: Complete HTML document
+        base_url: Base for relative URLs (default: app/static)
+        stylesheets: File names in app/static/pdf applied to the document
+    """
+    from weasyprint import HTML
+    if base_url is None:
+        base_url = config.STATIC_DIR.as_uri() + "/"
+    document = HTML(string=html, base_url=base_url, url_fetcher=pdf_assets.url_fetcher)
+    return document.write_pdf(
+        stylesheets=[pdf_assets.stylesheet(name) for name in stylesheets],
+        **pdf_assets.write_options())
+
+
+def warm_up() -> None:
+    """Import WeasyPrint, load the fonts and parse the PDF stylesheets once per worker process."""
+    stylesheets = [path.name for path in sorted((config.STATIC_DIR / "pdf").glob("*.css"))]
+    render_html_to_pdf("<p>BuildFlow</p>", stylesheets=stylesheets)
+
+
+def _worker_main(conn, render: Callable, warm_up: Optional[Callable]) -> None:
+    """Worker process: render jobs received over conn until None or EOF."""
+    try:
+        if warm_up is not None:
+            warm_up()
+    except Exception as e:
+        conn.send(("error", f"{type(e).__name__}: {e}"))
+        return
+    conn.send(("ready", None))
+    while True:
+        try:
+            job = conn.recv()
+        except EOFError:
+            return
+        if job is None:
+            return
+        try:
+            conn.send(("ok", render(*job)))
+        except Exception as e:
+            conn.send(("error", f"{type(e).__name__}: {e}"))
+
+
+@dataclass
+class _Job:
+    args: Tuple
+    future: Future = field(default_factory=Future)
+
+
+class PdfPool:
+    """
+    Fixed number of worker processes fed from a bounded job queue.
+
+    Each worker process is driven by a thread of this process, which sends
+    it one job at a time and waits for the result without holding the GIL.
+    """
+
+    def __init__(self, workers: int, queue_size: int, timeout: float, max_jobs: int,
+                 render: Callable = render_html_to_pdf, warm_up: Optional[Callable] = warm_up):
+        """
+        Args:
+            workers: Number of worker processes
+            queue_size: Jobs that may wait for a free worker
+            timeout: Seconds a job may run before its worker is killed
+            max_jobs: Jobs per worker process before it is replaced
+            render: Module-level function run in the worker with the job's arguments
+            warm_up: Module-level function run once when a worker process starts
+        """
+        self.timeout = timeout
+        self.max_jobs = max_jobs
+        self._render = render
+        self._warm_up = warm_up
+        self._context = multiprocessing.get_context("spawn")
+        self._jobs: queue.Queue = queue.Queue(maxsize=queue_size)
+        self._threads = [
+            threading.Thread(target=self._serve, name=f"pdf-worker-{i}", daemon=True)
+            for i in range(workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def submit(self, *args) -> Future:
+        """
+        Queue a job; the future resolves to the render function's result.
+
+        Raises:
+            PdfQueueFull: if queue_size jobs are already waiting
+        """
+        job = _Job(args)
+        try:
+            self._jobs.put_nowait(job)
+        except queue.Full:
+            raise PdfQueueFull("Zu viele PDF-Aufträge in der Warteschlange")
+        return job.future
+
+    def close(self) -> None:
+        """Stop the workers after the queued jobs are done."""
+        for _ in self._threads:
+            self._jobs.put(None)
+        for thread in self._threads:
+            thread.join()
+
+    def _start_process(self):
+        """Start a worker process and wait until it is warm, so timeouts only cover jobs."""
+        conn, child_conn = self._context.Pipe()
+        process = self._context.Process(
+            target=_worker_main, args=(child_conn, self._render, self._warm_up), daemon=True)
+        process.start()
+        child_conn.close()
+        try:
+            status, detail = conn.recv() if conn.poll(STARTUP_TIMEOUT) else ("error", "timeout")
+        except EOFError:
+            status, detail = "error", "exited"
+        if status != "ready":
+            # The next job fails and replaces the worker
+            logger.error(f"PDF worker {process.pid} failed to start: {detail}")
+        return process, conn
+
+    @staticmethod
+    def _stop_process(process, conn, kill: bool = False) -> None:
+        if process is None:
+            return
+        if kill:
+            process.kill()
+        else:
+            try:
+                conn.send(None)
+            except OSError:
+                pass
+        process.join(timeout=5)
+        if process.is_alive():
+            process.kill()
+            process.join()
+        conn.close()
+
+    def _serve(self) -> None:
+        process, conn = self._start_process()
+        jobs_done = 0
+        while True:
+            job = self._jobs.get()
+            if job is None:
+                break
+            if not job.future.set_running_or_notify_cancel():
+                continue
+
+            kill = False
+            try:
+                conn.send(job.args)
+                if not conn.poll(self.timeout):
+                    logger.error(f"PDF job exceeded {self.timeout}s, killing worker {process.pid}")
+                    kill = True
+                    job.future.set_exception(PdfRenderError(
+                        f"PDF-Erstellung nach {self.timeout:.0f}s abgebrochen"))
+                else:
+                    status, result = conn.recv()
+                    jobs_done += 1
+                    if status == "ok":
+                        job.future.set_result(result)
+                    else:
+                        job.future.set_exception(PdfRenderError(result))
+            except (EOFError, OSError) as e:
+                logger.error(f"PDF worker {process.pid} died: {e!r}")
+                kill = True
+                job.future.set_exception(PdfRenderError("PDF-Worker unerwartet beendet"))
+
+            # Replace killed workers at once, and recycle the others after
+            # max_jobs to release the memory WeasyPrint accumulated
+            if kill or jobs_done >= self.max_jobs:
+                self._stop_process(process, conn, kill=kill)
+                process, conn = self._start_process()
+                jobs_done = 0
+        self._stop_process(process, conn)
+
+
+def get_pool() -> Optional[PdfPool]:
+    """Return the process-wide pool, started on first use (None if PDF_WORKERS is 0)."""
+    global _pool
+    if config.PDF_WORKERS <= 0:
+        return None
+    with _pool_lock:
+        if _pool is None:
+            _pool = PdfPool(config.PDF_WORKERS, config.PDF_QUEUE_SIZE,
+                            config.PDF_TIMEOUT, config.PDF_MAX_JOBS_PER_WORKER)
+        return _pool
+
+
+def shutdown() -> None:
+    """Stop the process-wide pool, if it was started."""
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.close()
+
+
+async def render_pdf(html: str, base_url: Optional[str] = None,
+                     stylesheets: Sequence[str] = ()) -> bytes:
+    """
+    Render HTML to PDF without blocking the event loop or the GIL.
+
+    Args:
+        html: Complete HTML document
+        base_url: Base for relative URLs in the document (default: app/static)
+        stylesheets: File names in app/static/pdf applied to the document
+
+    Returns:
+        bytes: The PDF
+
+    Raises:
+        PdfQueueFull: if the queue is full (the caller should answer 503)
+        PdfRenderError: if rendering failed or timed out
+    """
+    pool = get_pool()
+    if pool is None:
+        try:
+            return await run_in_threadpool(render_html_to_pdf, html, base_url, tuple(stylesheets))
+        except Exception as e:
+            raise PdfRenderError(f"{type(e).__name__}: {e}") from e
+    return await asyncio.wrap_future(pool.submit(html, base_url, tuple(stylesheets)))
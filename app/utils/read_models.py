@@ -0,0 +1,323 @@
+"""
+Read models for the list and report pages.
+
+The pages only print columns, so they load them with column-only selects
+into these slotted dataclasses instead of hydrating ORM entities: no
+identity map, no instance state and no change tracking per row. Attribute
+names follow the ORM models, including the relationship names the templates
+navigate (``r.kunde.kunde_nachname``, ``r.auftrag.materialien``), so the
+templates do not care which of the two they get. The objects hold no session
+and can be cached. scripts/benchmark_read_models.py compares both approaches.
+"""
+from dataclasses import dataclass, field, fields
+from functools import lru_cache
+from datetime import date
+from decimal import Decimal
+from typing import List, Optional
+
+from sqlalchemy import false, select, true
+from sqlalchemy.orm import Session
+
+from app.models.auftrag import Auftrag
+from app.models.einnahme_ausgabe import EinnahmeAusgabe
+from app.models.eur_kategorie import EurKategorie
+from app.models.kunde import Kunde
+from app.models.material_komponente import MaterialKomponente
+from app.models.receipt import Receipt
+from app.models.rechnung import Rechnung
+from app.utils.receipts import BUCHUNG, MATERIAL
+from app.utils.pagination import Page, keyset_page, keyset_query, keyset_stream
+
+
+# Rows fetched per round trip when a page is streamed from a server-side cursor
+STREAM_BATCH_SIZE = 100
+
+
+@dataclass(slots=True)
+class KundeName:
+    """Name fields of a customer as shown next to invoices."""
+
+    kundenart: Optional[str]
+    kunde_firmenname: Optional[str]
+    ansprechpartner_vorname: Optional[str]
+    ansprechpartner_nachname: Optional[str]
+    kunde_vorname: Optional[str]
+    kunde_nachname: Optional[str]
+
+
+@dataclass(slots=True)
+class AuftragRow:
+    """Order line in the customer list."""
+
+    id: int
+    kunde_id: int
+    beschreibung: Optional[str]
+    auftrag_start: Optional[date]
+    invoice_status: str = "keine Rechnung"
+
+
+@dataclass(slots=True)
+class KundeRow:
+    """Customer with master data and orders."""
+
+    id: int
+    kundenart: Optional[str]
+    kunde_firmenname: Optional[str]
+    kunde_gesellschaftsform: Optional[str]
+    ansprechpartner_vorname: Optional[str]
+    ansprechpartner_nachname: Optional[str]
+    kunde_vorname: Optional[str]
+    kunde_nachname: Optional[str]
+    kunde_rechnungsadresse: Optional[str]
+    kunde_rechnung_plz: Optional[str]
+    kunde_rechnung_ort: Optional[str]
+    kunde_email: Optional[str]
+    kunde_telefon: Optional[str]
+    notizen: Optional[str]
+    kunde_seit: Optional[date]
+    auftraege: List[AuftragRow] = field(default_factory=list)
+
+
+@dataclass(slots=True)
+class ReceiptName:
+    """File name of a receipt of a material or booking."""
+
+    filename: str
+
+
+@dataclass(slots=True)
+class MaterialRow:
+    """Material of an order, for cost and receipt status."""
+
+    id: int
+    auftrag_id: int
+    bezeichnung: str
+    actual_cost: Optional[Decimal]
+    receipts: List[ReceiptName] = field(default_factory=list)
+
+
+@dataclass(slots=True)
+class AuftragMaterialien:
+    """Order of an invoice with its materials."""
+
+    id: int
+    materialien: List[MaterialRow] = field(default_factory=list)
+
+
+@dataclass(slots=True)
+class RechnungRow:
+    """Invoice with customer name (and, in the invoice list, its materials)."""
+
+    id: int
+    kunde_id: int
+    auftrag_id: int
+    rechnungsdatum: Optional[date]
+    rechnungssumme_gesamt: Optional[Decimal]
+    bezahlt: bool
+    payment_date: Optional[date]
+    kunde: Optional[KundeName] = None
+    auftrag: Optional[AuftragMaterialien] = None
+
+
+@dataclass(slots=True)
+class KategorieName:
+    """EÜR category name of a booking."""
+
+    name: str
+
+
+@dataclass(slots=True)
+class BuchungRow:
+    """Income or expense booking."""
+
+    id: int
+    datum: date
+    typ: str
+    betrag: Decimal
+    beschreibung: Optional[str]
+    rechnung_id: Optional[int]
+    kategorie: Optional[KategorieName] = None
+    receipts: List[ReceiptName] = field(default_factory=list)
+
+
+def columns(read_model, entity) -> list:
+    """Return the entity's columns for the read model's column fields, in field order."""
+    table_columns = entity.__table__.columns
+    return [getattr(entity, f.name) for f in fields(read_model) if f.name in table_columns]
+
+
+@lru_cache(maxsize=None)
+def _width(read_model, entity) -> int:
+    return len(columns(read_model, entity))
+
+
+def load_kunden(db: Session, after: Optional[list], size: int) -> Page:
+    """Load one page of customers (newest first) with their orders and invoice status."""
+    rows = db.execute(keyset_query(
+        select(*columns(KundeRow, Kunde)), [Kunde.id], after, size
+    )).all()
+    page = keyset_page([KundeRow(*row) for row in rows], lambda kunde: [kunde.id], size)
+
+    kunden = {kunde.id: kunde for kunde in page.items}
+    if kunden:
+        # One row per order and invoice; the latest invoice decides the status
+        auftraege = {}
+        for *auftrag, bezahlt in db.execute(
+            select(*columns(AuftragRow, Auftrag), Rechnung.bezahlt)
+            .outerjoin(Rechnung, Rechnung.auftrag_id == Auftrag.id)
+            .filter(Auftrag.kunde_id.in_(kunden))
+            .order_by(Auftrag.id, Rechnung.id)
+        ):
+            row = auftraege.get(auftrag[0])
+            if row is None:
+                row = auftraege[auftrag[0]] = AuftragRow(*auftrag)
+                kunden[row.kunde_id].auftraege.append(row)
+            if bezahlt is not None:
+                row.invoice_status = "bezahlt" if bezahlt else "offen"
+    return page
+
+
+def rechnungen_select():
+    """Select invoice columns in RechnungRow order followed by the customer name."""
+    return select(*columns(RechnungRow, Rechnung), *columns(KundeName, Kunde)).outerjoin(
+        Kunde, Kunde.id == Rechnung.kunde_id)
+
+
+def rechnung_row(row) -> RechnungRow:
+    """Build a RechnungRow with customer name from a rechnungen_select row."""
+    width = _width(RechnungRow, Rechnung)
+    rechnung = RechnungRow(*row[:width])
+    if any(value is not None for value in row[width:]):
+        rechnung.kunde = KundeName(*row[width:])
+    return rechnung
+
+
+def _rechnungen_by_status(status: Optional[str]):
+    query = rechnungen_select()
+    if status == "offen":
+        query = query.filter(Rechnung.bezahlt == false())
+    elif status == "bezahlt":
+        query = query.filter(Rechnung.bezahlt == true())
+    return query
+
+
+def _attach_materialien(db: Session, rechnungen: List[RechnungRow]) -> None:
+    """Set auftrag (with materials and their receipts) on the invoices, loading all materials in one query."""
+    auftraege = {}
+    for rechnung in rechnungen:
+        rechnung.auftrag = auftraege.setdefault(
+            rechnung.auftrag_id, AuftragMaterialien(rechnung.auftrag_id))
+    if auftraege:
+        # One row per material and receipt
+        materialien = {}
+        for *row, filename in db.execute(
+            select(*columns(MaterialRow, MaterialKomponente), Receipt.filename)
+            .outerjoin(Receipt, (Receipt.owner_type == MATERIAL) & (Receipt.owner_id == MaterialKomponente.id))
+            .filter(MaterialKomponente.auftrag_id.in_(auftraege))
+            .order_by(MaterialKomponente.id, Receipt.id)
+        ):
+            material = materialien.get(row[0])
+            if material is None:
+                material = materialien[row[0]] = MaterialRow(*row)
+                auftraege[material.auftrag_id].materialien.append(material)
+            if filename is not None:
+                material.receipts.append(ReceiptName(filename))
+
+
+def _attach_receipts(db: Session, buchungen: List[BuchungRow]) -> None:
+    """Set the receipts of the bookings, loading them in one query."""
+    by_id = {buchung.id: buchung for buchung in buchungen}
+    if by_id:
+        for owner_id, filename in db.execute(
+            select(Receipt.owner_id, Receipt.filename)
+            .filter(Receipt.owner_type == BUCHUNG, Receipt.owner_id.in_(by_id))
+            .order_by(Receipt.id)
+        ):
+            by_id[owner_id].receipts.append(ReceiptName(filename))
+
+
+def load_rechnungen(db: Session, status: Optional[str], after: Optional[list], size: int) -> Page:
+    """Load one page of invoices (newest first) with customer names and materials."""
+    rows = db.execute(keyset_query(_rechnungen_by_status(status), [Rechnung.id], after, size)).all()
+    page = keyset_page([rechnung_row(row) for row in rows], lambda r: [r.id], size)
+    _attach_materialien(db, page.items)
+    return page
+
+
+def stream_rechnungen(db: Session, status: Optional[str], after: Optional[list], size: int) -> Page:
+    """
+    Like load_rechnungen, but read the rows while the page is rendered.
+
+    The query runs when the items are first iterated and fetches
+    STREAM_BATCH_SIZE rows per round trip from a server-side cursor; the
+    materials are loaded per batch. The session must stay open until then.
+    """
+    query = keyset_query(_rechnungen_by_status(status), [Rechnung.id], after, size)
+
+    def rows():
+        result = db.execute(query.execution_options(yield_per=STREAM_BATCH_SIZE))
+        try:
+            for batch in result.partitions():
+                rechnungen = [rechnung_row(row) for row in batch]
+                _attach_materialien(db, rechnungen)
+                yield from rechnungen
+        finally:
+            result.close()
+
+    return keyset_stream(rows(), lambda r: [r.id], size)
+
+
+def load_recent_rechnungen(db: Session, limit: int) -> List[RechnungRow]:
+    """Load the latest invoices with customer names."""
+    rows = db.execute(rechnungen_select().order_by(Rechnung.id.desc()).limit(limit)).all()
+    return [rechnung_row(row) for row in rows]
+
+
+def buchungen_select(with_kategorie: bool = False):
+    """Select booking columns in BuchungRow order, optionally with the category name."""
+    query = select(*columns(BuchungRow, EinnahmeAusgabe))
+    if with_kategorie:
+        query = query.add_columns(EurKategorie.name).join(
+            EurKategorie, EurKategorie.id == EinnahmeAusgabe.kategorie_id)
+    return query
+
+
+def buchung_row(row) -> BuchungRow:
+    """Build a BuchungRow from a buchungen_select row."""
+    width = _width(BuchungRow, EinnahmeAusgabe)
+    buchung = BuchungRow(*row[:width])
+    if len(row) > width:
+        buchung.kategorie = KategorieName(row[width])
+    return buchung
+
+
+def _manuelle_buchungen_query(after: Optional[list], size: int):
+    return keyset_query(
+        buchungen_select(with_kategorie=True).filter(EinnahmeAusgabe.rechnung_id.is_(None)),
+        [EinnahmeAusgabe.datum, EinnahmeAusgabe.id], after, size
+    )
+
+
+def load_manuelle_buchungen(db: Session, after: Optional[list], size: int) -> Page:
+    """Load one page of bookings without invoice (newest first) with category names."""
+    rows = db.execute(_manuelle_buchungen_query(after, size)).all()
+    page = keyset_page([buchung_row(row) for row in rows], lambda b: [b.datum, b.id], size)
+    _attach_receipts(db, page.items)
+    return page
+
+
+def stream_manuelle_buchungen(db: Session, after: Optional[list], size: int) -> Page:
+    """Like load_manuelle_buchungen, but read the rows while the page is rendered."""
+    query = _manuelle_buchungen_query(after, size)
+
+    def rows():
+        result = db.execute(query.execution_options(yield_per=STREAM_BATCH_SIZE))
+        try:
+            for batch in result.partitions():
+                buchungen = [buchung_row(row) for row in batch]
+                _attach_receipts(db, buchungen)
+                yield from buchungen
+        finally:
+            result.close()
+
+    return keyset_stream(rows(), lambda b: [b.datum, b.id], size)
@@ -0,0 +1,249 @@
+"""
+Receipt files of materials and bookings (app.models.receipt).
+
+Every uploaded file has one row in the receipt table with its owner, size,
+MIME type and SHA-256, so looking a file up is one hit on the unique index
+on filename. Receipts used to be kept as a comma-separated string in
+``material_komponente.receipt_path`` and as a JSON list in
+``einnahmen_ausgaben.receipt_files``; ``migrate_legacy_receipts`` moves them
+into the table and ``drop_legacy_receipt_columns`` removes the columns
+afterwards (scripts/migrate_receipts.py).
+"""
+import datetime
+import hashlib
+import json
+import logging
+import os
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import delete, inspect, select, text
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+
+from app.models.receipt import Receipt
+from config import config
+
+
+logger = logging.getLogger(__name__)
+
+MATERIAL = "material"
+BUCHUNG = "buchung"
+
+MIME_TYPES = {
+    ".pdf": "application/pdf",
+    ".jpg": "image/jpeg",
+    ".jpeg": "image/jpeg",
+    ".png": "image/png",
+    ".gif": "image/gif",
+    ".tiff": "image/tiff",
+    ".bmp": "image/bmp",
+}
+
+
+def mime_type(filename: str) -> str:
+    """MIME type of a receipt by its file extension."""
+    return MIME_TYPES.get(os.path.splitext(filename.lower())[1], "application/octet-stream")
+
+
+def file_sha256(path: Path) -> str:
+    """SHA-256 of a file, read in chunks."""
+    sha = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+def add_receipt(db: Session, owner_type: str, owner_id: int, filename: str,
+                size: Optional[int] = None, sha256: Optional[str] = None) -> Receipt:
+    """
+    Register a file saved in RECEIPTS_DIR for a material or booking.
+
+    Args:
+        db: Database session (not committed)
+        owner_type: MATERIAL or BUCHUNG
+        owner_id: Id of the material or booking
+        filename: Name of the file in RECEIPTS_DIR
+        size: File size; read from the file if not given
+        sha256: Hex digest; computed from the file if not given
+
+    Returns:
+        Receipt: The new row
+    """
+    path = config.RECEIPTS_DIR / filename
+    receipt = Receipt(
+        filename=filename, owner_type=owner_type, owner_id=owner_id,
+        size=path.stat().st_size if size is None else size,
+        mime_type=mime_type(filename),
+        sha256=file_sha256(path) if sha256 is None else sha256,
+    )
+    db.add(receipt)
+    return receipt
+
+
+def find_receipt(db: Session, filename: str) -> Optional[Receipt]:
+    """The receipt with this file name, if it is registered."""
+    return db.scalar(select(Receipt).where(Receipt.filename == filename))
+
+
+def remove_receipt(db: Session, owner_type: str, owner_id: int, filename: str) -> bool:
+    """Delete the row of one receipt of an owner; False if the owner has no such receipt."""
+    result = db.execute(delete(Receipt).where(
+        Receipt.filename == filename, Receipt.owner_type == owner_type, Receipt.owner_id == owner_id))
+    return result.rowcount > 0
+
+
+def remove_receipts(db: Session, owner_type: str, owner_ids: Iterable[int]) -> List[str]:
+    """
+    Delete the receipt rows of materials or bookings that are being deleted.
+
+    Returns:
+        List[str]: The file names, to be deleted from disk after the commit
+    """
+    owner_ids = list(owner_ids)
+    if not owner_ids:
+        return []
+    owner = (Receipt.owner_type == owner_type) & Receipt.owner_id.in_(owner_ids)
+    filenames = list(db.scalars(select(Receipt.filename).where(owner)))
+    if filenames:
+        db.execute(delete(Receipt).where(owner))
+    return filenames
+
+
+def _comma_separated(value: str) -> List[str]:
+    return [name.strip() for name in value.split(",") if name.strip()]
+
+
+def _json_list(value: str) -> List[str]:
+    try:
+        names = json.loads(value)
+    except ValueError:
+        return []
+    return [name for name in names if isinstance(name, str)] if isinstance(names, list) else []
+
+
+@dataclass
+class ReceiptMigration:
+    """Receipts registered by migrate_legacy_receipts and the names it could not assign."""
+    moved: int = 0
+    conflicts: List[str] = field(default_factory=list)
+
+
+class LegacyReceiptConflict(Exception):
+    """Legacy receipt names are not registered for their row, so the old columns must stay."""
+
+    def __init__(self, unresolved: List[str]):
+        super().__init__(f"{len(unresolved)} Belege nicht übernommen: {', '.join(unresolved)}")
+        self.unresolved = unresolved
+
+
+# Legacy column per owner type and how its value lists the file names
+LEGACY_COLUMNS = (
+    ("material_komponente", "receipt_path", MATERIAL, _comma_separated),
+    ("einnahmen_ausgaben", "receipt_files", BUCHUNG, _json_list),
+)
+
+
+def _legacy_columns(connection: Connection):
+    """The LEGACY_COLUMNS entries whose column still exists."""
+    for table_name, column, owner_type, file_names in LEGACY_COLUMNS:
+        if column in {c["name"] for c in inspect(connection).get_columns(table_name)}:
+            yield table_name, column, owner_type, file_names
+
+
+def _legacy_receipts(connection: Connection, table_name: str, column: str, file_names):
+    """(owner id, file name) for every name listed in a legacy column."""
+    rows = connection.execute(text(
+        f"SELECT id, {column} FROM {table_name} WHERE {column} IS NOT NULL AND {column} != ''"
+    )).all()
+    for owner_id, value in rows:
+        for filename in file_names(value):
+            yield owner_id, filename
+
+
+def _registered_owners(connection: Connection) -> Dict[str, Tuple[str, int]]:
+    rows = connection.execute(select(Receipt.filename, Receipt.owner_type, Receipt.owner_id))
+    return {filename: (owner_type, owner_id) for filename, owner_type, owner_id in rows}
+
+
+def migrate_legacy_receipts(connection: Connection) -> ReceiptMigration:
+    """
+    Move the receipt names of the legacy columns into the receipt table.
+
+    Size, hash and upload time are taken from the files; files missing on
+    disk are registered without them. Names that are already registered for
+    the same owner are skipped, so an interrupted migration can be run
+    again. A name that is registered for another owner is a conflict: it is
+    logged and returned, and the row stays as it is. The legacy columns are
+    kept; ``drop_legacy_receipt_columns`` removes them in a separate step.
+
+    Args:
+        connection: Connection in a transaction; the receipt table must exist
+
+    Returns:
+        ReceiptMigration: The number of receipts registered and the conflicts
+    """
+    owners = _registered_owners(connection)
+    table = Receipt.__table__
+    result = ReceiptMigration()
+    for table_name, column, owner_type, file_names in _legacy_columns(connection):
+        for owner_id, filename in _legacy_receipts(connection, table_name, column, file_names):
+            owner = owners.get(filename)
+            if owner == (owner_type, owner_id):
+                continue
+            if owner is not None:
+                conflict = (f"{filename} ({table_name}.{column} von #{owner_id}) "
+                            f"ist bereits {owner[0]} #{owner[1]} zugeordnet")
+                logger.warning(f"Beleg {conflict}")
+                result.conflicts.append(conflict)
+                continue
+            path = config.RECEIPTS_DIR / filename
+            size = sha256 = None
+            uploaded_at = datetime.datetime.now()
+            if path.is_file():
+                stat = path.stat()
+                size, sha256 = stat.st_size, file_sha256(path)
+                uploaded_at = datetime.datetime.fromtimestamp(stat.st_mtime)
+            else:
+                logger.warning(f"Beleg {filename} fehlt in {config.RECEIPTS_DIR}")
+            connection.execute(table.insert().values(
+                filename=filename, owner_type=owner_type, owner_id=owner_id, size=size,
+                mime_type=mime_type(filename), sha256=sha256, uploaded_at=uploaded_at))
+            owners[filename] = (owner_type, owner_id)
+            result.moved += 1
+    return result
+
+
+def drop_legacy_receipt_columns(connection: Connection) -> List[str]:
+    """
+    Drop the legacy receipt columns once every name in them is registered.
+
+    Each name is checked against the receipt table again, so the columns are
+    only dropped when a migration ran without conflicts and nothing was
+    added to them since.
+
+    Args:
+        connection: Connection in a transaction
+
+    Returns:
+        List[str]: The dropped columns as ``table.column``
+
+    Raises:
+        LegacyReceiptConflict: A name is not registered for the row listing it;
+            no column is dropped
+    """
+    owners = _registered_owners(connection)
+    columns = list(_legacy_columns(connection))
+    unresolved = [
+        f"{filename} ({table_name}.{column} von #{owner_id})"
+        for table_name, column, owner_type, file_names in columns
+        for owner_id, filename in _legacy_receipts(connection, table_name, column, file_names)
+        if owners.get(filename) != (owner_type, owner_id)
+    ]
+    if unresolved:
+        raise LegacyReceiptConflict(unresolved)
+    for table_name, column, _, _ in columns:
+        connection.execute(text(f"ALTER TABLE {table_name} DROP COLUMN {column}"))
+    return [f"{table_name}.{column}" for table_name, column, _, _ in columns]
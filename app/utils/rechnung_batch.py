@@ -0,0 +1,275 @@
+"""
+Invoice creation for single orders and batches of orders.
+
+`build_rechnung` and `render_rechnung_html` are shared by the invoice form
+(app.routes.rechnung_route) and the batch run. A batch (`run_batch`, used by
+POST /api/rechnungen/batch and scripts/rechnungen_erstellen.py):
+
+1. loads the orders with their customers, the work components, the
+   material components and the existing invoices with one query each,
+2. checks every order and creates the invoices of all billable orders in
+   one transaction; orders that cannot be billed (unknown, already
+   invoiced, no work components) are reported and skipped,
+3. renders the PDFs in parallel in a PDF worker pool (one after the other
+   without pool) and stores them in the PDF cache and as archive copy in
+   rechnungen/. A failed render is reported but keeps its invoice; the PDF
+   is rendered again on download.
+"""
+import datetime
+import shutil
+import time
+from collections import defaultdict
+from concurrent.futures import FIRST_COMPLETED, wait
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import exists, or_, select
+from sqlalchemy.orm import Session, joinedload
+
+from app.models.arbeit_komponente import ArbeitKomponente
+from app.models.auftrag import Auftrag
+from app.models.material_komponente import MaterialKomponente
+from app.models.rechnung import Rechnung
+from app.models.unternehmensdaten import Unternehmensdaten
+from app.utils import pdf_assets
+from app.utils.pdf_cache import document_key, get_cache, render_cached
+from app.utils.pdf_pool import PdfPool, PdfQueueFull
+from app.utils.template_utils import get_templates
+from config import config
+
+
+RECHNUNG_STYLESHEETS = ("rechnung.css",)
+
+ProgressCallback = Callable[[int, int, dict], None]
+
+
+@dataclass
+class BatchResult:
+    """Invoices created in a batch and orders that failed, with the reason."""
+    created: List[dict] = field(default_factory=list)
+    failed: List[dict] = field(default_factory=list)
+
+    def to_dict(self) -> dict:
+        return {"created": self.created, "failed": self.failed}
+
+
+def invoice_totals(komponenten: Iterable[ArbeitKomponente],
+                   materialien: Iterable[MaterialKomponente]) -> Tuple[float, float]:
+    """Return the labour and material totals of an order."""
+    gesamt_arbeit = 0
+    for k in komponenten:
+        if k.berechnungsbasis == "stunden":
+            gesamt_arbeit += float(k.anzahl_stunden or 0) * float(k.stundenlohn or 0)
+        elif k.berechnungsbasis == "quadratmeter":
+            gesamt_arbeit += float(k.anzahl_quadrat or 0) * float(k.preis_pro_quadrat or 0)
+    gesamt_material = sum(
+        float(m.preis_pro_einheit or 0) * float(m.anzahl or 1)
+        for m in materialien
+    )
+    return gesamt_arbeit, gesamt_material
+
+
+def build_rechnung(auftrag: Auftrag, rechnungsdatum: datetime.date,
+                   komponenten: List[ArbeitKomponente],
+                   materialien: List[MaterialKomponente],
+                   kunde_id: Optional[int] = None) -> Rechnung:
+    """Create the (unsaved) invoice of an order with its totals, billed to the order's customer by default."""
+    gesamt_arbeit, gesamt_material = invoice_totals(komponenten, materialien)
+    return Rechnung(
+        kunde_id=kunde_id or auftrag.kunde_id,
+        auftrag_id=auftrag.id,
+        unternehmensdaten_id=1,  # Anpassen falls mehrere Unternehmen
+        rechnungsdatum=rechnungsdatum,
+        faelligkeit=datetime.date.today() + datetime.timedelta(days=30),
+        rechtlicher_hinweis="Zahlbar ohne Abzug innerhalb von 14 Tagen.",
+        rechnungssumme_arbeit=gesamt_arbeit,
+        rechnungssumme_material=gesamt_material,
+        rechnungssumme_gesamt=float(gesamt_arbeit) + float(gesamt_material)
+    )
+
+
+def render_rechnung_html(db: Session, rechnung: Rechnung,
+                         komponenten: Optional[List[ArbeitKomponente]] = None,
+                         materialien: Optional[List[MaterialKomponente]] = None,
+                         unternehmensdaten: Optional[Unternehmensdaten] = None) -> Tuple[str, str]:
+    """
+    Render the invoice HTML from the current data.
+
+    Components and company data are loaded unless passed in (batches load
+    them for all orders at once).
+
+    Returns:
+        Tuple[str, str]: The HTML and the PDF file name
+    """
+    kunde = rechnung.kunde
+    if komponenten is None:
+        komponenten = db.query(ArbeitKomponente).filter(
+            ArbeitKomponente.auftrag_id == rechnung.auftrag_id).all()
+    if materialien is None:
+        materialien = db.query(MaterialKomponente).filter(
+            MaterialKomponente.auftrag_id == rechnung.auftrag_id).all()
+    if unternehmensdaten is None:
+        unternehmensdaten = db.query(Unternehmensdaten).first()
+
+    rendered_html = get_templates().get_template("rechnung_template.html").render({
+        "kunde": kunde,
+        "auftrag": rechnung.auftrag,
+        "komponenten": komponenten,
+        "materialien": materialien,
+        "rechnung": rechnung,
+        "unternehmensdaten": unternehmensdaten,
+        "logo_base64": pdf_assets.logo_base64()
+    })
+
+    # Create customer name for filename (safe for filesystem)
+    if kunde.kundenart == "Privatkunde":
+        customer_name = f"{kunde.kunde_vorname}_{kunde.kunde_nachname}"
+    else:
+        customer_name = kunde.kunde_firmenname or "Unbekannt"
+    safe_customer_name = "".join(c for c in customer_name if c.isalnum() or c in ('_', '-')).strip()
+
+    return rendered_html, f"Rechnung_{rechnung.id}_{safe_customer_name}.pdf"
+
+
+def finished_order_ids(db: Session, as_of: datetime.date) -> List[int]:
+    """
+    Orders without invoice whose work is finished on as_of.
+
+    An order is finished when it has work components and every one of them
+    has an end date on or before as_of.
+    """
+    komponenten = select(ArbeitKomponente.id).where(ArbeitKomponente.auftrag_id == Auftrag.id)
+    offen = komponenten.where(or_(ArbeitKomponente.komponente_ende.is_(None),
+                                  ArbeitKomponente.komponente_ende > as_of))
+    return list(db.scalars(
+        select(Auftrag.id)
+        .where(~exists().where(Rechnung.auftrag_id == Auftrag.id))
+        .where(exists(komponenten))
+        .where(~exists(offen))
+        .order_by(Auftrag.id)
+    ))
+
+
+def create_invoices(db: Session, auftrag_ids: Iterable[int],
+                    rechnungsdatum: datetime.date) -> Tuple[BatchResult, List[Tuple[dict, str]]]:
+    """
+    Create the invoices of all billable orders in one transaction.
+
+    Returns:
+        The batch result so far and, per created invoice, its result entry
+        and the rendered HTML for the PDF
+    """
+    ids = list(dict.fromkeys(auftrag_ids))
+    result = BatchResult()
+    if not ids:
+        return result, []
+
+    auftraege = {a.id: a for a in db.query(Auftrag).options(joinedload(Auftrag.kunde))
+                 .filter(Auftrag.id.in_(ids))}
+    komponenten: Dict[int, List[ArbeitKomponente]] = defaultdict(list)
+    for k in db.query(ArbeitKomponente).filter(ArbeitKomponente.auftrag_id.in_(ids)).order_by(ArbeitKomponente.id):
+        komponenten[k.auftrag_id].append(k)
+    materialien: Dict[int, List[MaterialKomponente]] = defaultdict(list)
+    for m in db.query(MaterialKomponente).filter(MaterialKomponente.auftrag_id.in_(ids)).order_by(MaterialKomponente.id):
+        materialien[m.auftrag_id].append(m)
+    bestehende = dict(db.query(Rechnung.auftrag_id, Rechnung.id).filter(Rechnung.auftrag_id.in_(ids)))
+
+    neue = []
+    for auftrag_id in ids:
+        auftrag = auftraege.get(auftrag_id)
+        if auftrag is None:
+            fehler = "Auftrag nicht gefunden"
+        elif auftrag_id in bestehende:
+            fehler = f"Rechnung #{bestehende[auftrag_id]} existiert bereits"
+        elif not komponenten[auftrag_id]:
+            fehler = "Keine Arbeitskomponenten"
+        else:
+            rechnung = build_rechnung(auftrag, rechnungsdatum, komponenten[auftrag_id], materialien[auftrag_id])
+            db.add(rechnung)
+            neue.append(rechnung)
+            continue
+        result.failed.append({"auftrag_id": auftrag_id, "fehler": fehler})
+
+    # Keep the loaded objects: rendering needs them, reloading costs a query per invoice
+    expire_on_commit, db.expire_on_commit = db.expire_on_commit, False
+    try:
+        db.commit()
+    finally:
+        db.expire_on_commit = expire_on_commit
+
+    unternehmensdaten = db.query(Unternehmensdaten).first()
+    documents = []
+    for rechnung in neue:
+        auftrag = auftraege[rechnung.auftrag_id]
+        rendered_html, filename = render_rechnung_html(
+            db, rechnung, komponenten[auftrag.id], materialien[auftrag.id], unternehmensdaten)
+        entry = {"auftrag_id": auftrag.id, "rechnung_id": rechnung.id, "datei": filename}
+        result.created.append(entry)
+        documents.append((entry, rendered_html))
+    return result, documents
+
+
+def _archive_pdf(entry: dict, path: Path) -> None:
+    """Write the archive copy of a cached invoice PDF."""
+    config.INVOICES_DIR.mkdir(exist_ok=True)
+    shutil.copyfile(path, config.INVOICES_DIR / entry["datei"])
+
+
+def render_invoices(pool: Optional[PdfPool], documents: List[Tuple[dict, str]], result: BatchResult,
+                    progress: Optional[ProgressCallback] = None) -> None:
+    """
+    Render the PDFs of created invoices in parallel.
+
+    Jobs are handed to the pool as fast as its queue accepts them; without
+    pool the PDFs are rendered in this process. Failed renders are moved
+    from result.created to result.failed.
+    """
+    total = len(documents)
+    done = 0
+    pending = {}
+    waiting = list(documents)
+
+    def finish(entry, store):
+        nonlocal done
+        try:
+            _archive_pdf(entry, store())
+        except Exception as e:
+            result.created.remove(entry)
+            result.failed.append(dict(entry, fehler=f"PDF-Erstellung fehlgeschlagen: {e}"))
+        done += 1
+        if progress is not None:
+            progress(done, total, entry)
+
+    if pool is None:
+        for entry, rendered_html in documents:
+            finish(entry, lambda: render_cached(rendered_html, RECHNUNG_STYLESHEETS)[1])
+        return
+
+    def put(rendered_html, future):
+        return get_cache().put(document_key(rendered_html, RECHNUNG_STYLESHEETS), future.result())
+
+    while waiting or pending:
+        while waiting:
+            entry, rendered_html = waiting[0]
+            try:
+                future = pool.submit(rendered_html, None, RECHNUNG_STYLESHEETS)
+            except PdfQueueFull:
+                break
+            pending[future] = waiting.pop(0)
+        if not pending:
+            # The pool is busy with other PDFs
+            time.sleep(0.1)
+            continue
+        completed, _ = wait(list(pending), return_when=FIRST_COMPLETED)
+        for future in completed:
+            entry, rendered_html = pending.pop(future)
+            finish(entry, lambda: put(rendered_html, future))
+
+
+def run_batch(db: Session, auftrag_ids: Iterable[int], rechnungsdatum: datetime.date,
+              pool: Optional[PdfPool], progress: Optional[ProgressCallback] = None) -> BatchResult:
+    """Create the invoices of the given orders and render their PDFs."""
+    result, documents = create_invoices(db, auftrag_ids, rechnungsdatum)
+    render_invoices(pool, documents, result, progress)
+    return result
@@ -0,0 +1,105 @@
+"""
+In-process LRU cache for computed report contexts (dashboard, EÜR).
+
+Entries are tied to the global data version (see app.utils.data_version):
+as soon as any worker commits a write, the version changes and every worker
+drops its cached reports on the next lookup.
+"""
+import threading
+from collections import OrderedDict
+from typing import Awaitable, Callable, Hashable
+
+from app.utils.data_version import current_version
+from config import config
+
+
+class ReportCache:
+    """Thread-safe LRU cache with hit/miss counters."""
+
+    def __init__(self, maxsize: int = 64):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.version = None
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable):
+        """Return the cached value for key or None."""
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            self.misses += 1
+            return None
+
+    def set(self, key: Hashable, value, version: str) -> None:
+        """
+        Store a value computed from data at `version`.
+
+        Values computed from an older data version are discarded, so a
+        read that overlapped a write can never be cached.
+        """
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            if version != self.version:
+                return
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[], dict]):
+        """Return the cached value for key, computing and storing it on a miss."""
+        version = current_version()
+        self.sync(version)
+        value = self.get(key)
+        if value is None:
+            value = compute()
+            self.set(key, value, version)
+        return value
+
+    async def get_or_compute_async(self, key: Hashable, compute: Callable[[], Awaitable[dict]]):
+        """Like get_or_compute, for async handlers that await the computation."""
+        version = current_version()
+        self.sync(version)
+        value = self.get(key)
+        if value is None:
+            value = await compute()
+            self.set(key, value, version)
+        return value
+
+    def sync(self, version: str) -> None:
+        """Drop all entries if they were computed from another data version."""
+        with self._lock:
+            if version != self.version:
+                if self._entries:
+                    self.invalidations += 1
+                self._entries.clear()
+                self.version = version
+
+    def invalidate(self) -> None:
+        """Drop all cached entries."""
+        with self._lock:
+            self._entries.clear()
+            self.version = None
+            self.invalidations += 1
+
+    def stats(self) -> dict:
+        """Return size and hit/miss counters for monitoring."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+                "invalidations": self.invalidations
+            }
+
+
+report_cache = ReportCache(config.REPORT_CACHE_SIZE)
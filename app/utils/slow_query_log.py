@@ -0,0 +1,145 @@
+"""
+Slow-query log with captured query plans.
+
+Statements slower than SLOW_QUERY_MS are written as JSON lines to a rotating
+log file together with the parameter shape (types only, no values), the
+duration, the calling route and the database's query plan. `top_offenders`
+aggregates the log for the diagnostics page. The cursor listeners in
+app.utils.sql_instrumentation call `record_slow_query`.
+"""
+import json
+import logging
+import logging.handlers
+import re
+import time
+from collections import defaultdict
+from typing import List, Optional
+
+from config import config
+
+
+logger = logging.getLogger("buildflow.slow_query")
+logger.propagate = False
+
+_handler = None
+
+# Expanded IN lists differ only in their number of placeholders
+_PLACEHOLDER_LIST = re.compile(r"\((?:\?|%\([^)]+\)s|\$\d+)(?:, ?(?:\?|%\([^)]+\)s|\$\d+))+\)")
+
+
+def _ensure_handler() -> None:
+    """Attach the rotating file handler for the configured log file."""
+    global _handler
+    path = config.SLOW_QUERY_LOG_FILE
+    if _handler is not None and _handler.baseFilename == str(path.resolve()):
+        return
+    if _handler is not None:
+        logger.removeHandler(_handler)
+        _handler.close()
+    path.parent.mkdir(parents=True, exist_ok=True)
+    _handler = logging.handlers.RotatingFileHandler(
+        path, maxBytes=5*1024*1024, backupCount=3, encoding="utf-8")
+    _handler.setFormatter(logging.Formatter("%(message)s"))
+    logger.addHandler(_handler)
+    logger.setLevel(logging.INFO)
+
+
+def fingerprint(statement: str) -> str:
+    """Normalise whitespace and IN lists so equal query shapes group together."""
+    return _PLACEHOLDER_LIST.sub("(...)", " ".join(statement.split()))
+
+
+def _parameter_shape(parameters, executemany: bool):
+    if executemany:
+        return f"executemany[{len(parameters)}]"
+    if isinstance(parameters, dict):
+        return {key: type(value).__name__ for key, value in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        return [type(value).__name__ for value in parameters]
+    return type(parameters).__name__
+
+
+def explain(conn, statement: str, parameters) -> Optional[List[str]]:
+    """
+    Return the query plan of a SELECT statement, one line per plan step.
+
+    Runs on a separate DBAPI cursor of the same connection, so it sees the
+    same transaction and does not trigger the SQLAlchemy cursor events.
+    """
+    if not statement.lstrip().upper().startswith(("SELECT", "WITH")):
+        return None
+    prefix = "EXPLAIN QUERY PLAN " if conn.dialect.name == "sqlite" else "EXPLAIN "
+    try:
+        cursor = conn.connection.dbapi_connection.cursor()
+        try:
+            cursor.execute(prefix + statement, parameters)
+            return [str(row[-1]) for row in cursor.fetchall()]
+        finally:
+            cursor.close()
+    except Exception:
+        # Diagnostics must never break the request
+        return None
+
+
+def record_slow_query(conn, statement: str, parameters, executemany: bool,
+                      duration: float, route: Optional[str]) -> None:
+    """
+    Write one slow statement to the slow-query log.
+
+    Args:
+        conn: SQLAlchemy connection the statement ran on
+        statement: Parameterised SQL
+        parameters: Bound parameters (only their types are stored)
+        executemany: Whether the statement ran as executemany
+        duration: Execution time in seconds
+        route: Calling route, e.g. "GET /receipt/abc.pdf" (None outside requests)
+    """
+    _ensure_handler()
+    logger.info(json.dumps({
+        "time": time.time(),
+        "duration_ms": round(duration * 1000, 2),
+        "route": route,
+        "statement": fingerprint(statement),
+        "parameters": _parameter_shape(parameters, executemany),
+        "plan": None if executemany else explain(conn, statement, parameters),
+    }, ensure_ascii=False))
+
+
+def top_offenders(limit: int = 20) -> List[dict]:
+    """
+    Aggregate the slow-query log (including rotated files) by statement.
+
+    Returns:
+        List[dict]: statement, count, total_ms, max_ms, avg_ms, routes,
+        parameters and plan of the slowest run, ordered by total time
+    """
+    path = config.SLOW_QUERY_LOG_FILE
+    files = [path.with_name(f"{path.name}.{n}") for n in range(3, 0, -1)] + [path]
+
+    groups = defaultdict(lambda: {"count": 0, "total_ms": 0.0, "max_ms": 0.0, "routes": set()})
+    for log_file in files:
+        if not log_file.exists():
+            continue
+        with open(log_file, encoding="utf-8") as handle:
+            for line in handle:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                group = groups[entry["statement"]]
+                group["count"] += 1
+                group["total_ms"] += entry["duration_ms"]
+                if entry.get("route"):
+                    group["routes"].add(entry["route"])
+                if entry["duration_ms"] >= group["max_ms"]:
+                    group["max_ms"] = entry["duration_ms"]
+                    group["parameters"] = entry.get("parameters")
+                    group["plan"] = entry.get("plan")
+
+    offenders = [
+        dict(group, statement=statement, routes=sorted(group["routes"]),
+             avg_ms=group["total_ms"] / group["count"])
+        for statement, group in groups.items()
+    ]
+    offenders.sort(key=lambda offender: offender["total_ms"], reverse=True)
+    return offenders[:limit]
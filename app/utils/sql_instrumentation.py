@@ -0,0 +1,113 @@
+"""
+Per-request SQL statistics and N+1 detection.
+
+Cursor-execute listeners on all engines count the statements, the time
+spent in the database and how often each parameterised statement ran while
+a `track_sql()` block is active. The request log middleware in
+app.utils.logging_config opens such a block for every request when
+SQL_INSTRUMENTATION or the slow-query log is enabled. Statements slower than
+SLOW_QUERY_MS are handed to app.utils.slow_query_log.
+"""
+import logging
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Iterator, List, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.utils.slow_query_log import record_slow_query
+from config import config
+
+
+logger = logging.getLogger("buildflow.sql")
+
+_current_stats: ContextVar[Optional["SqlStats"]] = ContextVar("sql_stats", default=None)
+_installed = False
+
+
+@dataclass
+class SqlStats:
+    """SQL statements issued within one tracked block."""
+
+    label: Optional[str] = None
+    statements: int = 0
+    db_time: float = 0.0
+    fingerprints: Counter = field(default_factory=Counter)
+
+    def repeated(self, threshold: int) -> List[Tuple[str, int]]:
+        """Return (statement, count) for statements that ran more than threshold times."""
+        return [(sql, count) for sql, count in self.fingerprints.most_common()
+                if count > threshold]
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current_stats.get() is not None or config.SLOW_QUERY_MS > 0:
+        context._sql_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = getattr(context, "_sql_started", None)
+    if started is None:
+        return
+    duration = time.perf_counter() - started
+    stats = _current_stats.get()
+
+    if stats is not None:
+        stats.statements += 1
+        stats.db_time += duration
+        # The statement text is parameterised, so it identifies the query shape
+        stats.fingerprints[statement] += 1
+
+    if 0 < config.SLOW_QUERY_MS <= duration * 1000:
+        record_slow_query(conn, statement, parameters, executemany, duration,
+                          stats.label if stats is not None else None)
+
+
+def install() -> None:
+    """Register the cursor listeners on all engines (idempotent)."""
+    global _installed
+    if _installed:
+        return
+    event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+    _installed = True
+
+
+@contextmanager
+def track_sql(label: str = None) -> Iterator[SqlStats]:
+    """Collect statistics for all statements executed inside the block."""
+    install()
+    stats = SqlStats(label=label)
+    token = _current_stats.set(stats)
+    try:
+        yield stats
+    finally:
+        _current_stats.reset(token)
+
+
+def warn_repeated_statements(stats: SqlStats, label: str,
+                             threshold: int = None) -> List[Tuple[str, int]]:
+    """
+    Log a warning for every statement that looks like an N+1 pattern.
+
+    Args:
+        stats: Collected statistics
+        label: Where the statements came from, e.g. "GET /rechnungsliste"
+        threshold: Maximum repetitions before warning (config default if None)
+
+    Returns:
+        List[Tuple[str, int]]: The repeated statements with their counts
+    """
+    if threshold is None:
+        threshold = config.SQL_N_PLUS_ONE_THRESHOLD
+    repeated = stats.repeated(threshold)
+    for statement, count in repeated:
+        logger.warning(
+            f"Possible N+1: {label} ran the same statement {count}x: "
+            f"{' '.join(statement.split())[:300]}"
+        )
+    return repeated
@@ -1,12 +1,32 @@
 """
 Template utilities for consistent Jinja2 setup and common functions.
+
+All routers share one Jinja environment (`get_templates()`), so every
+template is compiled once per worker and sees the same filters. Compiled
+templates are kept in a filesystem bytecode cache, and
+`precompile_templates()` loads all of them at startup.
 """
 import json
+import logging
+import os
 from pathlib import Path
+from typing import Callable, Iterator, Mapping, Optional
+from urllib.parse import urlencode
+from fastapi.responses import StreamingResponse
 from fastapi.templating import Jinja2Templates
+from jinja2 import BytecodeCache, Environment, FileSystemBytecodeCache, FileSystemLoader, TemplateError
 from config import config
 
 
+logger = logging.getLogger(__name__)
+
+_templates: Optional[Jinja2Templates] = None
+
+
+# Rendered output is sent in chunks of at least this many characters
+STREAM_CHUNK_SIZE = 16 * 1024
+
+
 def from_json(value):
     """
     Convert JSON string to Python object for use in templates.
@@ -65,19 +85,164 @@ def german_decimal(value, decimals=2):
         return "0" + "," + "0" * decimals if decimals > 0 else "0"
 
 
+def basename(path):
+    """
+    Return the file name of a path for display, e.g. of a stored receipt.
+
+    Args:
+        path: File path or None
+
+    Returns:
+        File name, or empty string if path is empty
+    """
+    return os.path.basename(path) if path else ''
+
+
+def page_url(request, **params) -> str:
+    """
+    Build a relative link to the current page with some query parameters changed.
+
+    Args:
+        request: Current request
+        **params: Parameters to set; None removes the parameter
+
+    Returns:
+        Path with query string (e.g., "/rechnungsliste?status=offen&cursor=WzEyXQ")
+    """
+    query = dict(request.query_params)
+    for key, value in params.items():
+        if value is None:
+            query.pop(key, None)
+        else:
+            query[key] = value
+    return request.url.path + ("?" + urlencode(query) if query else "")
+
+
+class StreamingTemplateResponse(StreamingResponse):
+    """
+    HTML response that renders the template while the body is sent.
+
+    Jinja's generate() produces the page piece by piece. Everything up to
+    </head> is sent at once, so the browser loads the stylesheets while the
+    page renders; the rest is sent in chunks of STREAM_CHUNK_SIZE. The full
+    page is never held in memory. Context values may be lazy, e.g. pages from
+    app.utils.read_models.stream_rechnungen that read their rows from a
+    server-side cursor while they are rendered. Rendering (and reading
+    those rows) runs in the threadpool.
+
+    Errors raised while rendering cannot change the status code any more,
+    so validate input before creating the response.
+    """
+
+    def __init__(self, templates: Jinja2Templates, name: str, context: Mapping,
+                 status_code: int = 200, headers: Optional[Mapping[str, str]] = None,
+                 on_close: Optional[Callable[[], None]] = None):
+        """
+        Args:
+            templates: Shared Templates instance from get_templates()
+            name: Template name
+            context: Template context including "request"
+            status_code: HTTP status code
+            headers: Additional response headers
+            on_close: Called when rendering ended or was aborted, e.g. to
+                close the session the lazy context values read from
+        """
+        self.template = templates.get_template(name)
+        self.context = context
+        super().__init__(self._render(on_close), status_code=status_code,
+                         headers=headers, media_type="text/html")
+
+    def _render(self, on_close: Optional[Callable[[], None]]) -> Iterator[bytes]:
+        try:
+            buffer, buffered, head_sent = [], 0, False
+            for piece in self.template.generate(self.context):
+                buffer.append(piece)
+                buffered += len(piece)
+                if not head_sent and "</head>" in piece:
+                    head_sent = True
+                    buffered = STREAM_CHUNK_SIZE
+                if buffered >= STREAM_CHUNK_SIZE:
+                    yield "".join(buffer).encode(self.charset)
+                    buffer, buffered = [], 0
+            if buffer:
+                yield "".join(buffer).encode(self.charset)
+        finally:
+            if on_close is not None:
+                on_close()
+
+
+def _bytecode_cache() -> Optional[BytecodeCache]:
+    """Return the filesystem bytecode cache, or None if disabled or not writable."""
+    if not config.TEMPLATE_BYTECODE_CACHE:
+        return None
+    try:
+        config.TEMPLATE_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    except OSError as e:
+        logger.warning(f"Template bytecode cache disabled: {e}")
+        return None
+    return FileSystemBytecodeCache(str(config.TEMPLATE_CACHE_DIR))
+
+
 def create_templates() -> Jinja2Templates:
     """
     Create a standardized Jinja2Templates instance with common filters.
 
+    Routers use the shared instance from get_templates() instead.
+
     Returns:
         Jinja2Templates: Configured templates instance
     """
     # Use config for template directory if available, otherwise fallback
     template_dir = getattr(config, 'TEMPLATES_DIR', 'app/templates')
-    templates = Jinja2Templates(directory=str(template_dir))
+    env = Environment(
+        loader=FileSystemLoader(str(template_dir)),
+        autoescape=True,
+        bytecode_cache=_bytecode_cache(),
+    )
+    templates = Jinja2Templates(env=env)
 
     # Add common filters
     templates.env.filters['from_json'] = from_json
     templates.env.filters['german_decimal'] = german_decimal
+    templates.env.filters['basename'] = basename
+    templates.env.globals['page_url'] = page_url
+
+    return templates
+
 
-    return templates
\ No newline at end of file
+def get_templates() -> Jinja2Templates:
+    """
+    Return the Jinja2Templates instance shared by all routers.
+
+    Returns:
+        Jinja2Templates: Shared templates instance, created on first use
+    """
+    global _templates
+    if _templates is None:
+        _templates = create_templates()
+    return _templates
+
+
+def precompile_templates(templates: Optional[Jinja2Templates] = None) -> int:
+    """
+    Compile all templates into the environment's cache.
+
+    Templates found in the bytecode cache are only loaded, the others are
+    compiled and written to it. A template that fails to compile is logged
+    and skipped, so one broken page does not stop the application.
+
+    Args:
+        templates: Templates instance (default: the shared one)
+
+    Returns:
+        int: Number of templates compiled
+    """
+    env = (templates or get_templates()).env
+    compiled = 0
+    for name in env.list_templates(extensions=["html"]):
+        try:
+            env.get_template(name)
+            compiled += 1
+        except TemplateError as e:
+            logger.error(f"Template {name} could not be compiled: {e}")
+    return compiled
\ No newline at end of file
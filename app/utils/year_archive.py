@@ -0,0 +1,489 @@
+"""
+Fiscal-year archive for the tax advisor: the invoice PDFs (rechnungen/), the
+receipts (receipts/) and a CSV journal of the bookings of one year in one ZIP.
+
+The invoices are the PDFs /rechnung/{id}/download serves: every invoice of the
+year is rendered from the current data and looked up in the PDF cache
+(rendered on a miss), and its archive copy in rechnungen/ is refreshed when
+it differs. Invoices whose PDF cannot be rendered and receipts missing on
+disk are listed in `FEHLENDE_DATEIEN.txt` in the archive.
+
+The ZIP is written here rather than with zipfile. The entries are stored
+uncompressed (PDFs and photos hardly compress) with the sizes taken from the
+file system, so the position of every byte is known before a file is read:
+
+- Downloads get a Content-Length and honour `Range` / `If-Range`, so an
+  interrupted download continues where it stopped. Files before the offset
+  are read for their checksums but not sent again.
+- Memory stays constant: files are streamed in chunks and the journal is
+  spooled to a temporary file.
+- A strong ETag over the entry list (names, sizes, modification times) and
+  the journal identifies the archive. It is also stored as ZIP comment, so
+  `save_archive` skips an unchanged archive on disk and resumes a partial
+  one.
+
+`MANIFEST.sha256`, the last entry, lists the SHA-256 of every file in the
+format of `sha256sum -c`.
+"""
+import csv
+import datetime
+import filecmp
+import hashlib
+import json
+import logging
+import os
+import re
+import shutil
+import struct
+import tempfile
+import zipfile
+import zlib
+from collections import defaultdict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from fastapi import Request, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
+from sqlalchemy.orm import Session, joinedload
+
+from app.models.arbeit_komponente import ArbeitKomponente
+from app.models.einnahme_ausgabe import EinnahmeAusgabe
+from app.models.eur_kategorie import EurKategorie
+from app.models.material_komponente import MaterialKomponente
+from app.models.receipt import Receipt
+from app.models.rechnung import Rechnung
+from app.models.unternehmensdaten import Unternehmensdaten
+from app.utils.data_version import is_not_modified, not_modified_response, set_etag
+from app.utils.date_utils import in_period
+from app.utils.pdf_cache import document_key, get_cache
+from app.utils.pdf_pool import PdfPool
+from app.utils.receipts import BUCHUNG, MATERIAL
+from app.utils.rechnung_batch import RECHNUNG_STYLESHEETS, BatchResult, render_invoices, render_rechnung_html
+from config import config
+
+
+logger = logging.getLogger(__name__)
+
+# Bump when the archive layout changes, so old partial downloads are not resumed
+ARCHIVE_FORMAT = "1"
+CHUNK_SIZE = 256 * 1024
+MANIFEST_NAME = "MANIFEST.sha256"
+MISSING_NAME = "FEHLENDE_DATEIEN.txt"
+
+# Offsets from here on need ZIP64 records
+_ZIP64_LIMIT = 0xFFFFFFFF
+_FLAGS = 0x0808  # sizes in data descriptor, UTF-8 names
+
+
+class ArchiveChanged(Exception):
+    """A file changed while the archive was being written."""
+
+
+@dataclass
+class ArchiveEntry:
+    """A file in the archive and, once streamed, its checksums."""
+    name: str
+    path: Optional[Path]
+    size: int
+    mtime: float
+    crc: int = 0
+    sha256: str = ""
+
+    @property
+    def header_size(self) -> int:
+        return 30 + len(self.name.encode())
+
+
+def _dos_time(timestamp: float) -> Tuple[int, int]:
+    """ZIP (MS-DOS) time and date of a timestamp."""
+    t = max(datetime.datetime.fromtimestamp(timestamp), datetime.datetime(1980, 1, 1))
+    return (t.hour << 11) | (t.minute << 5) | (t.second // 2), ((t.year - 1980) << 9) | (t.month << 5) | t.day
+
+
+class YearArchive:
+    """
+    The archive of one year, ready to be streamed.
+
+    Created by `build_archive`; `close()` removes the spooled files (journal
+    and list of missing files).
+    """
+
+    def __init__(self, year: int, entries: List[ArchiveEntry], spooled: List[Path], rows: int,
+                 missing: List[str]):
+        self.year = year
+        self.rows = rows
+        self.missing = missing
+        self.filename = f"Jahresarchiv_{year}.zip"
+        self._spooled = spooled
+        self._entries = entries
+        self._manifest = ArchiveEntry(
+            MANIFEST_NAME, None, sum(64 + 2 + len(e.name.encode()) + 1 for e in entries),
+            entries[-1].mtime)
+
+        fingerprint = hashlib.sha256(ARCHIVE_FORMAT.encode())
+        for entry in entries:
+            fingerprint.update(json.dumps([entry.name, entry.size, entry.mtime]).encode())
+        for path in spooled:
+            with open(path, "rb") as f:
+                for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+                    fingerprint.update(chunk)
+        self.etag = fingerprint.hexdigest()
+
+        self._offsets = []
+        offset = 0
+        for entry in self.entries:
+            self._offsets.append(offset)
+            offset += entry.header_size + entry.size + 16
+        self._central_offset = offset
+        self._central_size = sum(46 + len(e.name.encode()) + (12 if o >= _ZIP64_LIMIT else 0)
+                                 for e, o in zip(self.entries, self._offsets))
+        end = self._central_offset + self._central_size
+        self._zip64 = end >= _ZIP64_LIMIT or len(self.entries) >= 0xFFFF
+        self.size = end + (56 + 20 if self._zip64 else 0) + 22 + len(self.etag)
+
+    @property
+    def entries(self) -> List[ArchiveEntry]:
+        """All entries in archive order, the manifest last."""
+        return self._entries + [self._manifest]
+
+    def close(self) -> None:
+        for path in self._spooled:
+            path.unlink(missing_ok=True)
+
+    def _local_header(self, entry: ArchiveEntry) -> bytes:
+        time, date = _dos_time(entry.mtime)
+        name = entry.name.encode()
+        return struct.pack("<IHHHHHIIIHH", 0x04034B50, 20, _FLAGS, 0, time, date,
+                           0, 0, 0, len(name), 0) + name
+
+    def _read(self, entry: ArchiveEntry) -> Iterator[bytes]:
+        """Stream a file, computing its checksums; it must still have the listed size."""
+        crc, sha = 0, hashlib.sha256()
+        with open(entry.path, "rb") as f:
+            stat = os.fstat(f.fileno())
+            if stat.st_size != entry.size or stat.st_mtime != entry.mtime:
+                raise ArchiveChanged(f"{entry.name} wurde während des Exports geändert")
+            for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+                crc = zlib.crc32(chunk, crc)
+                sha.update(chunk)
+                yield chunk
+        entry.crc, entry.sha256 = crc, sha.hexdigest()
+
+    def _manifest_data(self) -> bytes:
+        data = "".join(f"{e.sha256}  {e.name}\n" for e in self._entries).encode()
+        self._manifest.crc = zlib.crc32(data)
+        self._manifest.sha256 = hashlib.sha256(data).hexdigest()
+        return data
+
+    def _central_directory(self) -> Iterator[bytes]:
+        for entry, offset in zip(self.entries, self._offsets):
+            time, date = _dos_time(entry.mtime)
+            name = entry.name.encode()
+            extra = struct.pack("<HHQ", 0x0001, 8, offset) if offset >= _ZIP64_LIMIT else b""
+            version = 45 if extra else 20
+            yield struct.pack("<IHHHHHHIIIHHHHHII", 0x02014B50, (3 << 8) | version, version, _FLAGS, 0,
+                              time, date, entry.crc, entry.size, entry.size, len(name), len(extra), 0,
+                              0, 0, 0o100644 << 16, 0xFFFFFFFF if extra else offset) + name + extra
+
+        count = len(self.entries)
+        central_size, central_offset = self._central_size, self._central_offset
+        if self._zip64:
+            end = self._central_offset + self._central_size
+            yield struct.pack("<IQHHIIQQQQ", 0x06064B50, 44, (3 << 8) | 45, 45, 0, 0,
+                              count, count, self._central_size, self._central_offset)
+            yield struct.pack("<IIQI", 0x07064B50, 0, end, 1)
+            count, central_size, central_offset = 0xFFFF, 0xFFFFFFFF, 0xFFFFFFFF
+        yield struct.pack("<IHHHHIIH", 0x06054B50, 0, 0, count, count, central_size, central_offset,
+                          len(self.etag)) + self.etag.encode()
+
+    def _chunks(self) -> Iterator[bytes]:
+        for entry in self.entries:
+            yield self._local_header(entry)
+            if entry is self._manifest:
+                yield self._manifest_data()
+            else:
+                yield from self._read(entry)
+            yield struct.pack("<IIII", 0x08074B50, entry.crc, entry.size, entry.size)
+        yield from self._central_directory()
+
+    def iter_bytes(self, start: int = 0, end: Optional[int] = None) -> Iterator[bytes]:
+        """
+        Stream the bytes start..end (inclusive) of the archive.
+
+        Files before start are read for the checksums in the central directory
+        and the manifest, but not yielded.
+
+        Raises:
+            ArchiveChanged: if a file was modified since `build_archive`
+        """
+        stop = self.size if end is None else end + 1
+        pos = 0
+        for chunk in self._chunks():
+            if pos + len(chunk) > start:
+                yield chunk[max(start - pos, 0):stop - pos]
+            pos += len(chunk)
+            if pos >= stop:
+                return
+
+
+def _safe_name(filename: str) -> bool:
+    return bool(filename) and filename not in (".", "..") and "/" not in filename and "\\" not in filename
+
+
+def _file_entry(folder: str, directory: Path, filename: str, missing: List[str]) -> Optional[ArchiveEntry]:
+    try:
+        stat = (directory / filename).stat()
+    except OSError:
+        missing.append(f"{folder}/{filename}")
+        return None
+    return ArchiveEntry(f"{folder}/{filename}", directory / filename, stat.st_size, stat.st_mtime)
+
+
+def _refresh_invoice_copy(cached: Path, filename: str) -> None:
+    """Make the archive copy in rechnungen/ equal to the cached PDF (left alone if it already is)."""
+    target = config.INVOICES_DIR / filename
+    if target.exists() and filecmp.cmp(cached, target, shallow=False):
+        return
+    config.INVOICES_DIR.mkdir(exist_ok=True)
+    shutil.copyfile(cached, target)
+
+
+def _invoice_entries(db: Session, year: int, pool: Optional[PdfPool],
+                     missing: List[str]) -> List[ArchiveEntry]:
+    """
+    The current PDFs of the year's invoices, as /rechnung/{id}/download serves them.
+
+    The entries point to the archive copies in rechnungen/ rather than into
+    the PDF cache: the cache may evict a file while the archive is streamed,
+    and a copy keeps its modification time (part of the ETag) as long as its
+    content does not change. Invoices whose PDF fails to render are added to
+    `missing`.
+    """
+    rechnungen = (db.query(Rechnung)
+                  .options(joinedload(Rechnung.kunde), joinedload(Rechnung.auftrag))
+                  .filter(in_period(Rechnung.rechnungsdatum, year))
+                  .order_by(Rechnung.id).all())
+    if not rechnungen:
+        return []
+    auftrag_ids = {rechnung.auftrag_id for rechnung in rechnungen}
+    komponenten: Dict[int, List[ArbeitKomponente]] = defaultdict(list)
+    for k in db.query(ArbeitKomponente).filter(ArbeitKomponente.auftrag_id.in_(auftrag_ids)).order_by(ArbeitKomponente.id):
+        komponenten[k.auftrag_id].append(k)
+    materialien: Dict[int, List[MaterialKomponente]] = defaultdict(list)
+    for m in db.query(MaterialKomponente).filter(MaterialKomponente.auftrag_id.in_(auftrag_ids)).order_by(MaterialKomponente.id):
+        materialien[m.auftrag_id].append(m)
+    unternehmensdaten = db.query(Unternehmensdaten).first()
+
+    cache = get_cache()
+    filenames = []
+    result, documents = BatchResult(), []
+    for rechnung in rechnungen:
+        rendered_html, filename = render_rechnung_html(
+            db, rechnung, komponenten[rechnung.auftrag_id], materialien[rechnung.auftrag_id], unternehmensdaten)
+        filenames.append(filename)
+        cached = cache.get(document_key(rendered_html, RECHNUNG_STYLESHEETS))
+        if cached is not None:
+            _refresh_invoice_copy(cached, filename)
+        else:
+            entry = {"rechnung_id": rechnung.id, "datei": filename}
+            result.created.append(entry)
+            documents.append((entry, rendered_html))
+    # Cache misses are rendered like a batch, which also writes the archive copies
+    render_invoices(pool, documents, result)
+
+    failed = {entry["datei"]: entry["fehler"] for entry in result.failed}
+    entries = []
+    for filename in filenames:
+        if filename in failed:
+            logger.warning(f"Jahresarchiv {year}: {filename} fehlt, {failed[filename]}")
+            missing.append(f"rechnungen/{filename}")
+            continue
+        entry = _file_entry("rechnungen", config.INVOICES_DIR, filename, missing)
+        if entry:
+            entries.append(entry)
+    return entries
+
+
+def build_archive(db: Session, year: int, pool: Optional[PdfPool] = None) -> YearArchive:
+    """
+    Collect the archive of a year.
+
+    Contains the current PDFs of the year's invoices, the receipts of its
+    bookings and of the materials of its invoices, and `buchungen_<year>.csv`
+    with every booking of the year. Invoices that could not be rendered and
+    receipts that do not exist are listed in `YearArchive.missing` and in
+    `FEHLENDE_DATEIEN.txt`.
+
+    Args:
+        db: Database session
+        year: Fiscal year
+        pool: PDF pool for invoices not in the PDF cache; without pool they
+            are rendered in this process
+    """
+    missing: List[str] = []
+    receipts = set()
+
+    # Receipt names per booking of the year, for the journal's "Belege" column
+    belege_by_buchung: Dict[int, List[str]] = defaultdict(list)
+    for buchung_id, filename in db.execute(
+            select(Receipt.owner_id, Receipt.filename)
+            .join(EinnahmeAusgabe, EinnahmeAusgabe.id == Receipt.owner_id)
+            .where(Receipt.owner_type == BUCHUNG)
+            .where(in_period(EinnahmeAusgabe.datum, year))
+            .order_by(Receipt.id)):
+        belege_by_buchung[buchung_id].append(filename)
+
+    fd, journal_name = tempfile.mkstemp(prefix=f"buchungen_{year}_", suffix=".csv")
+    journal = Path(journal_name)
+    spooled = [journal]
+    rows = 0
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8-sig", newline="") as f:
+            writer = csv.writer(f, delimiter=";")
+            writer.writerow(["Datum", "Typ", "Betrag", "Kategorie", "Beschreibung", "Rechnung", "Belege"])
+            buchungen = db.execute(
+                select(EinnahmeAusgabe.id, EinnahmeAusgabe.datum, EinnahmeAusgabe.typ, EinnahmeAusgabe.betrag,
+                       EurKategorie.name, EinnahmeAusgabe.beschreibung, EinnahmeAusgabe.rechnung_id)
+                .outerjoin(EurKategorie, EurKategorie.id == EinnahmeAusgabe.kategorie_id)
+                .where(in_period(EinnahmeAusgabe.datum, year))
+                .order_by(EinnahmeAusgabe.datum, EinnahmeAusgabe.id)
+                .execution_options(yield_per=1000))
+            for buchung_id, datum, typ, betrag, kategorie, beschreibung, rechnung_id in buchungen:
+                belege = belege_by_buchung.get(buchung_id, [])
+                receipts.update(belege)
+                writer.writerow([datum.strftime("%d.%m.%Y"), typ, f"{betrag:.2f}".replace(".", ","),
+                                 kategorie or "", beschreibung or "", rechnung_id or "", ", ".join(belege)])
+                rows += 1
+
+        receipts.update(db.scalars(
+            select(Receipt.filename)
+            .join(MaterialKomponente, MaterialKomponente.id == Receipt.owner_id)
+            .join(Rechnung, Rechnung.auftrag_id == MaterialKomponente.auftrag_id)
+            .where(Receipt.owner_type == MATERIAL)
+            .where(in_period(Rechnung.rechnungsdatum, year))))
+
+        entries = _invoice_entries(db, year, pool, missing)
+        for filename in sorted(receipts):
+            if not _safe_name(filename):
+                logger.warning(f"Beleg mit ungültigem Dateinamen übersprungen: {filename!r}")
+                continue
+            entry = _file_entry("receipts", config.RECEIPTS_DIR, filename, missing)
+            if entry:
+                entries.append(entry)
+
+        if missing:
+            fd, missing_name = tempfile.mkstemp(prefix=f"fehlend_{year}_", suffix=".txt")
+            spooled.append(Path(missing_name))
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                f.writelines(f"{name}\n" for name in missing)
+
+        # Fixed time stamp: the ETag must not change with every new spool file
+        end_of_year = datetime.datetime(year, 12, 31, 23, 59, 58).timestamp()
+        for path, name in zip(spooled, [f"buchungen_{year}.csv", MISSING_NAME]):
+            os.utime(path, (end_of_year, end_of_year))
+            entries.append(ArchiveEntry(name, path, path.stat().st_size, path.stat().st_mtime))
+        if any(e.size >= 0xFFFFFFFF for e in entries):
+            raise ValueError("Dateien ab 4 GiB werden im Jahresarchiv nicht unterstützt")
+        return YearArchive(year, entries, spooled, rows, missing)
+    except BaseException:
+        for path in spooled:
+            path.unlink(missing_ok=True)
+        raise
+
+
+def _byte_range(request: Request, etag: str, size: int) -> Optional[Tuple[int, int]]:
+    """The single byte range requested, if any and still valid for this archive."""
+    header = request.headers.get("range", "")
+    match = re.fullmatch(r"bytes=(\d*)-(\d*)", header.strip())
+    if not match or not any(match.groups()):
+        return None
+    if_range = request.headers.get("if-range")
+    if if_range is not None and if_range != etag:
+        return None
+    first, last = match.groups()
+    if not first:
+        return max(size - int(last), 0), size - 1
+    if last and int(last) < int(first):
+        return None
+    return int(first), min(int(last), size - 1) if last else size - 1
+
+
+def archive_response(request: Request, archive: YearArchive) -> Response:
+    """
+    Stream the archive as download with strong ETag and byte-range support.
+
+    Takes over the archive: it is closed once the response is sent.
+    """
+    etag = f'"{archive.etag}"'
+    if is_not_modified(request, etag):
+        archive.close()
+        return not_modified_response(etag)
+
+    headers = {"Accept-Ranges": "bytes",
+               "Content-Disposition": f'attachment; filename="{archive.filename}"'}
+    if archive.missing:
+        # The names are listed in FEHLENDE_DATEIEN.txt inside the archive
+        headers["X-Missing-Files"] = str(len(archive.missing))
+    byte_range = _byte_range(request, etag, archive.size)
+    if byte_range is not None and byte_range[0] >= archive.size:
+        archive.close()
+        return Response(status_code=416, headers={"Content-Range": f"bytes */{archive.size}"})
+    start, end = byte_range or (0, archive.size - 1)
+    headers["Content-Length"] = str(end - start + 1)
+    if byte_range is not None:
+        headers["Content-Range"] = f"bytes {start}-{end}/{archive.size}"
+
+    def body():
+        try:
+            yield from archive.iter_bytes(start, end)
+        finally:
+            archive.close()
+
+    response = StreamingResponse(body(), status_code=206 if byte_range else 200,
+                                 media_type="application/zip", headers=headers)
+    return set_etag(response, etag)
+
+
+def stored_etag(path: Path) -> Optional[str]:
+    """ETag of a complete archive on disk (its ZIP comment), None if it is no archive."""
+    try:
+        with zipfile.ZipFile(path) as zf:
+            return zf.comment.decode()
+    except (OSError, zipfile.BadZipFile, UnicodeDecodeError):
+        return None
+
+
+def save_archive(archive: YearArchive, target: Path) -> int:
+    """
+    Write the archive to target, skipping or resuming earlier runs.
+
+    An unchanged archive at target is left alone. An interrupted run leaves
+    `<target>.part` with the ETag in `<target>.part.etag`; while the ETag
+    still matches, writing continues at the end of the partial file.
+
+    Returns:
+        int: The number of bytes written (0 if target was up to date)
+    """
+    if target.exists() and stored_etag(target) == archive.etag:
+        return 0
+    part = target.with_name(target.name + ".part")
+    state = target.with_name(target.name + ".part.etag")
+    start = 0
+    if part.exists() and state.exists() and state.read_text() == archive.etag:
+        start = min(part.stat().st_size, archive.size)
+    else:
+        target.parent.mkdir(parents=True, exist_ok=True)
+        state.write_text(archive.etag)
+
+    written = 0
+    with open(part, "r+b" if start else "wb") as f:
+        f.seek(start)
+        f.truncate()
+        for chunk in archive.iter_bytes(start):
+            f.write(chunk)
+            written += len(chunk)
+    os.replace(part, target)
+    state.unlink()
+    return written
@@ -16,6 +16,20 @@ class Config:
     # Database Configuration
     DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./data/erp.db" if os.getenv("ENVIRONMENT") == "production" else "sqlite:///./erp.db")
 
+    # SQLite Tuning ("production": WAL + pragmas below, "default": SQLite defaults)
+    SQLITE_PROFILE = os.getenv("SQLITE_PROFILE", "production" if os.getenv("ENVIRONMENT") == "production" else "default")
+    SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+    SQLITE_CACHE_SIZE_KB = int(os.getenv("SQLITE_CACHE_SIZE_KB", "16384"))
+    SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+
+    # Connection Pool (sync endpoints run in a threadpool of 40 threads). Each
+    # worker opens three pools (writer, reader, async reader); on PostgreSQL keep
+    # workers x 3 x (size + overflow) below the server's max_connections.
+    DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5" if DATABASE_URL.startswith("postgresql") else "10"))
+    DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "5" if DATABASE_URL.startswith("postgresql") else "30"))
+    DB_POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", "30"))
+    DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+
     # Application Settings
     DEBUG = os.getenv("DEBUG", "False").lower() == "true"
     SECRET_KEY = os.getenv("SECRET_KEY", "change-me-in-production")
@@ -32,7 +46,55 @@ class Config:
     INVOICES_DIR = BASE_DIR / os.getenv("INVOICES_DIR", "rechnungen")
     STATIC_DIR = BASE_DIR / "app" / "static"
     TEMPLATES_DIR = BASE_DIR / "app" / "templates"
+
+    # Templates: compiled bytecode cache and precompilation at startup
+    TEMPLATE_BYTECODE_CACHE = os.getenv("TEMPLATE_BYTECODE_CACHE", "True").lower() == "true"
+    TEMPLATE_CACHE_DIR = BASE_DIR / os.getenv("TEMPLATE_CACHE_DIR", "data/template_cache")
+    TEMPLATE_PRECOMPILE = os.getenv("TEMPLATE_PRECOMPILE", "True").lower() == "true"
     
+    # Report Cache (number of cached dashboard/EÜR pages per worker, 0 disables)
+    REPORT_CACHE_SIZE = int(os.getenv("REPORT_CACHE_SIZE", "64"))
+
+    # Data version file, replaced on every committed write (ETags, report cache)
+    DATA_VERSION_FILE = BASE_DIR / os.getenv("DATA_VERSION_FILE", "data/data_version")
+
+    # Pagination of the list pages and their JSON API
+    PAGE_SIZE = int(os.getenv("PAGE_SIZE", "50"))
+    MAX_PAGE_SIZE = int(os.getenv("MAX_PAGE_SIZE", "500"))
+
+    # SQL Instrumentation (per-request statement count/time, N+1 warnings)
+    SQL_INSTRUMENTATION = os.getenv("SQL_INSTRUMENTATION", "False").lower() == "true"
+    SQL_N_PLUS_ONE_THRESHOLD = int(os.getenv("SQL_N_PLUS_ONE_THRESHOLD", "10"))
+
+    # Slow-Query Log (statements slower than this many ms, 0 disables)
+    SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "0"))
+    SLOW_QUERY_LOG_FILE = BASE_DIR / os.getenv("SLOW_QUERY_LOG_FILE", "logs/slow_queries.log")
+
+    # PDF rendering pool (worker processes, 0 renders in the application process)
+    PDF_WORKERS = int(os.getenv("PDF_WORKERS", "2"))
+    PDF_QUEUE_SIZE = int(os.getenv("PDF_QUEUE_SIZE", "16"))
+    PDF_TIMEOUT = float(os.getenv("PDF_TIMEOUT", "60"))
+    PDF_MAX_JOBS_PER_WORKER = int(os.getenv("PDF_MAX_JOBS_PER_WORKER", "200"))
+
+    # WeasyPrint output options (0 keeps the original JPEG quality / image resolution)
+    PDF_OPTIMIZE_IMAGES = os.getenv("PDF_OPTIMIZE_IMAGES", "True").lower() == "true"
+    PDF_JPEG_QUALITY = int(os.getenv("PDF_JPEG_QUALITY", "0"))
+    PDF_IMAGE_DPI = int(os.getenv("PDF_IMAGE_DPI", "0"))
+    PDF_SUBSET_FONTS = os.getenv("PDF_SUBSET_FONTS", "True").lower() == "true"
+
+    # Content-addressed cache of rendered PDFs (least recently used files are evicted)
+    PDF_CACHE_DIR = BASE_DIR / os.getenv("PDF_CACHE_DIR", "data/pdf_cache")
+    PDF_CACHE_MAX_MB = float(os.getenv("PDF_CACHE_MAX_MB", "200"))
+
+    # Background jobs in a local SQLite queue (0 workers runs jobs when they are submitted)
+    JOB_QUEUE_DB = BASE_DIR / os.getenv("JOB_QUEUE_DB", "data/jobs.db")
+    JOB_WORKERS = int(os.getenv("JOB_WORKERS", "1"))
+    JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+    JOB_RETRY_BACKOFF = float(os.getenv("JOB_RETRY_BACKOFF", "5"))
+    JOB_POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", "1"))
+    JOB_LEASE = float(os.getenv("JOB_LEASE", "600"))
+    JOB_DRAIN_TIMEOUT = float(os.getenv("JOB_DRAIN_TIMEOUT", "30"))
+
     # Development Settings
     RELOAD = os.getenv("RELOAD", "False").lower() == "true"
     
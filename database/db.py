@@ -1,15 +1,172 @@
 """Database foundation functions and SQLAlchemy setup.
 
-Provides engine, SessionLocal, Base and FastAPI dependency `get_db`.
+Provides engine, SessionLocal, Base and the FastAPI dependencies `get_db`
+(writer), `get_read_db` (read-only snapshot for GET handlers),
+`get_read_sessionmaker` (read-only sessions owned by streamed responses) and
+`get_async_db` (read-only snapshot for async GET handlers).
 """
 
-from typing import Iterator
-from sqlalchemy import create_engine
+from typing import AsyncIterator, Iterator, List
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine, URL, make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker, Session, declarative_base
 from config import config
 
-engine = create_engine(config.DATABASE_URL, connect_args={"check_same_thread": False})
+
+# Async-Treiber je Backend für create_async_db_engine
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+}
+
+
+def sqlite_pragmas(profile: str, read_only: bool = False) -> List[str]:
+    """PRAGMA-Anweisungen, die jede neue SQLite-Verbindung ausführt.
+
+    Das Profil "production" aktiviert WAL, damit lange Berichte Schreibzugriffe
+    nicht blockieren, und verzichtet mit synchronous=NORMAL auf ein fsync pro
+    Commit (in WAL weiterhin absturzsicher). "default" lässt SQLite unverändert.
+
+    Args:
+        profile: "production" oder "default"
+        read_only: Verbindung mit query_only gegen Schreibzugriffe sperren
+
+    Returns:
+        List[str]: auszuführende PRAGMA-Anweisungen
+    """
+    pragmas = []
+    if profile == "production":
+        pragmas += [
+            "PRAGMA journal_mode=WAL",
+            "PRAGMA synchronous=NORMAL",
+            f"PRAGMA busy_timeout={config.SQLITE_BUSY_TIMEOUT_MS}",
+            f"PRAGMA cache_size=-{config.SQLITE_CACHE_SIZE_KB}",
+            f"PRAGMA mmap_size={config.SQLITE_MMAP_SIZE}",
+            "PRAGMA temp_store=MEMORY",
+        ]
+    if read_only:
+        pragmas.append("PRAGMA query_only=ON")
+    return pragmas
+
+
+def create_db_engine(url: str = config.DATABASE_URL,
+                     profile: str = config.SQLITE_PROFILE,
+                     read_only: bool = False) -> Engine:
+    """Erzeugt die Engine samt Pool-Größe und SQLite-Profil.
+
+    Eine Lese-Engine (read_only) öffnet in WAL jede Transaktion explizit mit
+    BEGIN, sodass alle Abfragen eines Requests denselben Snapshot sehen, ohne
+    Schreiber zu blockieren. Ohne WAL hielte dieses BEGIN eine SHARED-Sperre
+    bis zum Ende des Requests (bei gestreamten Seiten samt Body); dort läuft
+    jede Abfrage daher für sich, ohne gemeinsamen Snapshot.
+
+    Args:
+        url: Datenbank-URL
+        profile: SQLite-Profil, siehe `sqlite_pragmas`
+        read_only: Engine für schreibgeschützte Sessions erzeugen
+
+    Returns:
+        Engine: konfigurierte SQLAlchemy-Engine
+    """
+    database_url = make_url(url)
+    new_engine = create_engine(database_url, **_engine_kwargs(database_url, read_only))
+    if database_url.get_backend_name() == "sqlite":
+        _configure_sqlite(new_engine, profile, read_only)
+    return new_engine
+
+
+def create_async_db_engine(url: str = config.DATABASE_URL,
+                           profile: str = config.SQLITE_PROFILE,
+                           read_only: bool = True) -> AsyncEngine:
+    """Erzeugt die Async-Engine (aiosqlite bzw. asyncpg) zur gleichen Datenbank.
+
+    Pool-Größe, SQLite-Profil und Snapshot-Verhalten entsprechen
+    `create_db_engine`.
+
+    Args:
+        url: Datenbank-URL mit synchronem Treiber, z.B. aus config.DATABASE_URL
+        profile: SQLite-Profil, siehe `sqlite_pragmas`
+        read_only: Engine für schreibgeschützte Sessions erzeugen
+
+    Returns:
+        AsyncEngine: konfigurierte Async-Engine
+    """
+    database_url = make_url(url)
+    backend = database_url.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f"Kein Async-Treiber für Datenbank-Backend '{backend}'")
+    async_url = database_url.set(drivername=ASYNC_DRIVERS[backend])
+    new_engine = create_async_engine(async_url, **_engine_kwargs(async_url, read_only))
+    if backend == "sqlite":
+        _configure_sqlite(new_engine.sync_engine, profile, read_only)
+    return new_engine
+
+
+def _engine_kwargs(database_url: URL, read_only: bool) -> dict:
+    """Pool- und Verbindungsparameter für create_engine je Backend."""
+    pool_kwargs = {
+        "pool_size": config.DB_POOL_SIZE,
+        "max_overflow": config.DB_MAX_OVERFLOW,
+        "pool_timeout": config.DB_POOL_TIMEOUT,
+    }
+    backend = database_url.get_backend_name()
+
+    if backend == "postgresql":
+        # Verbindungen vor Nutzung prüfen und regelmäßig erneuern, damit
+        # Server-Neustarts und Idle-Timeouts keine toten Verbindungen hinterlassen
+        kwargs = dict(pool_kwargs, pool_pre_ping=True, pool_recycle=config.DB_POOL_RECYCLE)
+        if read_only:
+            # Ein Snapshot je Transaktion, Schreibzugriffe lehnt der Server ab
+            kwargs["isolation_level"] = "REPEATABLE READ"
+            if database_url.get_driver_name() == "asyncpg":
+                kwargs["connect_args"] = {
+                    "server_settings": {"default_transaction_read_only": "on"}}
+            else:
+                kwargs["connect_args"] = {
+                    "options": "-c default_transaction_read_only=on"}
+        return kwargs
+
+    if backend != "sqlite":
+        return pool_kwargs
+
+    kwargs = {"connect_args": {"check_same_thread": False}}
+    if database_url.database not in (None, "", ":memory:"):
+        # Dateibasierte SQLite-DBs nutzen einen QueuePool; Pool + Overflow
+        # decken den Threadpool ab, in dem FastAPI synchrone Endpoints ausführt
+        kwargs.update(pool_kwargs)
+    return kwargs
+
+
+def _configure_sqlite(new_engine: Engine, profile: str, read_only: bool) -> None:
+    """Registriert PRAGMAs und (nur in WAL) Snapshot-BEGIN für eine SQLite-Engine."""
+    pragmas = sqlite_pragmas(profile, read_only)
+    # Ohne WAL würde die Lese-Transaktion Schreiber bis zum Request-Ende sperren
+    snapshot = read_only and "PRAGMA journal_mode=WAL" in pragmas
+    if pragmas:
+        @event.listens_for(new_engine, "connect")
+        def _set_sqlite_pragmas(dbapi_connection, connection_record):
+            cursor = dbapi_connection.cursor()
+            for pragma in pragmas:
+                cursor.execute(pragma)
+            cursor.close()
+            if snapshot:
+                # pysqlite startet Transaktionen erst vor Schreibzugriffen;
+                # das BEGIN übernimmt der "begin"-Listener unten
+                dbapi_connection.isolation_level = None
+
+    if snapshot:
+        @event.listens_for(new_engine, "begin")
+        def _begin_snapshot(connection):
+            connection.exec_driver_sql("BEGIN")
+
+
+engine = create_db_engine()
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+read_engine = create_db_engine(read_only=True)
+ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=read_engine)
+async_engine = create_async_db_engine()
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
 Base = declarative_base()
 
 
@@ -23,4 +180,43 @@ def get_db() -> Iterator[Session]:
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+def get_read_db() -> Iterator[Session]:
+    """Liefert eine schreibgeschützte DB-Session für GET-Handler.
+
+    Alle Abfragen laufen in einer Lese-Transaktion auf demselben Snapshot und
+    halten nie die Schreibsperre. Schreibversuche schlagen mit einem Fehler fehl.
+
+    Yields:
+        Session: schreibgeschützte Session, wird nach Nutzung geschlossen.
+    """
+    db: Session = ReadSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+def get_read_sessionmaker() -> sessionmaker:
+    """Liefert die Factory für schreibgeschützte Sessions.
+
+    Für Antworten, die nach dem Handler weiter aus der Datenbank lesen
+    (gestreamte Seiten): FastAPI schließt Dependency-Sessions, bevor der Body
+    gesendet wird, daher öffnet und schließt der Handler die Session selbst.
+
+    Returns:
+        sessionmaker: Factory für Sessions wie in `get_read_db`.
+    """
+    return ReadSessionLocal
+
+async def get_async_db() -> AsyncIterator[AsyncSession]:
+    """Liefert eine schreibgeschützte Async-Session für async GET-Handler.
+
+    Wie `get_read_db`, aber die Abfragen belegen keinen Thread aus dem
+    Threadpool, während sie auf die Datenbank warten.
+
+    Yields:
+        AsyncSession: schreibgeschützte Session, wird nach Nutzung geschlossen.
+    """
+    async with AsyncSessionLocal() as db:
+        yield db
\ No newline at end of file
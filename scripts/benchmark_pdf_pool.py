@@ -0,0 +1,99 @@
+"""
+Benchmark: invoice PDF throughput of the rendering pool.
+
+Renders the same invoice (app/templates/rechnung_template.html with sample
+data) --count times with 1, 2 and 4 worker processes and prints invoices per
+second, next to rendering in this process for comparison. Worker start-up
+(WeasyPrint import, fonts) is not measured.
+
+    python scripts/benchmark_pdf_pool.py --count 40 --workers 1 2 4
+"""
+import argparse
+import sys
+import time
+from concurrent.futures import wait
+from datetime import date, timedelta
+from pathlib import Path
+from types import SimpleNamespace
+
+# Add project root to Python path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from app.utils.pdf_assets import logo_base64
+from app.utils.pdf_pool import PdfPool, render_html_to_pdf, warm_up
+from app.utils.template_utils import get_templates
+from config import config
+
+STYLESHEETS = ("rechnung.css",)
+
+
+def invoice_html() -> str:
+    """Render a typical invoice: five work items, eight materials."""
+    start = date(2025, 3, 3)
+    komponenten = [
+        SimpleNamespace(arbeit=f"Arbeitsschritt {i}", beschreibung="Fliesen verlegen inkl. Fugen",
+                        berechnungsbasis="stunden" if i % 2 else "quadratmeter",
+                        anzahl_stunden=8 + i, stundenlohn=55, anzahl_quadrat=12.5 + i,
+                        preis_pro_quadrat=38, komponente_start=start + timedelta(days=i),
+                        komponente_ende=start + timedelta(days=i + 1))
+        for i in range(5)
+    ]
+    materialien = [
+        SimpleNamespace(bezeichnung=f"Material {i}", anzahl=3 + i, berechnungseinheit="Stück",
+                        preis_pro_einheit=12.9 + i)
+        for i in range(8)
+    ]
+    return get_templates().get_template("rechnung_template.html").render({
+        "kunde": SimpleNamespace(kundenart="Privatkunde", kunde_vorname="Erika", kunde_nachname="Mustermann",
+                                 kunde_firmenname=None, kunde_rechnungsadresse="Hauptstraße 1",
+                                 kunde_rechnung_plz="10115", kunde_rechnung_ort="Berlin"),
+        "auftrag": SimpleNamespace(beschreibung="Badsanierung"),
+        "komponenten": komponenten,
+        "materialien": materialien,
+        "rechnung": SimpleNamespace(id=1, rechnungsdatum=start, faelligkeit=start + timedelta(days=30),
+                                    rechnungssumme_arbeit=4200, rechnungssumme_material=980,
+                                    rechnungssumme_gesamt=5180),
+        "unternehmensdaten": SimpleNamespace(
+            unternehmen_name="Musterbau GmbH", unternehmen_adresse="Werkstraße 5", unternehmen_plz="10117",
+            unternehmen_ort="Berlin", unternehmen_steuernummer="12/345/67890", unternehmen_telefon="030 123456",
+            zahlungsinfo_name="Musterbau GmbH", zahlungsinfo_bank_name="Musterbank",
+            zahlungsinfo_iban="DE00 1234 5678 9012 3456 78", zahlungsinfo_paypal=None,
+            rechtliche_informationen="Zahlbar ohne Abzug innerhalb von 14 Tagen."),
+        "logo_base64": logo_base64(),
+    })
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--count", type=int, default=40)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    args = parser.parse_args()
+
+    html = invoice_html()
+
+    warm_up()
+    started = time.perf_counter()
+    for _ in range(args.count):
+        render_html_to_pdf(html, None, STYLESHEETS)
+    elapsed = time.perf_counter() - started
+    print(f"in process   {args.count / elapsed:6.2f} invoices/s")
+
+    for workers in args.workers:
+        pool = PdfPool(workers, queue_size=args.count, timeout=config.PDF_TIMEOUT,
+                       max_jobs=args.count + 1)
+        try:
+            # One job per worker first, so all processes are up and warm
+            wait([pool.submit(html, None, STYLESHEETS) for _ in range(workers)])
+            started = time.perf_counter()
+            futures = [pool.submit(html, None, STYLESHEETS) for _ in range(args.count)]
+            for future in futures:
+                future.result()
+            elapsed = time.perf_counter() - started
+        finally:
+            pool.close()
+        print(f"{workers} worker(s)  {args.count / elapsed:6.2f} invoices/s")
+
+
+if __name__ == "__main__":
+    main()
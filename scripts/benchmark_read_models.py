@@ -0,0 +1,103 @@
+"""
+Benchmark: ORM entities vs. read models for list pages.
+
+Loads the same bookings with category names (and invoices with customer
+names) once as ORM entities and once as the slotted read models from app/utils/read_models.py
+and prints load time and peak memory for both.
+
+    python scripts/benchmark_read_models.py --rows 100000
+"""
+import argparse
+import gc
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import date, timedelta
+from pathlib import Path
+
+# Add project root to Python path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import joinedload, sessionmaker
+
+from database.db import Base
+import app.models  # noqa: F401
+from app.models.einnahme_ausgabe import EinnahmeAusgabe
+from app.models.eur_kategorie import EurKategorie
+from app.models.kunde import Kunde
+from app.models.rechnung import Rechnung
+from app.utils.read_models import buchung_row, buchungen_select, rechnung_row, rechnungen_select
+
+
+def _seed(engine, rows):
+    Base.metadata.create_all(engine)
+    start = date(2015, 1, 1)
+    rechnungen = max(rows // 10, 1)
+    with engine.begin() as conn:
+        kategorie_id = conn.execute(
+            EurKategorie.__table__.insert().values(name="Erlöse", typ="einnahme")
+        ).inserted_primary_key[0]
+        conn.execute(Kunde.__table__.insert(), [
+            {"kundenart": "Privatkunde", "kunde_vorname": f"Vorname {i}",
+             "kunde_nachname": f"Nachname {i}", "kunde_seit": start}
+            for i in range(1, 1001)
+        ])
+        conn.execute(Rechnung.__table__.insert(), [
+            {"kunde_id": i % 1000 + 1, "auftrag_id": i, "unternehmensdaten_id": 1,
+             "rechnungsdatum": start + timedelta(days=i % 3650),
+             "rechnungssumme_gesamt": 500, "bezahlt": bool(i % 2)}
+            for i in range(1, rechnungen + 1)
+        ])
+        conn.execute(EinnahmeAusgabe.__table__.insert(), [
+            {"datum": start + timedelta(days=i % 3650), "typ": "einnahme" if i % 3 else "ausgabe",
+             "betrag": round(random.uniform(5, 500), 2), "kategorie_id": kategorie_id,
+             "beschreibung": f"Buchung {i}", "rechnung_id": i % rechnungen + 1 if i % 2 else None}
+            for i in range(rows)
+        ])
+
+
+def _measure(label, Session, load):
+    """Time one load, then repeat it under tracemalloc for the peak memory."""
+    with Session() as db:
+        gc.collect()
+        began = time.perf_counter()
+        rows = len(load(db))
+        elapsed = time.perf_counter() - began
+    with Session() as db:
+        gc.collect()
+        tracemalloc.start()
+        load(db)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    print(f"{label:<26} {rows:>8} rows   {elapsed * 1000:8.1f} ms   "
+          f"peak {peak / 1024 / 1024:7.1f} MiB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=100000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{tmp}/bench.db")
+        _seed(engine, args.rows)
+        Session = sessionmaker(bind=engine)
+
+        print(f"{args.rows} Buchungen, {max(args.rows // 10, 1)} Rechnungen")
+        _measure("Buchungen ORM", Session, lambda db: db.query(EinnahmeAusgabe).options(
+            joinedload(EinnahmeAusgabe.kategorie)).all())
+        _measure("Buchungen read model", Session, lambda db: [
+            buchung_row(row) for row in db.execute(buchungen_select(with_kategorie=True))])
+        _measure("Rechnungen ORM", Session, lambda db: db.query(Rechnung).options(
+            joinedload(Rechnung.kunde)).all())
+        _measure("Rechnungen read model", Session, lambda db: [
+            rechnung_row(row) for row in db.execute(rechnungen_select())])
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
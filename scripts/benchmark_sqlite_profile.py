@@ -0,0 +1,135 @@
+"""
+Benchmark: concurrent report reads and booking writes per SQLite profile.
+
+Runs the same workload against a temporary database once with the
+"default" profile (rollback journal) and once with "production" (WAL and
+tuned pragmas, see database/db.py) and prints throughput, write latency and
+"database is locked" errors for both.
+
+    python scripts/benchmark_sqlite_profile.py --rows 200000 --seconds 10
+"""
+import argparse
+import random
+import sys
+import tempfile
+import threading
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+# Add project root to Python path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from sqlalchemy import extract, func, select
+from sqlalchemy.exc import OperationalError
+
+from database.db import Base, create_db_engine
+import app.models  # noqa: F401
+from app.models.einnahme_ausgabe import EinnahmeAusgabe
+from app.models.eur_kategorie import EurKategorie
+
+
+BUCHUNGEN = EinnahmeAusgabe.__table__
+
+
+def _seed(engine, rows):
+    Base.metadata.create_all(engine)
+    start = date(2020, 1, 1)
+    with engine.begin() as conn:
+        kategorie_id = conn.execute(
+            EurKategorie.__table__.insert().values(name="Erlöse", typ="einnahme")
+        ).inserted_primary_key[0]
+        batch = []
+        for i in range(rows):
+            batch.append({
+                "datum": start + timedelta(days=i % 1800),
+                "typ": "einnahme" if i % 3 else "ausgabe",
+                "betrag": round(random.uniform(5, 500), 2),
+                "kategorie_id": kategorie_id,
+                "beschreibung": f"Buchung {i}",
+            })
+            if len(batch) == 10000:
+                conn.execute(BUCHUNGEN.insert(), batch)
+                batch = []
+        if batch:
+            conn.execute(BUCHUNGEN.insert(), batch)
+    return kategorie_id
+
+
+def _report(conn):
+    """Full-table EÜR aggregation, the slowest read the app performs."""
+    jahr = extract("year", BUCHUNGEN.c.datum)
+    monat = extract("month", BUCHUNGEN.c.datum)
+    return conn.execute(
+        select(jahr, monat, BUCHUNGEN.c.typ, func.sum(BUCHUNGEN.c.betrag))
+        .group_by(jahr, monat, BUCHUNGEN.c.typ)
+    ).all()
+
+
+def run(profile, rows, seconds, readers, writers):
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_db_engine(f"sqlite:///{tmp}/bench.db", profile)
+        kategorie_id = _seed(engine, rows)
+
+        stop = time.perf_counter() + seconds
+        stats = {"reads": 0, "writes": 0, "errors": 0, "latencies": []}
+        lock = threading.Lock()
+
+        def reader():
+            while time.perf_counter() < stop:
+                try:
+                    with engine.connect() as conn:
+                        _report(conn)
+                    with lock:
+                        stats["reads"] += 1
+                except OperationalError:
+                    with lock:
+                        stats["errors"] += 1
+
+        def writer():
+            while time.perf_counter() < stop:
+                began = time.perf_counter()
+                try:
+                    with engine.begin() as conn:
+                        conn.execute(BUCHUNGEN.insert().values(
+                            datum=date.today(), typ="ausgabe", betrag=9.99,
+                            kategorie_id=kategorie_id, beschreibung="Benchmark"))
+                    with lock:
+                        stats["writes"] += 1
+                        stats["latencies"].append(time.perf_counter() - began)
+                except OperationalError:
+                    with lock:
+                        stats["errors"] += 1
+
+        threads = [threading.Thread(target=reader) for _ in range(readers)]
+        threads += [threading.Thread(target=writer) for _ in range(writers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        engine.dispose()
+
+    latencies = sorted(stats["latencies"]) or [0.0]
+    p95 = latencies[int(len(latencies) * 0.95) - 1 if len(latencies) > 1 else 0]
+    print(f"{profile:<11} reads/s {stats['reads'] / seconds:8.1f}   "
+          f"writes/s {stats['writes'] / seconds:8.1f}   "
+          f"write p95 {p95 * 1000:8.1f} ms   locked errors {stats['errors']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=200000)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--readers", type=int, default=4)
+    parser.add_argument("--writers", type=int, default=2)
+    args = parser.parse_args()
+
+    print(f"{args.rows} Buchungen, {args.readers} Leser, {args.writers} Schreiber, "
+          f"{args.seconds:g}s je Profil")
+    for profile in ("default", "production"):
+        run(profile, args.rows, args.seconds, args.readers, args.writers)
+
+
+if __name__ == "__main__":
+    main()
@@ -14,6 +14,8 @@ from app.models.arbeit_komponente import ArbeitKomponente  # noqa: F401
 from app.models.unternehmensdaten import Unternehmensdaten  # noqa: F401
 from app.models.einnahme_ausgabe import EinnahmeAusgabe  # noqa: F401
 from app.models.eur_kategorie import EurKategorie
+from app.models.eur_monatssumme import EurMonatssumme  # noqa: F401
+from app.models.receipt import Receipt  # noqa: F401
 from app.models.user import User  # noqa: F401
 
 from sqlalchemy.exc import IntegrityError
@@ -22,6 +24,10 @@ from sqlalchemy.exc import IntegrityError
 def create_schema():
     print("Erstelle Tabellen (falls nicht vorhanden)…")
     Base.metadata.create_all(bind=engine)
+    # create_all legt Indizes nur mit neuen Tabellen an, fehlende nachziehen
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
     print("Schema ok.")
 
 
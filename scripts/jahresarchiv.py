@@ -0,0 +1,50 @@
+"""
+Jahresarchiv für den Steuerberater schreiben: Rechnungen, Belege und
+Buchungsjournal eines Jahres als ZIP mit SHA-256-Manifest.
+
+    python scripts/jahresarchiv.py 2024
+    python scripts/jahresarchiv.py 2024 --ziel /mnt/usb/Jahresarchiv_2024.zip
+
+Ein abgebrochener Lauf wird beim nächsten Aufruf fortgesetzt; ein
+unverändertes Archiv wird nicht neu geschrieben.
+"""
+import argparse
+import sys
+from pathlib import Path
+
+# Add project root to Python path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from database.db import SessionLocal
+import app.models  # noqa: F401
+from app.utils.year_archive import build_archive, save_archive
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Jahresarchiv (ZIP) für den Steuerberater schreiben")
+    parser.add_argument("jahr", type=int, help="Geschäftsjahr")
+    parser.add_argument("--ziel", type=Path, help="ZIP-Datei (Standard: Jahresarchiv_<jahr>.zip)")
+    args = parser.parse_args()
+    ziel = args.ziel or Path(f"Jahresarchiv_{args.jahr}.zip")
+
+    with SessionLocal() as db:
+        archive = build_archive(db, args.jahr)
+    try:
+        print(f"{len(archive.entries)} Dateien, {archive.rows} Buchungen, {archive.size / 1e6:.1f} MB")
+        for name in archive.missing:
+            print(f"Fehlt: {name}", file=sys.stderr)
+        written = save_archive(archive, ziel)
+    finally:
+        archive.close()
+
+    if written == 0:
+        print(f"{ziel} ist aktuell.")
+    elif written < archive.size:
+        print(f"{ziel} fortgesetzt ({written / 1e6:.1f} MB geschrieben).")
+    else:
+        print(f"{ziel} geschrieben.")
+
+
+if __name__ == "__main__":
+    main()
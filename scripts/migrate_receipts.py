@@ -0,0 +1,59 @@
+"""
+Belege in die Tabelle receipt übernehmen.
+
+Legt die Tabelle an und überträgt die Dateinamen aus
+material_komponente.receipt_path und einnahmen_ausgaben.receipt_files
+(mit Größe, MIME-Typ und SHA-256 der Dateien). Kann gefahrlos mehrfach
+ausgeführt werden.
+
+    python scripts/migrate_receipts.py
+    python scripts/migrate_receipts.py --drop-columns
+
+Mit --drop-columns werden die beiden alten Spalten danach entfernt, aber nur
+wenn jeder Dateiname übernommen wurde. Ist ein Beleg bereits einem anderen
+Datensatz zugeordnet, bleiben die Spalten stehen, bis der Konflikt behoben ist.
+"""
+import argparse
+import sys
+from pathlib import Path
+
+# Add project root to Python path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from database.db import Base, engine
+import app.models  # noqa: F401
+from app.models.receipt import Receipt
+from app.utils.receipts import LegacyReceiptConflict, drop_legacy_receipt_columns, migrate_legacy_receipts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Belege in die Tabelle receipt übernehmen")
+    parser.add_argument("--drop-columns", action="store_true",
+                        help="alte Spalten entfernen, wenn alle Belege ohne Konflikt übernommen wurden")
+    args = parser.parse_args()
+
+    print("Erstelle Tabelle receipt (falls nicht vorhanden)…")
+    Base.metadata.create_all(bind=engine, tables=[Receipt.__table__])
+
+    print("Übernehme Belege…")
+    with engine.begin() as connection:
+        result = migrate_legacy_receipts(connection)
+    print(f"{result.moved} Belege übernommen.")
+    for conflict in result.conflicts:
+        print(f"Konflikt: {conflict}", file=sys.stderr)
+
+    if not args.drop_columns:
+        return
+    if result.conflicts:
+        sys.exit("Alte Spalten bleiben erhalten, bis die Konflikte behoben sind.")
+    try:
+        with engine.begin() as connection:
+            dropped = drop_legacy_receipt_columns(connection)
+    except LegacyReceiptConflict as e:
+        sys.exit(f"Alte Spalten bleiben erhalten: {e}")
+    print(f"Spalten entfernt: {', '.join(dropped) or 'keine'}")
+
+
+if __name__ == "__main__":
+    main()
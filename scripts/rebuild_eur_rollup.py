@@ -0,0 +1,25 @@
+import sys
+from pathlib import Path
+
+# Add project root to Python path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from database.db import Base, engine, SessionLocal
+import app.models  # noqa: F401
+import app.utils.data_version  # noqa: F401  (neue Datenversion nach dem Commit)
+from app.utils.eur_rollup import rebuild_rollup
+
+
+def main():
+    print("Erstelle Tabellen (falls nicht vorhanden)…")
+    Base.metadata.create_all(bind=engine)
+
+    print("Berechne EÜR-Monatssummen neu…")
+    with SessionLocal() as db:
+        anzahl = rebuild_rollup(db)
+    print(f"{anzahl} Monatssummen geschrieben.")
+
+
+if __name__ == "__main__":
+    main()
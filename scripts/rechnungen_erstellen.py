@@ -0,0 +1,64 @@
+"""
+Rechnungen für mehrere Aufträge auf einmal erstellen (z. B. zum Monatsende).
+
+    python scripts/rechnungen_erstellen.py --auftraege 12 13 17
+    python scripts/rechnungen_erstellen.py --alle-fertigen --datum 2025-03-31
+
+Die Rechnungen werden in einer Transaktion angelegt, die PDFs parallel in
+--workers Prozessen gerendert. Aufträge, für die keine Rechnung erstellt
+werden konnte, werden mit Grund ausgegeben (Exit-Code 1).
+"""
+import argparse
+import datetime
+import sys
+from pathlib import Path
+
+# Add project root to Python path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from database.db import SessionLocal
+import app.models  # noqa: F401
+import app.utils.data_version  # noqa: F401  (neue Datenversion nach dem Commit)
+from app.utils.pdf_pool import PdfPool
+from app.utils.rechnung_batch import finished_order_ids, run_batch
+from config import config
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rechnungen für mehrere Aufträge erstellen")
+    auswahl = parser.add_mutually_exclusive_group(required=True)
+    auswahl.add_argument("--auftraege", type=int, nargs="+", metavar="ID", help="Auftrags-IDs")
+    auswahl.add_argument("--alle-fertigen", action="store_true",
+                         help="alle fertigen Aufträge ohne Rechnung")
+    parser.add_argument("--datum", type=datetime.date.fromisoformat, default=datetime.date.today(),
+                        help="Rechnungsdatum (YYYY-MM-DD, Standard: heute)")
+    parser.add_argument("--workers", type=int, default=max(config.PDF_WORKERS, 1),
+                        help="PDF-Prozesse (0: ohne Pool rendern)")
+    args = parser.parse_args()
+
+    pool = None
+    if args.workers > 0:
+        pool = PdfPool(args.workers, config.PDF_QUEUE_SIZE, config.PDF_TIMEOUT,
+                       config.PDF_MAX_JOBS_PER_WORKER)
+    try:
+        with SessionLocal() as db:
+            auftrag_ids = finished_order_ids(db, args.datum) if args.alle_fertigen else args.auftraege
+            print(f"{len(auftrag_ids)} Aufträge, Rechnungsdatum {args.datum:%d.%m.%Y}")
+
+            def progress(fertig, gesamt, entry):
+                print(f"[{fertig}/{gesamt}] Rechnung #{entry['rechnung_id']} (Auftrag {entry['auftrag_id']})")
+
+            result = run_batch(db, auftrag_ids, args.datum, pool, progress)
+    finally:
+        if pool is not None:
+            pool.close()
+
+    print(f"{len(result.created)} Rechnungen erstellt.")
+    for fehler in result.failed:
+        print(f"Auftrag {fehler['auftrag_id']}: {fehler['fehler']}", file=sys.stderr)
+    sys.exit(1 if result.failed else 0)
+
+
+if __name__ == "__main__":
+    main()
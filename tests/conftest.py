@@ -1,16 +1,34 @@
 import pytest
 import tempfile
 import os
-from sqlalchemy import create_engine
+from datetime import date, timedelta
+from decimal import Decimal
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
 from fastapi.testclient import TestClient
 
-from database.db import Base, get_db
+from database.db import Base, get_db, get_read_db, get_read_sessionmaker, get_async_db
 from app.main import app
+from app.models.auftrag import Auftrag
+from app.models.arbeit_komponente import ArbeitKomponente
+from app.models.einnahme_ausgabe import EinnahmeAusgabe
+from app.models.eur_kategorie import EurKategorie
+from app.models.kunde import Kunde
+from app.models.material_komponente import MaterialKomponente
+from app.models.rechnung import Rechnung
+from app.models.unternehmensdaten import Unternehmensdaten
+from app.utils.report_cache import report_cache
+from config import config
 
 @pytest.fixture
-def test_db():
+def test_db(tmp_path, monkeypatch):
     """Create a temporary test database"""
+    monkeypatch.setattr(config, "DATA_VERSION_FILE", tmp_path / "data_version")
+    monkeypatch.setattr(config, "PDF_CACHE_DIR", tmp_path / "pdf_cache")
+    monkeypatch.setattr(config, "JOB_QUEUE_DB", tmp_path / "jobs.db")
     db_fd, db_path = tempfile.mkstemp(suffix=".db")
     engine = create_engine(f"sqlite:///{db_path}")
     Base.metadata.create_all(engine)
@@ -25,6 +43,19 @@ def test_db():
             db.close()
 
     app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_read_db] = override_get_db
+    app.dependency_overrides[get_read_sessionmaker] = lambda: TestSessionLocal
+
+    # TestClient runs each request in a fresh event loop, so don't pool
+    async_engine = create_async_engine(f"sqlite+aiosqlite:///{db_path}", poolclass=NullPool)
+    TestAsyncSessionLocal = async_sessionmaker(async_engine, expire_on_commit=False)
+
+    async def override_get_async_db():
+        async with TestAsyncSessionLocal() as db:
+            yield db
+
+    app.dependency_overrides[get_async_db] = override_get_async_db
+    report_cache.invalidate()
 
     yield TestSessionLocal()
 
@@ -34,4 +65,74 @@ def test_db():
 @pytest.fixture
 def client(test_db):
     """Test client with test database"""
-    return TestClient(app)
\ No newline at end of file
+    return TestClient(app)
+
+
+@pytest.fixture
+def seeded_db(test_db):
+    """Test database with customers, orders, invoices and bookings over two years"""
+    erloese = EurKategorie(name="Erlöse", typ="einnahme")
+    materialkosten = EurKategorie(name="Materialkosten", typ="ausgabe")
+    miete = EurKategorie(name="Miete", typ="ausgabe")
+    firma = Unternehmensdaten(unternehmen_name="Testbau GmbH")
+    test_db.add_all([erloese, materialkosten, miete, firma])
+    test_db.flush()
+
+    start = date(2024, 1, 1)
+    for i in range(20):
+        kunde = Kunde(
+            kundenart="Firmenkunde" if i % 2 else "Privatkunde",
+            kunde_vorname=f"Vorname{i}", kunde_nachname=f"Nachname{i}",
+            kunde_firmenname=f"Firma {i}", kunde_seit=start + timedelta(days=i * 30)
+        )
+        test_db.add(kunde)
+        for j in range(2):
+            datum = start + timedelta(days=i * 30 + j * 7)
+            auftrag = Auftrag(kunde=kunde, beschreibung=f"Auftrag {i}-{j}", auftrag_start=datum)
+            auftrag.arbeit_komponenten = [
+                ArbeitKomponente(arbeit="Montage", berechnungsbasis="stunden", anzahl_stunden=4,
+                                 stundenlohn=Decimal("45.00"), kategorie_id=erloese.id)
+            ]
+            auftrag.materialien = [
+                MaterialKomponente(bezeichnung=f"Material {k}", anzahl=Decimal("2"),
+                                   preis_pro_einheit=Decimal("9.90"), kategorie_id=erloese.id)
+                for k in range(3)
+            ]
+            bezahlt = (i + j) % 2 == 0
+            rechnung = Rechnung(
+                kunde=kunde, auftrag=auftrag, unternehmensdaten_id=firma.id,
+                rechnungsdatum=datum, rechnungssumme_gesamt=Decimal("239.40"),
+                bezahlt=bezahlt, payment_date=datum + timedelta(days=14) if bezahlt else None
+            )
+            test_db.add(rechnung)
+            if bezahlt:
+                test_db.add(EinnahmeAusgabe(datum=rechnung.payment_date, typ="einnahme",
+                                            betrag=Decimal("239.40"), kategorie_id=erloese.id,
+                                            rechnung=rechnung, beschreibung="Rechnungszahlung"))
+                test_db.add(EinnahmeAusgabe(datum=rechnung.payment_date, typ="ausgabe",
+                                            betrag=Decimal("35.00"), kategorie_id=materialkosten.id,
+                                            rechnung=rechnung, beschreibung="Materialkosten"))
+        test_db.add(EinnahmeAusgabe(datum=start + timedelta(days=i * 30), typ="ausgabe",
+                                    betrag=Decimal("800.00"), kategorie_id=miete.id,
+                                    beschreibung=f"Miete {i}"))
+    test_db.commit()
+    return test_db
+
+
+@pytest.fixture
+def count_queries():
+    """Return a helper that runs a callable and returns the SQL statements it issued"""
+    def run(func, *args, **kwargs):
+        statements = []
+
+        def record(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        event.listen(Engine, "before_cursor_execute", record)
+        try:
+            result = func(*args, **kwargs)
+        finally:
+            event.remove(Engine, "before_cursor_execute", record)
+        return result, statements
+
+    return run
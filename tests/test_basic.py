@@ -1,5 +1,6 @@
 import pytest
 from app.models.kunde import Kunde
+from app.utils.job_queue import JobQueue
 
 def test_homepage(client):
     """Test homepage loads correctly"""
@@ -34,4 +35,14 @@ def test_health_endpoint(client):
     response = client.get("/health")
     assert response.status_code == 200
     data = response.json()
-    assert "status" in data
\ No newline at end of file
+    assert "status" in data
+
+def test_health_reports_job_queue_errors(client, monkeypatch):
+    """Test a broken job queue is reported in the payload instead of failing the health check"""
+    def broken_counts(self):
+        raise OSError("disk I/O error")
+
+    monkeypatch.setattr(JobQueue, "counts", broken_counts)
+    response = client.get("/health")
+    assert response.status_code == 200
+    assert response.json()["jobs"] == {"status": "error", "error": "disk I/O error"}
@@ -0,0 +1,71 @@
+import datetime
+from decimal import Decimal
+
+from app.models.kunde import Kunde
+from app.models.auftrag import Auftrag
+from app.models.rechnung import Rechnung
+from app.models.einnahme_ausgabe import EinnahmeAusgabe
+from app.models.eur_kategorie import EurKategorie
+from app.utils.dashboard_metrics import compute_dashboard_metrics, get_available_years
+
+
+def _seed(db):
+    kategorie = EurKategorie(name="Miete", typ="ausgabe")
+    kunde = Kunde(kundenart="Privatkunde", kunde_seit=datetime.date(2024, 3, 1))
+    db.add_all([kategorie, kunde])
+    db.flush()
+
+    auftrag = Auftrag(kunde_id=kunde.id, auftrag_start=datetime.date(2024, 3, 5))
+    db.add(auftrag)
+    db.flush()
+
+    db.add(Rechnung(
+        kunde_id=kunde.id,
+        auftrag_id=auftrag.id,
+        unternehmensdaten_id=1,
+        rechnungsdatum=datetime.date(2024, 3, 10),
+        rechnungssumme_gesamt=Decimal("1000.00"),
+        bezahlt=True,
+        payment_date=datetime.date(2024, 4, 2)
+    ))
+    db.add(EinnahmeAusgabe(
+        datum=datetime.date(2024, 4, 15),
+        typ="ausgabe",
+        betrag=Decimal("250.50"),
+        kategorie_id=kategorie.id
+    ))
+    db.add(EinnahmeAusgabe(
+        datum=datetime.date(2023, 12, 31),
+        typ="ausgabe",
+        betrag=Decimal("99.00"),
+        kategorie_id=kategorie.id
+    ))
+    db.commit()
+
+
+def test_dashboard_metrics(test_db):
+    """Test counters and monthly series for one year"""
+    _seed(test_db)
+
+    metrics = compute_dashboard_metrics(test_db, 2024)
+
+    assert metrics.total_customers == 1
+    assert metrics.private_customers == 1
+    assert metrics.total_invoices == 1
+    assert metrics.paid_invoices == 1
+    assert metrics.unpaid_invoices == 0
+    assert metrics.current_year_orders == 1
+    assert metrics.year_revenue == Decimal("1000.00")
+    assert metrics.year_expenses == Decimal("250.50")
+    assert metrics.year_profit == Decimal("749.50")
+    assert metrics.revenue_data[3] == 1000.0
+    assert metrics.expense_data[3] == 250.5
+    assert metrics.customers_data[2] == 1
+    assert metrics.invoices_data[2] == 1
+
+
+def test_available_years(test_db):
+    """Test year selector combines invoice and booking years"""
+    _seed(test_db)
+
+    assert get_available_years(test_db) == [2024, 2023]
@@ -0,0 +1,28 @@
+from app.models.kunde import Kunde
+from app.utils.data_version import current_version
+
+
+def test_kundenliste_not_modified(client, test_db):
+    """Test a matching If-None-Match returns 304 until data changes"""
+    response = client.get("/kundenliste")
+    assert response.status_code == 200
+    etag = response.headers["etag"]
+
+    response = client.get("/kundenliste", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.content == b""
+
+    test_db.add(Kunde(kunde_vorname="Test", kundenart="Privatkunde"))
+    test_db.commit()
+
+    response = client.get("/kundenliste", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
+
+
+def test_data_version_unchanged_by_reads(test_db):
+    """Test read-only transactions do not bump the data version"""
+    version = current_version()
+    test_db.query(Kunde).all()
+    test_db.commit()
+    assert current_version() == version
@@ -0,0 +1,104 @@
+import asyncio
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from sqlalchemy.orm import sessionmaker
+
+from database.db import create_async_db_engine, create_db_engine
+
+
+def test_production_profile_pragmas(tmp_path):
+    """Test the production profile enables WAL and the tuned pragmas"""
+    engine = create_db_engine(f"sqlite:///{tmp_path / 'erp.db'}", "production")
+    with engine.connect() as conn:
+        assert conn.exec_driver_sql("PRAGMA journal_mode").scalar() == "wal"
+        assert conn.exec_driver_sql("PRAGMA synchronous").scalar() == 1  # NORMAL
+        assert conn.exec_driver_sql("PRAGMA temp_store").scalar() == 2  # MEMORY
+    engine.dispose()
+
+
+def test_default_profile_keeps_sqlite_defaults(tmp_path):
+    """Test the default profile leaves the journal mode untouched"""
+    engine = create_db_engine(f"sqlite:///{tmp_path / 'erp.db'}", "default")
+    with engine.connect() as conn:
+        assert conn.exec_driver_sql("PRAGMA journal_mode").scalar() == "delete"
+    engine.dispose()
+
+
+def test_read_engine_snapshot(tmp_path):
+    """Test read-only sessions see one snapshot and reject writes"""
+    url = f"sqlite:///{tmp_path / 'erp.db'}"
+    writer = create_db_engine(url, "production")
+    reader = create_db_engine(url, "production", read_only=True)
+    with writer.begin() as conn:
+        conn.exec_driver_sql("CREATE TABLE t (id INTEGER PRIMARY KEY)")
+        conn.exec_driver_sql("INSERT INTO t DEFAULT VALUES")
+
+    read_session = sessionmaker(bind=reader)()
+    assert read_session.execute(text("SELECT count(*) FROM t")).scalar() == 1
+
+    # The open read transaction does not block the writer ...
+    with writer.begin() as conn:
+        conn.exec_driver_sql("INSERT INTO t DEFAULT VALUES")
+    # ... and keeps seeing its snapshot until it ends
+    assert read_session.execute(text("SELECT count(*) FROM t")).scalar() == 1
+    read_session.rollback()
+    assert read_session.execute(text("SELECT count(*) FROM t")).scalar() == 2
+
+    with pytest.raises(OperationalError):
+        read_session.execute(text("INSERT INTO t DEFAULT VALUES"))
+    read_session.close()
+    reader.dispose()
+    writer.dispose()
+
+
+def test_read_engine_without_wal_does_not_block_writers(tmp_path):
+    """Test an open read session in the rollback-journal profile lets writers commit"""
+    url = f"sqlite:///{tmp_path / 'erp.db'}"
+    writer = create_db_engine(url, "default")
+    reader = create_db_engine(url, "default", read_only=True)
+    with writer.begin() as conn:
+        conn.exec_driver_sql("CREATE TABLE t (id INTEGER PRIMARY KEY)")
+
+    read_session = sessionmaker(bind=reader)()
+    assert read_session.execute(text("SELECT count(*) FROM t")).scalar() == 0
+    # The session stays open, as during a streamed response
+    with writer.begin() as conn:
+        conn.exec_driver_sql("INSERT INTO t DEFAULT VALUES")
+    assert read_session.execute(text("SELECT count(*) FROM t")).scalar() == 1
+
+    with pytest.raises(OperationalError):
+        read_session.execute(text("INSERT INTO t DEFAULT VALUES"))
+    read_session.close()
+    reader.dispose()
+    writer.dispose()
+
+
+def test_async_read_engine_snapshot(tmp_path):
+    """Test sessions of the async read engine see one snapshot and reject writes"""
+    url = f"sqlite:///{tmp_path / 'erp.db'}"
+    writer = create_db_engine(url, "production")
+    with writer.begin() as conn:
+        conn.exec_driver_sql("CREATE TABLE t (id INTEGER PRIMARY KEY)")
+        conn.exec_driver_sql("INSERT INTO t DEFAULT VALUES")
+
+    async def check():
+        reader = create_async_db_engine(url, "production", read_only=True)
+        try:
+            async with async_sessionmaker(reader)() as session:
+                assert (await session.execute(text("PRAGMA query_only"))).scalar() == 1
+                assert (await session.execute(text("SELECT count(*) FROM t"))).scalar() == 1
+                with writer.begin() as conn:
+                    conn.exec_driver_sql("INSERT INTO t DEFAULT VALUES")
+                assert (await session.execute(text("SELECT count(*) FROM t"))).scalar() == 1
+                with pytest.raises(OperationalError, match="readonly"):
+                    await session.execute(text("INSERT INTO t DEFAULT VALUES"))
+        finally:
+            await reader.dispose()
+
+    asyncio.run(check())
+    with writer.connect() as conn:
+        assert conn.exec_driver_sql("SELECT count(*) FROM t").scalar() == 2
+    writer.dispose()
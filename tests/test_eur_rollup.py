@@ -0,0 +1,92 @@
+import datetime
+from decimal import Decimal
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.models.einnahme_ausgabe import EinnahmeAusgabe
+from app.models.eur_kategorie import EurKategorie
+from app.models.eur_monatssumme import EurMonatssumme
+from app.utils.eur_rollup import rebuild_rollup, get_year_totals
+
+
+def _rollup(db):
+    return {
+        (r.jahr, r.monat, r.typ, r.kategorie_id): (Decimal(str(r.summe)), r.anzahl)
+        for r in db.query(EurMonatssumme).all()
+    }
+
+
+def test_rollup_follows_booking_changes(test_db):
+    """Test insert, edit and delete of bookings update the monthly rollup"""
+    miete = EurKategorie(name="Miete", typ="ausgabe")
+    erloese = EurKategorie(name="Erlöse", typ="einnahme")
+    test_db.add_all([miete, erloese])
+    test_db.commit()
+
+    buchung = EinnahmeAusgabe(datum=datetime.date(2024, 5, 3), typ="ausgabe",
+                              betrag=Decimal("100.00"), kategorie_id=miete.id)
+    test_db.add_all([
+        buchung,
+        EinnahmeAusgabe(datum=datetime.date(2024, 5, 20), typ="ausgabe",
+                        betrag=Decimal("50.25"), kategorie_id=miete.id),
+        EinnahmeAusgabe(datum=datetime.date(2024, 6, 1), typ="einnahme",
+                        betrag=Decimal("500.00"), kategorie_id=erloese.id),
+    ])
+    test_db.commit()
+
+    assert _rollup(test_db)[(2024, 5, "ausgabe", miete.id)] == (Decimal("150.25"), 2)
+
+    # Move one booking to another month
+    buchung.datum = datetime.date(2024, 7, 1)
+    buchung.betrag = Decimal("80.00")
+    test_db.commit()
+
+    rollup = _rollup(test_db)
+    assert rollup[(2024, 5, "ausgabe", miete.id)] == (Decimal("50.25"), 1)
+    assert rollup[(2024, 7, "ausgabe", miete.id)] == (Decimal("80.00"), 1)
+
+    # Deleting the last booking of a month removes its rollup row
+    test_db.delete(buchung)
+    test_db.commit()
+    assert (2024, 7, "ausgabe", miete.id) not in _rollup(test_db)
+
+    totals = get_year_totals(test_db, 2024)[2024]
+    assert totals["einnahmen"] == Decimal("500.00")
+    assert totals["ausgaben"] == Decimal("50.25")
+    assert totals["saldo"] == Decimal("449.75")
+
+    # A full rebuild yields the same rollup
+    maintained = _rollup(test_db)
+    rebuild_rollup(test_db)
+    assert _rollup(test_db) == maintained
+
+
+def test_reports_view_reads_rollup_only(client, test_db):
+    """Test the multi-year report is built without loading bookings"""
+    kategorie = EurKategorie(name="Erlöse", typ="einnahme")
+    test_db.add(kategorie)
+    test_db.commit()
+    test_db.add_all([
+        EinnahmeAusgabe(datum=datetime.date(year, 3, 1), typ="einnahme",
+                        betrag=Decimal("100.00"), kategorie_id=kategorie.id)
+        for year in (2022, 2023, 2023)
+    ])
+    test_db.commit()
+
+    statements = []
+
+    def record(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    # Listen on all engines, the route reads through the async engine
+    event.listen(Engine, "before_cursor_execute", record)
+    try:
+        response = client.get("/euer?view=reports")
+    finally:
+        event.remove(Engine, "before_cursor_execute", record)
+
+    assert response.status_code == 200
+    assert "200,00" in response.text
+    assert statements
+    assert not any("einnahmen_ausgaben" in statement for statement in statements)
@@ -0,0 +1,114 @@
+import time
+
+import pytest
+from sqlalchemy.orm import sessionmaker
+
+from app.models.einnahme_ausgabe import EinnahmeAusgabe
+from app.models.material_komponente import MaterialKomponente
+from app.models.rechnung import Rechnung
+from app.utils import job_queue, pdf_cache
+from app.utils.job_queue import JobQueue, job_handler, work_once
+from app.utils.receipts import BUCHUNG, MATERIAL, add_receipt
+from config import config
+from database import db as database
+
+
+_flaky_calls = []
+
+
+@job_handler("test_flaky")
+def _flaky(payload):
+    _flaky_calls.append(payload)
+    if len(_flaky_calls) == 1:
+        raise RuntimeError("first attempt fails")
+    return {"ok": True}
+
+
+@pytest.fixture
+def inline_jobs(seeded_db, monkeypatch):
+    """Run jobs when they are submitted, against the test database"""
+    monkeypatch.setattr(config, "JOB_WORKERS", 0)
+    TestSessionLocal = sessionmaker(bind=seeded_db.get_bind())
+    monkeypatch.setattr(database, "SessionLocal", TestSessionLocal)
+    monkeypatch.setattr(pdf_cache, "render_html_to_pdf",
+                        lambda html, base_url=None, stylesheets=(): b"%PDF-1.7\njob")
+
+
+def test_failed_jobs_retry_with_backoff_and_keys_are_idempotent(tmp_path, monkeypatch):
+    """Test a failing job is retried after its backoff and a key is queued once"""
+    queue = JobQueue(tmp_path / "jobs.db")
+    job = queue.enqueue("test_flaky", {}, key="flaky")
+    assert queue.enqueue("test_flaky", {}, key="flaky").id == job.id
+
+    assert work_once(queue, "w1")
+    assert queue.get(job.id).status == "queued"
+    assert queue.get(job.id).error == "RuntimeError: first attempt fails"
+    # Still within the backoff
+    assert not work_once(queue, "w1")
+
+    later = time.time() + config.JOB_RETRY_BACKOFF + 1
+    monkeypatch.setattr(job_queue.time, "time", lambda: later)
+    assert work_once(queue, "w1")
+    done = queue.get(job.id)
+    assert (done.status, done.attempts, done.result) == ("done", 2, {"ok": True})
+
+
+def test_jobs_of_dead_workers_are_claimed_again_after_the_lease(tmp_path, monkeypatch):
+    """Test a running job whose worker vanished returns to the queue"""
+    queue = JobQueue(tmp_path / "jobs.db")
+    job = queue.enqueue("test_flaky", {})
+    assert queue.claim("w1").id == job.id
+    assert queue.claim("w2") is None
+
+    later = time.time() + config.JOB_LEASE + 1
+    monkeypatch.setattr(job_queue.time, "time", lambda: later)
+    claimed = queue.claim("w2")
+    assert (claimed.id, claimed.attempts) == (job.id, 2)
+
+
+def test_invoice_pdf_job_is_polled_and_downloaded(client, seeded_db, inline_jobs):
+    """Test the PDF job endpoint returns a job id whose result can be downloaded"""
+    rechnung_id = seeded_db.query(Rechnung).first().id
+    response = client.post(f"/api/rechnungen/{rechnung_id}/pdf")
+    assert response.status_code == 202
+    job_id = response.json()["job_id"]
+    assert client.post(f"/api/rechnungen/{rechnung_id}/pdf").json()["job_id"] == job_id
+
+    status = client.get(response.json()["status_url"]).json()
+    assert status["status"] == "done"
+    download = client.get(status["download_url"])
+    assert download.status_code == 200
+    assert download.content == b"%PDF-1.7\njob"
+
+    missing = client.post("/api/rechnungen/999999/pdf").json()
+    assert client.get(missing["status_url"]).json()["status"] == "failed"
+
+
+def test_deleted_booking_receipts_are_removed_by_a_job(client, seeded_db, inline_jobs, tmp_path, monkeypatch):
+    """Test receipt files of a deleted booking are deleted after the commit"""
+    monkeypatch.setattr(config, "RECEIPTS_DIR", tmp_path)
+    (tmp_path / "beleg.pdf").write_bytes(b"%PDF")
+    buchung = seeded_db.query(EinnahmeAusgabe).filter(EinnahmeAusgabe.rechnung_id.is_(None)).first()
+    add_receipt(seeded_db, BUCHUNG, buchung.id, "beleg.pdf")
+    seeded_db.commit()
+
+    response = client.post(f"/buchungen/{buchung.id}/loeschen", follow_redirects=False)
+    assert response.status_code == 303
+    assert not (tmp_path / "beleg.pdf").exists()
+    assert job_queue.get_queue().counts() == {"done": 1}
+
+
+def test_deleted_material_receipt_is_removed_by_a_job(client, seeded_db, inline_jobs, tmp_path, monkeypatch):
+    """Test deleting one material receipt queues the file deletion from the async handler"""
+    monkeypatch.setattr(config, "RECEIPTS_DIR", tmp_path)
+    (tmp_path / "foto.jpg").write_bytes(b"\xff\xd8")
+    material = seeded_db.query(MaterialKomponente).first()
+    add_receipt(seeded_db, MATERIAL, material.id, "foto.jpg")
+    seeded_db.commit()
+
+    response = client.post("/rechnung/1/materialkosten/delete-receipt",
+                           data={"material_id": material.id, "filename": "foto.jpg"},
+                           headers={"accept": "application/json"})
+    assert response.json()["success"] is True
+    assert not (tmp_path / "foto.jpg").exists()
+    assert job_queue.get_queue().counts() == {"done": 1}
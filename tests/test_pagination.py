@@ -0,0 +1,117 @@
+import re
+
+from app.models.einnahme_ausgabe import EinnahmeAusgabe
+from app.models.kunde import Kunde
+from app.utils.pagination import encode_cursor, keyset_stream
+
+
+def _walk(client, url):
+    """Follow next_cursor through all pages and return the items in order."""
+    items, cursor = [], None
+    while True:
+        page = client.get(url + (f"&cursor={cursor}" if cursor else "")).json()
+        items += page["items"]
+        cursor = page["next_cursor"]
+        if not cursor:
+            return items
+
+
+def test_kunden_api_pages_cover_all_customers(client, seeded_db):
+    """Test walking the customer API page by page returns every customer once, newest first"""
+    ids = [item["id"] for item in _walk(client, "/api/kunden?limit=7")]
+    expected = [k.id for k in seeded_db.query(Kunde).order_by(Kunde.id.desc())]
+    assert ids == expected
+
+
+def test_manual_bookings_paged_by_date_and_id(client, seeded_db):
+    """Test manual bookings with equal dates are neither skipped nor repeated"""
+    kategorie_id = seeded_db.query(EinnahmeAusgabe).first().kategorie_id
+    same_day = seeded_db.query(EinnahmeAusgabe).filter(EinnahmeAusgabe.rechnung_id.is_(None)).first().datum
+    for i in range(5):
+        seeded_db.add(EinnahmeAusgabe(datum=same_day, typ="ausgabe", betrag=1, kategorie_id=kategorie_id))
+    seeded_db.commit()
+
+    items = _walk(client, "/api/buchungen/manuell?limit=3")
+    keys = [(item["datum"], item["id"]) for item in items]
+    assert keys == sorted(keys, reverse=True)
+    assert len(keys) == seeded_db.query(EinnahmeAusgabe).filter(EinnahmeAusgabe.rechnung_id.is_(None)).count()
+
+
+def test_euer_timeline_pages_match_single_page(client, seeded_db):
+    """Test the timeline split into small pages equals the unpaged timeline"""
+    paged = _walk(client, "/api/euer/timeline?year=2024&limit=4")
+    single = client.get("/api/euer/timeline?year=2024&limit=500").json()
+    assert single["next_cursor"] is None
+    assert paged == single["items"]
+    types = [item["type"] for item in paged]
+    assert types == sorted(types, key=lambda t: t == "manual_entry")
+
+
+def test_kundenliste_links_to_next_page(client, seeded_db):
+    """Test the HTML list shows one page and links to the next one"""
+    response = client.get("/kundenliste?limit=5")
+    assert response.text.count('class="kunde-row"') == 5
+
+    next_url = re.search(r'href="(/kundenliste\?[^"]*cursor=[^"]+)"', response.text).group(1)
+    response = client.get(next_url.replace("&amp;", "&"))
+    assert response.text.count('class="kunde-row"') == 5
+    assert "Erste Seite" in response.text
+
+
+def test_invalid_cursor_is_rejected(client, seeded_db):
+    """Test a tampered cursor gives 400 instead of a server error"""
+    assert client.get("/api/kunden?cursor=not-a-cursor").status_code == 400
+    assert client.get("/api/euer/timeline?cursor=WyJ4Il0").status_code == 400
+
+
+def test_streamed_rechnungsliste_pages_match_api(client, seeded_db):
+    """Test the streamed invoice list pages through the same invoices as the JSON API"""
+    ids, url = [], "/rechnungsliste?status=offen&limit=3"
+    while url:
+        response = client.get(url)
+        ids += [int(i) for i in re.findall(r"deleteInvoice\((\d+)\)", response.text)]
+        next_link = re.search(r'href="(/rechnungsliste\?[^"]*cursor=[^"]+)"[^>]*>Weiter', response.text)
+        url = next_link.group(1).replace("&amp;", "&") if next_link else None
+
+    assert ids == [item["id"] for item in _walk(client, "/api/rechnungen?status=offen&limit=3")]
+    assert client.get("/rechnungsliste?cursor=not-a-cursor").status_code == 400
+
+
+def test_streamed_euer_timeline_pages_match_api(client, seeded_db):
+    """Test the streamed EÜR page walks the same invoice groups and manual entries as the JSON API"""
+    invoices, manual, url = [], 0, "/euer?year=2024&limit=3"
+    while url:
+        response = client.get(url)
+        invoices += [int(i) for i in re.findall(r"toggleInvoiceDetails\('invoice-(\d+)'\)", response.text)]
+        manual += response.text.count('class="manual-entry-simple"')
+        next_link = re.search(r'href="(/euer\?[^"]*cursor=[^"]+)"[^>]*>Weiter', response.text)
+        url = next_link.group(1).replace("&amp;", "&") if next_link else None
+
+    items = _walk(client, "/api/euer/timeline?year=2024&limit=3")
+    assert invoices == [item["rechnung_id"] for item in items if item["type"] == "invoice_group"]
+    assert manual == sum(item["type"] == "manual_entry" for item in items)
+    assert client.get("/euer?cursor=WyJ4Il0").status_code == 400
+
+
+def test_malformed_booking_cursor_is_rejected_before_streaming(client, seeded_db):
+    """Test a bad key in the manual-booking part of the EÜR timeline gives 400 on both endpoints"""
+    for key in (["buchung", "x"], ["buchung", "notadate", 1]):
+        cursor = encode_cursor(key)
+        assert client.get(f"/api/euer/timeline?year=2024&cursor={cursor}").status_code == 400
+        assert client.get(f"/euer?year=2024&cursor={cursor}").status_code == 400
+
+
+def test_keyset_stream_reads_rows_lazily():
+    """Test a streamed page checks emptiness without losing a row and sets next_cursor after iterating"""
+    fetched = []
+
+    def rows():
+        for i in (5, 4, 3):
+            fetched.append(i)
+            yield i
+
+    page = keyset_stream(rows(), lambda i: [i], 2)
+    assert fetched == []
+    assert page.items
+    assert list(page.items) == [5, 4]
+    assert page.next_cursor == encode_cursor([4])
@@ -0,0 +1,50 @@
+import base64
+import os
+
+import pytest
+
+from app.utils import pdf_assets
+from config import config
+
+
+@pytest.fixture(autouse=True)
+def static_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "STATIC_DIR", tmp_path)
+    pdf_assets.clear()
+    yield tmp_path
+    pdf_assets.clear()
+
+
+def _touch(path, seconds):
+    os.utime(path, ns=(seconds * 10**9, seconds * 10**9))
+
+
+def test_logo_is_reloaded_only_when_modified(static_dir):
+    """Test the logo data is read once and reloaded after the file changes"""
+    logo = static_dir / "logo.png"
+    logo.write_bytes(b"alt")
+    _touch(logo, 1000)
+    assert pdf_assets.logo_base64() == base64.b64encode(b"alt").decode()
+
+    # Same modification time: still served from the cache
+    logo.write_bytes(b"neu")
+    _touch(logo, 1000)
+    assert pdf_assets.logo_base64() == base64.b64encode(b"alt").decode()
+
+    _touch(logo, 2000)
+    assert pdf_assets.logo_base64() == base64.b64encode(b"neu").decode()
+
+
+def test_url_fetcher_serves_static_files_from_memory(static_dir):
+    """Test static files are fetched from the cache with their MIME type"""
+    css = static_dir / "pdf" / "extra.css"
+    css.parent.mkdir()
+    css.write_text("p { color: red }")
+
+    fetched = pdf_assets.url_fetcher(css.as_uri())
+    assert fetched["string"] == b"p { color: red }"
+    assert fetched["mime_type"] == "text/css"
+
+    os.remove(css)
+    with pytest.raises(OSError):
+        pdf_assets.cached_file(css, lambda path: path.read_bytes())
@@ -0,0 +1,72 @@
+import os
+
+import pytest
+
+from app.models.kunde import Kunde
+from app.models.rechnung import Rechnung
+from app.utils import pdf_cache
+from app.utils.pdf_cache import PdfCache
+
+
+@pytest.fixture
+def renders(monkeypatch):
+    """Record rendered documents instead of running WeasyPrint"""
+    rendered = []
+
+    async def fake_render_pdf(html, base_url=None, stylesheets=()):
+        rendered.append(html)
+        return b"%PDF-1.7\n" + str(len(rendered)).encode()
+
+    monkeypatch.setattr(pdf_cache, "render_pdf", fake_render_pdf)
+    return rendered
+
+
+def test_least_recently_used_files_are_evicted(tmp_path):
+    """Test the cache stays within its size bound and keeps recently used files"""
+    cache = PdfCache(tmp_path, max_bytes=25)
+    for i, key in enumerate(["a", "b", "c"]):
+        cache.put(key, b"x" * 10)
+        os.utime(cache.path(key), ns=(i * 10**9, i * 10**9))
+
+    # "a" and "b" were over the bound together with "c": "a" went first
+    assert cache.get("a") is None
+    assert cache.get("b") is not None  # now the most recently used
+    cache.put("d", b"x" * 10)
+
+    assert cache.get("c") is None
+    assert cache.get("b") is not None
+    assert cache.get("d") is not None
+
+
+def test_invoice_download_is_cached_until_data_changes(client, seeded_db, renders):
+    """Test unchanged invoices come from the cache with strong ETags and changes re-render"""
+    rechnung = seeded_db.query(Rechnung).first()
+    url = f"/rechnung/{rechnung.id}/download"
+
+    first = client.get(url)
+    assert first.status_code == 200
+    assert first.content == b"%PDF-1.7\n1"
+    etag = first.headers["etag"]
+    assert not etag.startswith("W/")
+    assert first.headers["cache-control"] == "private, no-cache"
+
+    assert client.get(url).content == b"%PDF-1.7\n1"
+    assert client.get(url, headers={"If-None-Match": etag}).status_code == 304
+    assert len(renders) == 1
+
+    kunde = seeded_db.get(Kunde, rechnung.kunde_id)
+    kunde.kunde_rechnungsadresse = "Neue Straße 5"
+    seeded_db.commit()
+
+    changed = client.get(url, headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.content == b"%PDF-1.7\n2"
+    assert changed.headers["etag"] != etag
+    assert "Neue Straße 5" in renders[-1]
+
+
+def test_eur_pdf_download_name_is_encoded(client, seeded_db, renders):
+    """Test the EÜR download works with a non-ASCII file name"""
+    response = client.get("/euer/2024/pdf")
+    assert response.status_code == 200
+    assert "filename*=utf-8''E%C3%9CR_2024_Testbau_GmbH.pdf" in response.headers["content-disposition"]
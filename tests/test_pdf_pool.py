@@ -0,0 +1,55 @@
+import os
+import time
+
+import pytest
+
+from app.utils.pdf_pool import PdfPool, PdfQueueFull, PdfRenderError
+
+
+# Run in the worker processes, so they must be module-level functions
+
+def _pid():
+    return os.getpid()
+
+
+def _sleep(seconds):
+    time.sleep(seconds)
+    return seconds
+
+
+def _fail():
+    raise ValueError("kaputt")
+
+
+def test_workers_are_recycled_after_max_jobs():
+    """Test a worker process is replaced after max_jobs jobs"""
+    pool = PdfPool(workers=1, queue_size=8, timeout=30, max_jobs=2, render=_pid, warm_up=None)
+    try:
+        pids = [pool.submit().result(timeout=60) for _ in range(4)]
+    finally:
+        pool.close()
+    assert pids[0] == pids[1] != pids[2] == pids[3]
+
+
+def test_timeout_and_errors_fail_the_job_not_the_pool():
+    """Test a stuck job is killed, errors are reported and the pool keeps working"""
+    pool = PdfPool(workers=1, queue_size=1, timeout=0.5, max_jobs=100, render=_sleep, warm_up=None)
+    try:
+        stuck = pool.submit(30)
+        while not stuck.running():
+            time.sleep(0.01)
+        waiting = pool.submit(0)
+        with pytest.raises(PdfQueueFull):
+            pool.submit(0)
+        with pytest.raises(PdfRenderError, match="abgebrochen"):
+            stuck.result(timeout=60)
+        assert waiting.result(timeout=60) == 0
+    finally:
+        pool.close()
+
+    pool = PdfPool(workers=1, queue_size=1, timeout=30, max_jobs=100, render=_fail, warm_up=None)
+    try:
+        with pytest.raises(PdfRenderError, match="ValueError: kaputt"):
+            pool.submit().result(timeout=60)
+    finally:
+        pool.close()
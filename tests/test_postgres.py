@@ -0,0 +1,98 @@
+import datetime
+import os
+import threading
+from decimal import Decimal
+
+import pytest
+from sqlalchemy import select, text
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.orm import sessionmaker
+
+from database.db import Base, create_db_engine
+from app.models.einnahme_ausgabe import EinnahmeAusgabe
+from app.models.eur_kategorie import EurKategorie
+from app.models.eur_monatssumme import EurMonatssumme
+from app.utils.eur_rollup import get_year_totals, rebuild_rollup
+
+
+# e.g. TEST_POSTGRES_URL=postgresql://postgres@localhost/erp_test (database is wiped)
+POSTGRES_URL = os.getenv("TEST_POSTGRES_URL")
+
+pytestmark = pytest.mark.skipif(not POSTGRES_URL, reason="TEST_POSTGRES_URL not set")
+
+
+@pytest.fixture
+def pg_engine():
+    """Fresh schema on the PostgreSQL test database"""
+    engine = create_db_engine(POSTGRES_URL)
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+    yield engine
+    Base.metadata.drop_all(engine)
+    engine.dispose()
+
+
+def test_postgres_rollup_and_read_only(pg_engine):
+    """Test bookings, rollup and read-only sessions on PostgreSQL"""
+    db = sessionmaker(bind=pg_engine)()
+    kategorie = EurKategorie(name="Erlöse", typ="einnahme")
+    db.add(kategorie)
+    db.commit()
+    db.add_all([
+        EinnahmeAusgabe(datum=datetime.date(2024, month, 1), typ="einnahme",
+                        betrag=Decimal("100.00"), kategorie_id=kategorie.id)
+        for month in (1, 2, 12)
+    ])
+    db.commit()
+
+    assert get_year_totals(db, 2024)[2024]["einnahmen"] == Decimal("300.00")
+    rebuild_rollup(db)
+    assert get_year_totals(db, 2024)[2024]["einnahmen"] == Decimal("300.00")
+    db.close()
+
+    reader = create_db_engine(POSTGRES_URL, read_only=True)
+    read_session = sessionmaker(bind=reader)()
+    with pytest.raises(DBAPIError):
+        read_session.execute(text("DELETE FROM einnahmen_ausgaben"))
+    read_session.close()
+    reader.dispose()
+
+
+def test_postgres_concurrent_first_bookings_share_rollup_row(pg_engine):
+    """Test two transactions creating the same month row both commit and add up"""
+    Session = sessionmaker(bind=pg_engine)
+    with Session() as db:
+        kategorie = EurKategorie(name="Erlöse", typ="einnahme")
+        db.add(kategorie)
+        db.commit()
+        kategorie_id = kategorie.id
+
+    def booking():
+        return EinnahmeAusgabe(datum=datetime.date(2024, 3, 1), typ="einnahme",
+                               betrag=Decimal("100.00"), kategorie_id=kategorie_id)
+
+    first, second = Session(), Session()
+    first.add(booking())
+    first.flush()  # holds the new rollup row until commit
+
+    errors = []
+
+    def add_second():
+        try:
+            second.add(booking())
+            second.commit()  # waits for the first transaction's row
+        except Exception as e:
+            errors.append(e)
+
+    thread = threading.Thread(target=add_second)
+    thread.start()
+    thread.join(timeout=0.5)
+    first.commit()
+    thread.join(timeout=10)
+    first.close()
+    second.close()
+
+    assert not errors
+    with Session() as db:
+        assert get_year_totals(db, 2024)[2024]["einnahmen"] == Decimal("200.00")
+        assert db.scalar(select(EurMonatssumme.anzahl)) == 2
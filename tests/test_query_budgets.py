@@ -0,0 +1,33 @@
+import pytest
+
+from app.models.rechnung import Rechnung
+
+
+# Maximum number of SQL statements per page on the seeded dataset. The
+# numbers do not depend on the number of rows, so a per-row lazy load in a
+# template or route shows up as a budget overrun.
+BUDGETS = [
+    ("/kundenliste", 2),
+    ("/rechnungsliste", 5),
+    ("/rechnungsliste?status=offen", 3),
+    ("/euer", 6),
+    ("/euer?view=reports", 3),
+    ("/dashboard", 5),
+]
+
+
+@pytest.mark.parametrize("path,budget", BUDGETS)
+def test_page_query_budget(client, seeded_db, count_queries, path, budget):
+    """Test list pages stay within their SQL statement budget"""
+    response, statements = count_queries(client.get, path)
+    assert response.status_code == 200
+    assert len(statements) <= budget, "\n\n".join(statements)
+
+
+def test_materialkosten_query_budget(client, seeded_db, count_queries):
+    """Test the material cost form loads invoice, order and materials up front"""
+    rechnung = seeded_db.query(Rechnung).first()
+    response, statements = count_queries(client.get, f"/rechnung/{rechnung.id}/materialkosten")
+    assert response.status_code == 200
+    assert "Material 2" in response.text
+    assert len(statements) <= 3, "\n\n".join(statements)
@@ -0,0 +1,101 @@
+import re
+from datetime import date
+
+import pytest
+from sqlalchemy import event
+
+from database.db import Base
+from app.models.einnahme_ausgabe import EinnahmeAusgabe
+from app.models.eur_kategorie import EurKategorie
+from app.routes.buchungen import _euer_context, _timeline_page
+from app.utils.dashboard_metrics import DashboardMetrics, _load_monthly_series
+from app.utils.date_utils import in_period, period_range
+from app.utils.eur_rollup import get_category_totals, get_monthly_totals, get_year_totals
+from app.utils.pagination import keyset_query
+
+
+FULL_SCAN = re.compile(r"^SCAN (\w+)")
+
+
+def _filtered_statements(db, run):
+    """Run a report function and return its statements that have parameters."""
+    statements = []
+    engine = db.get_bind()
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if parameters:
+            statements.append((statement, parameters))
+
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        run(db)
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+    return statements
+
+
+def _full_scans(db, statement, parameters):
+    """Return the tables EXPLAIN QUERY PLAN reports as scanned."""
+    rows = db.connection().exec_driver_sql(
+        "EXPLAIN QUERY PLAN " + statement, parameters).all()
+    return [
+        match.group(1)
+        for match in (FULL_SCAN.match(row[-1]) for row in rows)
+        if match and match.group(1) in Base.metadata.tables
+    ]
+
+
+@pytest.mark.parametrize("run", [
+    lambda db: _load_monthly_series(db, DashboardMetrics(year=2024)),
+    lambda db: (_euer_context(db, "list", 2024), _timeline_page(db, 2024, None, 50)),
+    lambda db: get_year_totals(db, 2024),
+    lambda db: get_monthly_totals(db, 2024),
+    lambda db: get_category_totals(db, 2024),
+], ids=["dashboard_series", "euer_list", "year_totals", "monthly_totals", "category_totals"])
+def test_year_filters_use_indexes(test_db, run):
+    """Test year-filtered report queries search an index instead of scanning"""
+    statements = _filtered_statements(test_db, run)
+    assert statements
+
+    for statement, parameters in statements:
+        assert _full_scans(test_db, statement, parameters) == [], statement
+
+
+def test_manual_booking_pages_follow_index(test_db):
+    """Test a deep page of manual bookings neither scans nor sorts the table"""
+    def run(db):
+        keyset_query(
+            db.query(EinnahmeAusgabe).filter(EinnahmeAusgabe.rechnung_id.is_(None)),
+            [EinnahmeAusgabe.datum, EinnahmeAusgabe.id], ["2024-05-01", 10], 50
+        ).all()
+
+    (statement, parameters), = _filtered_statements(test_db, run)
+    plan = [row[-1] for row in test_db.connection().exec_driver_sql(
+        "EXPLAIN QUERY PLAN " + statement, parameters)]
+    assert _full_scans(test_db, statement, parameters) == []
+    assert not any("TEMP B-TREE" in step for step in plan), plan
+
+
+def test_period_range():
+    """Test year, month and quarter selections become half-open ranges"""
+    assert period_range(2024) == (date(2024, 1, 1), date(2025, 1, 1))
+    assert period_range(2024, month=2) == (date(2024, 2, 1), date(2024, 3, 1))
+    assert period_range(2024, month=12) == (date(2024, 12, 1), date(2025, 1, 1))
+    assert period_range(2024, quarter=4) == (date(2024, 10, 1), date(2025, 1, 1))
+    with pytest.raises(ValueError):
+        period_range(2024, quarter=5)
+
+
+def test_in_period_bounds(test_db):
+    """Test the range filter includes the first day and excludes the next period"""
+    kategorie = EurKategorie(name="Erlöse", typ="einnahme")
+    test_db.add(kategorie)
+    test_db.commit()
+    for datum in (date(2023, 12, 31), date(2024, 1, 1), date(2024, 12, 31), date(2025, 1, 1)):
+        test_db.add(EinnahmeAusgabe(datum=datum, typ="einnahme", betrag=1,
+                                    kategorie_id=kategorie.id))
+    test_db.commit()
+
+    daten = [e.datum for e in test_db.query(EinnahmeAusgabe).filter(
+        in_period(EinnahmeAusgabe.datum, 2024)).order_by(EinnahmeAusgabe.datum)]
+    assert daten == [date(2024, 1, 1), date(2024, 12, 31)]
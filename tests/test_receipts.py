@@ -0,0 +1,109 @@
+import hashlib
+import json
+
+import pytest
+from sqlalchemy import inspect, text
+
+from app.models.material_komponente import MaterialKomponente
+from app.models.receipt import Receipt
+from app.models.rechnung import Rechnung
+from app.utils import file_validation
+from app.utils.receipts import (BUCHUNG, MATERIAL, LegacyReceiptConflict, add_receipt,
+                                drop_legacy_receipt_columns, migrate_legacy_receipts)
+from config import config
+
+
+def test_legacy_receipt_columns_are_migrated(seeded_db, tmp_path, monkeypatch):
+    """Test the comma-separated and JSON receipt columns move into the receipt table"""
+    monkeypatch.setattr(config, "RECEIPTS_DIR", tmp_path)
+    (tmp_path / "a.jpg").write_bytes(b"jpeg")
+    material_id, buchung_id = 1, 2
+    engine = seeded_db.get_bind()
+    with engine.begin() as connection:
+        connection.execute(text("ALTER TABLE material_komponente ADD COLUMN receipt_path VARCHAR"))
+        connection.execute(text("ALTER TABLE einnahmen_ausgaben ADD COLUMN receipt_files TEXT"))
+        connection.execute(text("UPDATE material_komponente SET receipt_path = 'a.jpg, b.pdf' WHERE id = :id"),
+                           {"id": material_id})
+        connection.execute(text("UPDATE einnahmen_ausgaben SET receipt_files = :files WHERE id = :id"),
+                           {"files": json.dumps(["c.png"]), "id": buchung_id})
+
+    with engine.begin() as connection:
+        result = migrate_legacy_receipts(connection)
+        assert (result.moved, result.conflicts) == (3, [])
+        assert "receipt_path" in {c["name"] for c in inspect(connection).get_columns("material_komponente")}
+    with engine.begin() as connection:
+        assert migrate_legacy_receipts(connection).moved == 0
+    with engine.begin() as connection:
+        dropped = drop_legacy_receipt_columns(connection)
+        assert dropped == ["material_komponente.receipt_path", "einnahmen_ausgaben.receipt_files"]
+        assert "receipt_path" not in {c["name"] for c in inspect(connection).get_columns("material_komponente")}
+        assert "receipt_files" not in {c["name"] for c in inspect(connection).get_columns("einnahmen_ausgaben")}
+
+    receipts = {r.filename: r for r in seeded_db.query(Receipt)}
+    assert receipts["a.jpg"].owner_type == MATERIAL and receipts["a.jpg"].owner_id == material_id
+    assert receipts["a.jpg"].size == 4 and receipts["a.jpg"].sha256 == hashlib.sha256(b"jpeg").hexdigest()
+    assert receipts["b.pdf"].size is None and receipts["b.pdf"].mime_type == "application/pdf"
+    assert receipts["c.png"].owner_type == BUCHUNG and receipts["c.png"].owner_id == buchung_id
+    material = seeded_db.get(MaterialKomponente, material_id)
+    assert [r.filename for r in material.receipts] == ["a.jpg", "b.pdf"]
+
+
+def test_legacy_receipt_conflicts_keep_the_columns(seeded_db, tmp_path, monkeypatch):
+    """Test a name listed by two owners is reported and the legacy columns are not dropped"""
+    monkeypatch.setattr(config, "RECEIPTS_DIR", tmp_path)
+    engine = seeded_db.get_bind()
+    with engine.begin() as connection:
+        connection.execute(text("ALTER TABLE material_komponente ADD COLUMN receipt_path VARCHAR"))
+        connection.execute(text("UPDATE material_komponente SET receipt_path = 'a.jpg' WHERE id IN (1, 2)"))
+
+    with engine.begin() as connection:
+        result = migrate_legacy_receipts(connection)
+    assert result.moved == 1 and len(result.conflicts) == 1
+    with pytest.raises(LegacyReceiptConflict) as excinfo:
+        with engine.begin() as connection:
+            drop_legacy_receipt_columns(connection)
+    assert excinfo.value.unresolved == ["a.jpg (material_komponente.receipt_path von #2)"]
+    assert "receipt_path" in {c["name"] for c in inspect(engine).get_columns("material_komponente")}
+
+
+def test_receipt_download_is_one_indexed_lookup(client, seeded_db, count_queries, tmp_path, monkeypatch):
+    """Test a receipt is served after one lookup by file name, for materials and bookings alike"""
+    monkeypatch.setattr(config, "RECEIPTS_DIR", tmp_path)
+    (tmp_path / "beleg.png").write_bytes(b"\x89PNG")
+    add_receipt(seeded_db, BUCHUNG, 1, "beleg.png")
+    seeded_db.commit()
+
+    response, statements = count_queries(client.get, "/receipt/beleg.png")
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "image/png"
+    assert len([s for s in statements if "FROM receipt" in s]) == 1
+    assert client.get("/receipt/unbekannt.png").status_code == 404
+
+
+def test_material_receipts_are_streamed_hashed_and_registered(client, seeded_db, tmp_path, monkeypatch):
+    """Test several uploads are stored with size and hash, and an oversized one leaves no file behind"""
+    monkeypatch.setattr(config, "RECEIPTS_DIR", tmp_path / "receipts")
+    monkeypatch.setattr(file_validation, "UPLOAD_CHUNK_SIZE", 1000)
+    rechnung = seeded_db.query(Rechnung).first()
+    material = seeded_db.query(MaterialKomponente).filter_by(auftrag_id=rechnung.auftrag_id).first()
+    foto = b"\xff\xd8" + b"x" * 5000
+    files = [(f"receipt_{material.id}", ("foto.jpg", foto, "image/jpeg")),
+             (f"receipt_{material.id}", ("rechnung.pdf", b"%PDF-1.7", "application/pdf"))]
+
+    response = client.post(f"/rechnung/{rechnung.id}/materialkosten", files=files, follow_redirects=False)
+    assert response.status_code == 303
+    receipts = seeded_db.query(Receipt).filter_by(owner_type=MATERIAL, owner_id=material.id).order_by(Receipt.id).all()
+    assert [r.size for r in receipts] == [len(foto), 8]
+    assert receipts[0].sha256 == hashlib.sha256(foto).hexdigest()
+    assert (config.RECEIPTS_DIR / receipts[0].filename).read_bytes() == foto
+
+    monkeypatch.setattr(file_validation, "MAX_FILE_SIZE", 4000)
+    response = client.post(f"/rechnung/{rechnung.id}/materialkosten", files=files, follow_redirects=False)
+    assert response.status_code == 400
+    assert "zu groß" in response.text
+    assert sorted(p.name for p in config.RECEIPTS_DIR.iterdir()) == sorted(r.filename for r in receipts)
+
+    bad = [(f"receipt_{material.id}", ("foto.png", b"kein png", "image/png"))]
+    response = client.post(f"/rechnung/{rechnung.id}/materialkosten", files=bad, follow_redirects=False)
+    assert response.status_code == 400
+    assert "Ungültiges PNG-Format" in response.text
@@ -0,0 +1,105 @@
+from concurrent.futures import Future
+from datetime import date
+from decimal import Decimal
+
+import pytest
+from sqlalchemy.orm import sessionmaker
+
+from app.models.arbeit_komponente import ArbeitKomponente
+from app.models.auftrag import Auftrag
+from app.models.kunde import Kunde
+from app.models.material_komponente import MaterialKomponente
+from app.models.rechnung import Rechnung
+from app.utils import pdf_cache
+from app.utils.pdf_pool import PdfQueueFull, PdfRenderError
+from app.utils.rechnung_batch import create_invoices, render_invoices
+from config import config
+from database import db as database
+
+
+class FakePool:
+    """Pool whose queue is full on every other submit and which fails marked documents"""
+
+    def __init__(self):
+        self.submits = 0
+
+    def submit(self, html, base_url=None, stylesheets=()):
+        self.submits += 1
+        if self.submits % 2:
+            raise PdfQueueFull("full")
+        future = Future()
+        if "Kaputt" in html:
+            future.set_exception(PdfRenderError("boom"))
+        else:
+            future.set_result(b"%PDF-1.7\nbatch")
+        return future
+
+
+@pytest.fixture
+def new_orders(seeded_db, tmp_path, monkeypatch):
+    """Three orders without invoice: two finished, one without work components"""
+    monkeypatch.setattr(config, "INVOICES_DIR", tmp_path / "rechnungen")
+    kunde = seeded_db.query(Kunde).first()
+    auftraege = []
+    for name, ende in [("Bad", date(2025, 3, 10)), ("Kaputt", date(2025, 3, 20)), ("Leer", None)]:
+        auftrag = Auftrag(kunde=kunde, beschreibung=name, auftrag_start=date(2025, 3, 1))
+        if ende:
+            auftrag.arbeit_komponenten = [
+                ArbeitKomponente(arbeit=name, berechnungsbasis="stunden", anzahl_stunden=2,
+                                 stundenlohn=Decimal("50.00"), komponente_ende=ende)
+            ]
+            auftrag.materialien = [MaterialKomponente(bezeichnung="Silikon", anzahl=Decimal("3"),
+                                                      preis_pro_einheit=Decimal("5.00"))]
+        seeded_db.add(auftrag)
+        auftraege.append(auftrag)
+    seeded_db.commit()
+    return [a.id for a in auftraege]
+
+
+def test_batch_loads_orders_in_bulk_and_skips_failures(seeded_db, new_orders, count_queries):
+    """Test a batch uses a fixed number of queries and reports orders and renders that fail"""
+    bad, kaputt, leer = new_orders
+    invoiced = seeded_db.query(Rechnung).first().auftrag_id
+    ids = [bad, kaputt, leer, invoiced, 999999]
+
+    (result, documents), statements = count_queries(create_invoices, seeded_db, ids, date(2025, 3, 31))
+    selects = [s for s in statements if s.lstrip().upper().startswith("SELECT")]
+    # Orders with customers, work and material components, existing invoices, company data
+    assert len(selects) == 5
+
+    assert [e["auftrag_id"] for e in result.created] == [bad, kaputt]
+    assert {e["auftrag_id"]: e["fehler"] for e in result.failed} == {
+        leer: "Keine Arbeitskomponenten",
+        invoiced: f"Rechnung #{seeded_db.query(Rechnung).filter_by(auftrag_id=invoiced).one().id} existiert bereits",
+        999999: "Auftrag nicht gefunden",
+    }
+    rechnung = seeded_db.get(Rechnung, result.created[0]["rechnung_id"])
+    assert float(rechnung.rechnungssumme_gesamt) == 115.0
+
+    progress = []
+    render_invoices(FakePool(), documents, result, lambda *args: progress.append(args[:2]))
+    assert progress == [(1, 2), (2, 2)]
+    assert [e["auftrag_id"] for e in result.created] == [bad]
+    assert result.failed[-1]["auftrag_id"] == kaputt
+    # A failed render keeps its invoice; the PDF is rendered on download
+    assert seeded_db.query(Rechnung).filter_by(auftrag_id=kaputt).count() == 1
+    assert (config.INVOICES_DIR / result.created[0]["datei"]).read_bytes() == b"%PDF-1.7\nbatch"
+
+
+def test_batch_endpoint_bills_all_finished_orders(client, seeded_db, new_orders, monkeypatch):
+    """Test the batch job bills finished orders without invoice and returns its result"""
+    monkeypatch.setattr(config, "JOB_WORKERS", 0)
+    monkeypatch.setattr(config, "PDF_WORKERS", 0)
+    monkeypatch.setattr(database, "SessionLocal", sessionmaker(bind=seeded_db.get_bind()))
+    monkeypatch.setattr(pdf_cache, "render_html_to_pdf",
+                        lambda html, base_url=None, stylesheets=(): b"%PDF-1.7\nbatch")
+
+    assert client.post("/api/rechnungen/batch").status_code == 400
+    response = client.post("/api/rechnungen/batch",
+                           data={"alle_fertigen": "true", "rechnungsdatum": "2025-03-15"})
+    assert response.status_code == 202
+    status = client.get(response.json()["status_url"]).json()
+    assert status["status"] == "done"
+    # Only the order finished by the invoice date
+    assert [e["auftrag_id"] for e in status["result"]["created"]] == new_orders[:1]
+    assert status["result"]["failed"] == []
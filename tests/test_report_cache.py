@@ -0,0 +1,37 @@
+from app.models.kunde import Kunde
+from app.utils.data_version import current_version
+from app.utils.report_cache import ReportCache, report_cache
+
+
+def test_report_cache_lru():
+    """Test least recently used entries are evicted first"""
+    cache = ReportCache(maxsize=2)
+    cache.sync("1")
+    cache.set("a", {"n": 1}, "1")
+    cache.set("b", {"n": 2}, "1")
+    assert cache.get("a") == {"n": 1}
+
+    cache.set("c", {"n": 3}, "1")
+    assert cache.get("b") is None
+    assert cache.get("a") == {"n": 1}
+    assert cache.stats()["hits"] == 2
+    assert cache.stats()["misses"] == 1
+
+
+def test_report_cache_discards_stale_results():
+    """Test values computed from an older data version are not stored"""
+    cache = ReportCache()
+    cache.sync("2")
+    cache.set("a", {"n": 1}, "1")
+    assert cache.get("a") is None
+
+
+def test_report_cache_invalidated_on_commit(test_db):
+    """Test committing a customer clears cached reports"""
+    report_cache.get_or_compute("dashboard", lambda: {"n": 1})
+
+    test_db.add(Kunde(kunde_vorname="Test", kundenart="Privatkunde"))
+    test_db.commit()
+
+    assert report_cache.get_or_compute("dashboard", lambda: {"n": 2}) == {"n": 2}
+    assert report_cache.version == current_version()
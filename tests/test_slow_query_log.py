@@ -0,0 +1,31 @@
+from app.models.material_komponente import MaterialKomponente
+from app.utils.slow_query_log import top_offenders
+from app.utils.sql_instrumentation import track_sql
+from config import config
+
+
+def test_slow_queries_are_logged_with_plan(test_db, tmp_path, monkeypatch):
+    """Test statements above the threshold are recorded with route and query plan"""
+    monkeypatch.setattr(config, "SLOW_QUERY_MS", 1e-6)
+    monkeypatch.setattr(config, "SLOW_QUERY_LOG_FILE", tmp_path / "slow_queries.log")
+
+    with track_sql("GET /receipt/beleg.pdf"):
+        for _ in range(3):
+            test_db.query(MaterialKomponente).filter(
+                MaterialKomponente.bezeichnung.like("%beleg.pdf%")
+            ).all()
+
+    offenders = top_offenders()
+    receipt_lookup = next(o for o in offenders if "LIKE" in o["statement"])
+    assert receipt_lookup["count"] == 3
+    assert receipt_lookup["routes"] == ["GET /receipt/beleg.pdf"]
+    assert receipt_lookup["parameters"] == ["str"]
+    assert any("SCAN material_komponente" in step for step in receipt_lookup["plan"])
+    assert offenders == sorted(offenders, key=lambda o: o["total_ms"], reverse=True)
+
+
+def test_slow_query_page_requires_login(client):
+    """Test the diagnostics page redirects anonymous users to the login"""
+    response = client.get("/diagnose/slow-queries", follow_redirects=False)
+    assert response.status_code == 302
+    assert response.headers["location"] == "/login"
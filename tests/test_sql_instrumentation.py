@@ -0,0 +1,36 @@
+import logging
+
+from fastapi.testclient import TestClient
+from sqlalchemy import text
+
+from app.main import app
+from app.utils.logging_config import RequestLogMiddleware
+from app.utils.sql_instrumentation import track_sql, warn_repeated_statements
+
+
+def test_repeated_statements_are_reported(test_db, caplog):
+    """Test the same parameterised statement run in a loop is flagged as N+1"""
+    with track_sql() as stats:
+        for kunde_id in range(12):
+            test_db.execute(text("SELECT * FROM kunde WHERE id = :id"), {"id": kunde_id})
+        test_db.execute(text("SELECT count(*) FROM rechnung"))
+
+    assert stats.statements == 13
+    assert stats.db_time > 0
+
+    with caplog.at_level(logging.WARNING, logger="buildflow.sql"):
+        repeated = warn_repeated_statements(stats, "GET /test", threshold=10)
+    assert [count for _, count in repeated] == [12]
+    assert "Possible N+1: GET /test" in caplog.text
+
+
+def test_request_log_line_carries_sql_numbers(test_db, caplog):
+    """Test the request log line includes statement count and DB time"""
+    client = TestClient(RequestLogMiddleware(app))
+    with caplog.at_level(logging.INFO, logger="buildflow.request"):
+        response = client.get("/kundenliste")
+
+    assert response.status_code == 200
+    line = next(r.getMessage() for r in caplog.records if r.name == "buildflow.request")
+    assert line.startswith("GET /kundenliste 200 ")
+    assert "sql=1 " in line
@@ -0,0 +1,31 @@
+import pytest
+
+from app import main
+from app.routes import auth_route, buchungen, rechnung_route
+from app.utils.template_utils import create_templates, german_decimal, precompile_templates
+from config import config
+
+
+def test_routers_share_one_environment():
+    """Test all routers render with the same environment and filters"""
+    env = main.templates.env
+    assert auth_route.templates.env is env
+    assert rechnung_route.templates.env is env
+    assert buchungen.templates.env is env
+    assert env.filters["german_decimal"] is german_decimal
+
+
+def test_precompiled_templates_load_from_bytecode_cache(tmp_path, monkeypatch):
+    """Test a new environment loads precompiled templates without compiling them again"""
+    monkeypatch.setattr(config, "TEMPLATE_CACHE_DIR", tmp_path / "template_cache")
+    count = precompile_templates(create_templates())
+    assert count == len(list(config.TEMPLATES_DIR.glob("*.html")))
+    assert len(list((tmp_path / "template_cache").iterdir())) == count
+
+    templates = create_templates()
+
+    def compile_again(*args, **kwargs):
+        pytest.fail("template compiled despite bytecode cache")
+
+    monkeypatch.setattr(templates.env, "compile", compile_again)
+    assert precompile_templates(templates) == count
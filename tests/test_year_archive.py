@@ -0,0 +1,152 @@
+import hashlib
+import io
+import zipfile
+
+import pytest
+
+from app.models.einnahme_ausgabe import EinnahmeAusgabe
+from app.models.material_komponente import MaterialKomponente
+from app.models.receipt import Receipt
+from app.models.rechnung import Rechnung
+from app.utils import pdf_cache, rechnung_batch, year_archive
+from app.utils.pdf_pool import PdfRenderError
+from app.utils.year_archive import build_archive, save_archive
+from config import config
+
+
+def fake_render_cached(html, stylesheets=()):
+    """Store a small stand-in PDF for html in the PDF cache"""
+    key = pdf_cache.document_key(html, stylesheets)
+    return key, pdf_cache.get_cache().put(key, b"%PDF-1.7\n" + key.encode())
+
+
+@pytest.fixture
+def archive_files(seeded_db, tmp_path, monkeypatch):
+    """Receipts of 2024 on disk; invoice PDFs are rendered by a stand-in"""
+    monkeypatch.setattr(config, "INVOICES_DIR", tmp_path / "rechnungen")
+    monkeypatch.setattr(config, "RECEIPTS_DIR", tmp_path / "receipts")
+    monkeypatch.setattr(config, "PDF_WORKERS", 0)
+    monkeypatch.setattr(rechnung_batch, "render_cached", fake_render_cached)
+    config.RECEIPTS_DIR.mkdir()
+    rechnungen = [r for r in seeded_db.query(Rechnung).order_by(Rechnung.id) if r.rechnungsdatum.year == 2024]
+
+    buchung = seeded_db.query(EinnahmeAusgabe).filter(EinnahmeAusgabe.rechnung_id.is_(None)).first()
+    material = seeded_db.query(MaterialKomponente).filter_by(auftrag_id=rechnungen[0].auftrag_id).first()
+    for name, owner_type, owner_id in [("miete.pdf", "buchung", buchung.id), ("fehlt.pdf", "buchung", buchung.id),
+                                       ("material_a.jpg", "material", material.id),
+                                       ("material_b.png", "material", material.id)]:
+        seeded_db.add(Receipt(filename=name, owner_type=owner_type, owner_id=owner_id))
+    seeded_db.commit()
+    for name in ["miete.pdf", "material_a.jpg", "material_b.png"]:
+        (config.RECEIPTS_DIR / name).write_bytes(name.encode() * 1000)
+    return rechnungen
+
+
+def test_archive_contains_year_files_journal_and_manifest(client, archive_files):
+    """Test the archive holds the year's invoices, receipts and journal with valid checksums"""
+    response = client.get("/euer/2024/archiv")
+    assert response.status_code == 200
+    assert int(response.headers["content-length"]) == len(response.content)
+
+    with zipfile.ZipFile(io.BytesIO(response.content)) as zf:
+        assert zf.testzip() is None
+        assert zf.comment.decode() == response.headers["etag"].strip('"')
+        names = zf.namelist()
+        invoices = [n for n in names if n.startswith("rechnungen/")]
+        assert [int(n.split("_")[1]) for n in invoices] == [r.id for r in archive_files]
+        # The archive holds what the invoice download serves
+        assert zf.read(invoices[0]) == client.get(f"/rechnung/{archive_files[0].id}/download").content
+        assert "receipts/miete.pdf" in names and "receipts/material_a.jpg" in names
+        assert names[-3:] == ["buchungen_2024.csv", "FEHLENDE_DATEIEN.txt", "MANIFEST.sha256"]
+        assert zf.read("FEHLENDE_DATEIEN.txt").decode() == "receipts/fehlt.pdf\n"
+        assert response.headers["x-missing-files"] == "1"
+
+        journal = zf.read("buchungen_2024.csv").decode("utf-8-sig").splitlines()
+        assert journal[0] == "Datum;Typ;Betrag;Kategorie;Beschreibung;Rechnung;Belege"
+        assert any(line.endswith(";miete.pdf, fehlt.pdf") for line in journal)
+        for line in zf.read("MANIFEST.sha256").decode().splitlines():
+            digest, name = line.split("  ")
+            assert hashlib.sha256(zf.read(name)).hexdigest() == digest
+
+    assert client.get("/euer/1999/archiv").status_code == 404
+
+
+def test_interrupted_download_resumes_with_range(client, archive_files):
+    """Test a Range request continues the same archive and a changed archive starts over"""
+    full = client.get("/euer/2024/archiv")
+    etag = full.headers["etag"]
+
+    rest = client.get("/euer/2024/archiv", headers={"Range": "bytes=1000-", "If-Range": etag})
+    assert rest.status_code == 206
+    assert rest.headers["content-range"] == f"bytes 1000-{len(full.content) - 1}/{len(full.content)}"
+    assert full.content[:1000] + rest.content == full.content
+    assert client.get("/euer/2024/archiv", headers={"If-None-Match": etag}).status_code == 304
+
+    (config.RECEIPTS_DIR / "miete.pdf").write_bytes(b"neu")
+    changed = client.get("/euer/2024/archiv", headers={"Range": "bytes=1000-", "If-Range": etag})
+    assert changed.status_code == 200
+    assert changed.headers["etag"] != etag
+
+
+def test_saved_archive_is_resumed_and_skipped_when_unchanged(seeded_db, archive_files, tmp_path):
+    """Test save_archive continues a partial file and leaves an unchanged archive alone"""
+    target = tmp_path / "export" / "Jahresarchiv_2024.zip"
+    archive = build_archive(seeded_db, 2024)
+    try:
+        full = b"".join(archive.iter_bytes())
+        target.parent.mkdir()
+        target.with_name(target.name + ".part").write_bytes(full[:5000])
+        target.with_name(target.name + ".part.etag").write_text(archive.etag)
+
+        assert save_archive(archive, target) == len(full) - 5000
+        assert target.read_bytes() == full
+        assert save_archive(archive, target) == 0
+    finally:
+        archive.close()
+
+
+def test_large_archives_use_zip64_records(seeded_db, archive_files, monkeypatch):
+    """Test offsets beyond the 32-bit limit are written as ZIP64 records"""
+    monkeypatch.setattr(year_archive, "_ZIP64_LIMIT", 2000)
+    archive = build_archive(seeded_db, 2024)
+    try:
+        data = b"".join(archive.iter_bytes())
+    finally:
+        archive.close()
+    assert len(data) == archive.size
+    with zipfile.ZipFile(io.BytesIO(data)) as zf:
+        assert zf.testzip() is None
+        assert zf.infolist()[-1].header_offset > 2000
+
+
+
+def test_invoices_follow_current_data_and_failed_renders_are_listed(client, seeded_db, archive_files, monkeypatch):
+    """Test stale or renamed invoice copies are not archived and invoices without PDF are reported"""
+    rechnung = archive_files[0]
+    config.INVOICES_DIR.mkdir()
+    (config.INVOICES_DIR / f"Rechnung_{rechnung.id}_AlterName.pdf").write_bytes(b"%PDF alt")
+    archive = build_archive(seeded_db, 2024)
+    try:
+        current = next(e for e in archive.entries if e.name.startswith(f"rechnungen/Rechnung_{rechnung.id}_"))
+        assert "AlterName" not in current.name
+        assert current.path.read_bytes().startswith(b"%PDF-1.7\n")
+    finally:
+        archive.close()
+
+    # A stale copy under the current name is replaced by the current PDF
+    current.path.write_bytes(b"%PDF veraltet")
+    archive = build_archive(seeded_db, 2024)
+    archive.close()
+    assert current.path.read_bytes().startswith(b"%PDF-1.7\n")
+
+    def failing_render(html, stylesheets=()):
+        raise PdfRenderError("kaputt")
+
+    monkeypatch.setattr(config, "PDF_CACHE_DIR", config.PDF_CACHE_DIR.with_name("leer"))
+    monkeypatch.setattr(rechnung_batch, "render_cached", failing_render)
+    response = client.get("/euer/2024/archiv")
+    assert response.status_code == 200
+    assert int(response.headers["x-missing-files"]) == len(archive_files) + 1
+    with zipfile.ZipFile(io.BytesIO(response.content)) as zf:
+        fehlend = zf.read("FEHLENDE_DATEIEN.txt").decode().splitlines()
+    assert current.name in fehlend